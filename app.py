@@ -1,14 +1,25 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-from utils.data import fetch_crypto_data, fetch_stock_data, fetch_dxy_data
-from utils.analysis import calculate_technical_indicators, calculate_fibonacci_levels, analyze_trend, generate_trading_signal, calculate_historical_levels, analyze_mtf_trend, analyze_dxy_correlation
-from utils.sentiment import fetch_news_sentiment
+import json
+import os
+from utils.core import run_analysis
+from utils.profiler import Trace, span
+from utils.store import DATA_DIR
+from utils.analysis import scan_patterns, BULLISH_PATTERNS, BEARISH_PATTERNS, PATTERN_LABELS
+from utils.chart import chart_data, visible_slice
+from utils.prefetch import start_prefetcher
+
+# Finestre del grafico (None = tutto lo storico caricato)
+CHART_PERIODS = {"1 settimana": pd.Timedelta(days=7), "1 mese": pd.Timedelta(days=30),
+                 "3 mesi": pd.Timedelta(days=90), "1 anno": pd.Timedelta(days=365), "Tutto": None}
 
 # Page Config
 st.set_page_config(page_title="Assistente Trading BTC", layout="wide", page_icon="📈")
 
+# Refresh in background dei dati (uno per processo): i rerun servono l'ultimo valore senza attendere la rete
+start_prefetcher()
+
 # Custom CSS for styling
 st.markdown("""
 <style>
@@ -54,70 +65,42 @@ with st.sidebar:
     # We need price to calculate valid SL/TP distances based on liquidation/risk
     display_risk = st.container()
 
+    st.markdown("---")
+    st.subheader("📊 Grafico")
+    chart_tf = st.selectbox("Timeframe grafico", ['15m', '1h', '4h', '1d'], index=1)
+    chart_period = st.select_slider("Finestra visibile", options=list(CHART_PERIODS), value="Tutto")
+    chart_width = st.slider("Larghezza grafico (px)", min_value=600, max_value=3000, value=1400, step=100,
+                            help="Candele e linee vengono ridotte a circa un punto per pixel.")
+
+    st.markdown("---")
+    st.subheader("⏱️ Profilazione")
+    profile_mode = st.selectbox("Cattura profilo", ["Solo tempi", "cProfile", "Campionamento"],
+                                help="Tempi per fase sempre attivi; cProfile e campionamento (5 ms) solo su richiesta.")
+
+# Span per ogni fase del rerun (fetch, indicatori, analisi, rendering): vedi pannello in fondo
+trace = Trace('dashboard', cprofile=profile_mode == "cProfile",
+              sample_interval=0.005 if profile_mode == "Campionamento" else None).start()
+
 # Main Data Fetching
 with st.spinner('Recupero dati di mercato & Analisi Pro...'):
-    # 1. Crypto Data - MTF Fetching
-    timeframes = ['15m', '1h', '4h', '1d']
-    mtf_data = {}
-    
-    # Primary Data (1h)
-    df_btc = fetch_crypto_data('BTC/USDT', timeframe='1h', limit=500)
-    mtf_data['1h'] = df_btc
-    
-    # Secondary Timeframes
-    for tf in ['15m', '4h', '1d']:
-        try:
-            # For 1d trend analysis, we just need recent data
-            mtf_data[tf] = fetch_crypto_data('BTC/USDT', timeframe=tf if tf != '1d' else '1d', limit=400)
-        except:
-             mtf_data[tf] = pd.DataFrame()
-
-    # Calculate indicators for all TFs
-    for tf, df in mtf_data.items():
-        if not df.empty:
-            mtf_data[tf] = calculate_technical_indicators(df)
-
-    # 2. Main Analysis (on 1h)
-    # df_btc is already mtf_data['1h'] but we ensure it has indicators
-    df_btc = mtf_data['1h'] # This reference should point to the DF with indicators now
-    
-    # Calculations if data exists
-    if not df_btc.empty:
-        fib_levels = calculate_fibonacci_levels(df_btc)
-        trend, rsi_val = analyze_trend(df_btc)
-        # Note: We now pass the entire mtf_data to use multi-timeframe logic (1D, 4H, 1H)
-        signal_data = generate_trading_signal(mtf_data)
-        
-        # 3. Pro Analysis
-        mtf_results, mtf_score = analyze_mtf_trend(mtf_data)
-        
-        # 4. Long Term History
-        df_btc_daily_hist = fetch_crypto_data('BTC/USDT', timeframe='1D', limit=400)
-        historical_levels = calculate_historical_levels(df_btc_daily_hist)
-    else:
-        # Defaults to prevent errors
-        fib_levels = {}
-        trend = "N/A"
-        rsi_val = 0
-        signal_data = {"opinion": "N/A", "color": "gray", "score": 0, "advice": "", "reasons": [], "structure": "N/A"}
-        mtf_results = {}
-        mtf_score = "N/A"
-        historical_levels = []
-        
-    # 5. DXY & Stock
-    dxy_data = fetch_dxy_data()
-    stock_data = fetch_stock_data()
-    
-    # Run Correlation Check if we have signals
-    dxy_trend = "N/A"
-    dxy_warning = None
-    dxy_change = 0.0
-    
-    if not df_btc.empty:
-        dxy_trend, dxy_warning, dxy_change = analyze_dxy_correlation(dxy_data, signal_data['opinion'])
-    
+    # Stessa pipeline della CLI (utils/core.py): fetch concorrente, indicatori incrementali, segnali
+    analysis = run_analysis('BTC/USDT')
+    mtf_data = analysis['mtf_data']
+    df_btc = mtf_data['1h']
+
+    fib_levels = analysis['fib_levels']
+    trend, rsi_val = analysis['trend'], analysis['rsi']
+    signal_data = analysis['signal']
+    mtf_results, mtf_score = analysis['mtf_results'], analysis['mtf_score']
+    historical_levels = analysis['historical_levels']
+
+    # DXY & Stock
+    dxy_data = analysis['dxy_data']
+    stock_data = analysis['stock_data']
+    dxy_trend, dxy_warning, dxy_change = analysis['dxy_trend'], analysis['dxy_warning'], analysis['dxy_change']
+
     # Sentiment
-    sentiment_label, sentiment_score, news_items = fetch_news_sentiment()
+    sentiment_label, sentiment_score, news_items = analysis['sentiment_label'], analysis['sentiment_score'], analysis['news']
 
 if not df_btc.empty:
     current_price = df_btc['close'].iloc[-1]
@@ -219,38 +202,60 @@ if not df_btc.empty:
     tab1, tab2 = st.tabs(["Grafico Prezzo", "Notizie e Info"])
     
     with tab1:
-        # Plotly Candlestick
-        fig = go.Figure()
-        fig.add_trace(go.Candlestick(x=df_btc['timestamp'],
-                        open=df_btc['open'],
-                        high=df_btc['high'],
-                        low=df_btc['low'],
-                        close=df_btc['close'],
-                        name='BTC/USDT'))
-        
-        # Add EMAs
-        fig.add_trace(go.Scatter(x=df_btc['timestamp'], y=df_btc['EMA_50'], line=dict(color='orange', width=1), name='EMA 50'))
-        fig.add_trace(go.Scatter(x=df_btc['timestamp'], y=df_btc['EMA_200'], line=dict(color='blue', width=1), name='EMA 200'))
-        
-        # Add Bollinger Bands
-        fig.add_trace(go.Scatter(x=df_btc['timestamp'], y=df_btc['BBU'], line=dict(color='gray', dash='dot'), name='Banda Sup'))
-        fig.add_trace(go.Scatter(x=df_btc['timestamp'], y=df_btc['BBL'], line=dict(color='gray', dash='dot'), fill='tonexty', name='Banda Inf'))
-
-        # Add Fibonacci Levels (Horizontal API)
-        for level_name, value in fib_levels.items():
-            fig.add_hline(y=value, line_dash="dash", line_color="green", annotation_text=level_name)
-
-        fig.update_layout(height=600, xaxis_rangeslider_visible=False, template="plotly_dark")
-        # Fix deprecation warning: use_container_width=True -> use_container_width=True is standard? 
-        # The warning specifically asked for width="stretch" or similar if using container width.
-        # Let's try sticking to use_container_width=True but if it failed, maybe I need to remove it?
-        # Actually, let's just try to be safe. If the user saw the warning, it means it IS supported but annoying.
-        # But if it broke... wait. The user just pasted the log.
-        # I will replace it with the new suggestion.
-        try:
+        with span('render.chart'):
+            # Plotly Candlestick (importato qui: metriche e sidebar vengono mostrate prima)
+            import plotly.graph_objects as go
+
+            # Solo la finestra visibile, ridotta alla larghezza del grafico (utils/chart.py)
+            df_chart = mtf_data[chart_tf]
+            window = CHART_PERIODS[chart_period]
+            chart_start = df_chart['timestamp'].iloc[-1] - window if window is not None and not df_chart.empty else None
+            chart = chart_data(df_chart, start=chart_start, width_px=chart_width)
+            candles = chart['candles']
+
+            fig = go.Figure()
+            fig.add_trace(go.Candlestick(x=candles['timestamp'],
+                            open=candles['open'],
+                            high=candles['high'],
+                            low=candles['low'],
+                            close=candles['close'],
+                            name='BTC/USDT'))
+
+            # Add EMAs (WebGL: restano fluide anche con molti punti)
+            for column, color, name in [('EMA_50', 'orange', 'EMA 50'), ('EMA_200', 'blue', 'EMA 200')]:
+                if column in chart['lines']:
+                    x, y = chart['lines'][column]
+                    fig.add_trace(go.Scattergl(x=x, y=y, line=dict(color=color, width=1), name=name))
+
+            # Add Bollinger Bands (inviluppo per bucket quando le candele sono aggregate)
+            if 'BBU' in candles and 'BBL' in candles:
+                fig.add_trace(go.Scattergl(x=candles['timestamp'], y=candles['BBU'], line=dict(color='gray', dash='dot'), name='Banda Sup'))
+                fig.add_trace(go.Scattergl(x=candles['timestamp'], y=candles['BBL'], line=dict(color='gray', dash='dot'), fill='tonexty', name='Banda Inf'))
+
+            # Candlestick Patterns (sulle candele originali della finestra visibile)
+            df_visible = visible_slice(df_chart, start=chart_start)
+            pattern_matrix = scan_patterns(df_visible)
+            for names, symbol, color, price_col, label in [
+                (BULLISH_PATTERNS, 'triangle-up', 'lime', 'low', 'Pattern Rialzisti'),
+                (BEARISH_PATTERNS, 'triangle-down', 'red', 'high', 'Pattern Ribassisti'),
+            ]:
+                hits = pattern_matrix[names]
+                mask = hits.any(axis=1)
+                if mask.any():
+                    hover = hits[mask].apply(lambda row: ', '.join(PATTERN_LABELS[n] for n in names if row[n]), axis=1)
+                    fig.add_trace(go.Scattergl(x=df_visible.loc[mask, 'timestamp'], y=df_visible.loc[mask, price_col],
+                                               mode='markers', marker=dict(symbol=symbol, color=color, size=8),
+                                               text=hover, hoverinfo='text+x', name=label))
+
+            # Add Fibonacci Levels (Horizontal API)
+            for level_name, value in fib_levels.items():
+                fig.add_hline(y=value, line_dash="dash", line_color="green", annotation_text=level_name)
+
+            fig.update_layout(height=600, xaxis_rangeslider_visible=False, template="plotly_dark")
+            if chart['bucket'] > 1:
+                st.caption(f"{chart['rows']:,} candele {chart_tf} aggregate a {len(candles):,} "
+                           f"({chart['bucket']} per candela) per la larghezza del grafico.")
             st.plotly_chart(fig, use_container_width=True)
-        except:
-             st.plotly_chart(fig)
         
         # --- AI SIGNAL SECTION ---
         st.markdown(f"""
@@ -334,6 +339,22 @@ if not df_btc.empty:
             st.markdown(f"<span style='color:{sentiment_color}'>{news['sentiment']}</span> | {news['published']}", unsafe_allow_html=True)
             st.write("---")
 
+        # Contesto cross-asset: correlazione e beta di BTC (rendimenti daily) per finestra
+        correlation = analysis['correlation']
+        st.subheader("🔗 Correlazioni BTC vs Macro")
+        if correlation['windows']:
+            rows = []
+            for window, stats in correlation['windows'].items():
+                for asset in stats['corr'].columns[1:]:
+                    rows.append({'Finestra': f"{window}g", 'Asset': asset,
+                                 'Correlazione': stats['corr'].iloc[0][asset], 'Beta': stats['beta'].iloc[0][asset]})
+            st.dataframe(pd.DataFrame(rows).pivot(index='Asset', columns='Finestra', values=['Correlazione', 'Beta']).round(2),
+                         use_container_width=True)
+            st.caption(f"Rendimenti giornalieri allineati sui giorni comuni, aggiornati al {correlation['as_of']:%d/%m/%Y}. "
+                       "Beta = sensibilità di BTC ai movimenti dell'asset.")
+        else:
+            st.info("Storico macro insufficiente per calcolare le correlazioni.")
+
     # Glossary Section
     with st.expander("📚 Glossario degli Indicatori (Legenda)"):
         st.markdown("""
@@ -365,8 +386,50 @@ if not df_btc.empty:
         **Pattern Candlestick**
         - **Pin Bar / Hammer**: Candela con corpo piccolo e ombra lunga. Indica che il prezzo è stato respinto e potrebbe invertire.
         - **Engulfing**: Una candela che "ingloba" completamente quella precedente. Segnale di forza nella direzione della seconda candela.
+        - **Doji**: Corpo quasi nullo rispetto al range. Indecisione tra compratori e venditori.
+        - **Inside / Outside Bar**: Candela contenuta nella precedente (compressione) o che la supera su entrambi i lati (espansione).
+        - **Morning / Evening Star**: Tre candele (forte, piccola, forte opposta). Possibile inversione rialzista / ribassista.
+        - **Tre Soldati Bianchi / Tre Corvi Neri**: Tre candele consecutive dello stesso colore con chiusure progressive. Forza del trend.
         """)
 
 
 else:
     st.error("Impossibile caricare i dati.")
+
+trace.stop()
+
+# Pannello tempi: waterfall delle fasi, hit/miss della cache per chiamata, export per flamegraph
+with st.expander(f"⏱️ Tempi Pipeline ({trace.elapsed * 1000:,.0f} ms)"):
+    spans = trace.records()
+    if spans:
+        timing_df = pd.DataFrame(spans)
+        if 'cache' not in timing_df:
+            timing_df['cache'] = None
+        timing_df['start_ms'] = timing_df['start'] * 1000
+        timing_df['duration_ms'] = timing_df['duration'] * 1000
+        hits = (timing_df['cache'] == 'hit').sum()
+        misses = (timing_df['cache'] == 'miss').sum()
+        st.caption(f"{len(timing_df)} span | cache: {hits} hit, {misses} miss")
+
+        import plotly.graph_objects as go
+
+        labels = [f"{i:>3} {'· ' * depth}{name}" for i, (depth, name) in enumerate(zip(timing_df['depth'], timing_df['name']))]
+        colors = timing_df['cache'].map({'hit': 'green', 'miss': 'orange'}).fillna('steelblue')
+        waterfall = go.Figure(go.Bar(y=labels, x=timing_df['duration_ms'], base=timing_df['start_ms'],
+                                     orientation='h', marker_color=colors,
+                                     hovertext=timing_df['thread'], hoverinfo='x+text'))
+        waterfall.update_layout(height=120 + 22 * len(labels), template="plotly_dark", xaxis_title="ms",
+                                yaxis=dict(autorange='reversed'), margin=dict(l=10, r=10, t=10, b=10))
+        st.plotly_chart(waterfall, use_container_width=True)
+        st.dataframe(timing_df[['name', 'thread', 'start_ms', 'duration_ms', 'cache']], use_container_width=True)
+
+    if trace.profile is not None:
+        st.code(trace.profile_stats(limit=25))
+
+    col_dl, col_save = st.columns(2)
+    with col_dl:
+        st.download_button("⬇️ Trace (Chrome/Perfetto)", json.dumps(trace.to_chrome_trace()),
+                           file_name="dashboard.trace.json", mime="application/json")
+    with col_save:
+        if st.button("💾 Salva profilo su file"):
+            st.success("Salvato: " + ", ".join(trace.dump(os.path.join(DATA_DIR, 'profiles'))))
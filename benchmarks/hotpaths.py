@@ -0,0 +1,217 @@
+"""
+Offline benchmark suite for the analysis hot paths, on synthetic OHLCV data.
+
+    python benchmarks/hotpaths.py                              # 1k, 100k and 10M rows
+    python benchmarks/hotpaths.py --sizes 1k,100k --only fib,levels
+    python benchmarks/hotpaths.py --compare benchmarks/results/<commit>.json
+
+Every benchmark is timed `repeat` times (min and median are kept) and run once more under
+tracemalloc for the peak memory it allocates. Results go to a JSON file named after the
+current commit, so two runs can be compared; with --compare the exit status is 1 when a
+benchmark got slower than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.analysis import (calculate_technical_indicators, calculate_fibonacci_levels,  # noqa: E402
+                            calculate_historical_levels, detect_patterns, scan_patterns,
+                            analyze_mtf_trend, generate_trading_signal)
+from utils.chart import chart_data  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_SIZES = '1k,100k,10M'
+
+
+def synthetic_ohlcv(rows, minutes=15, seed=42, start='2015-01-01', price=30000.0):
+    """
+    Reproducible random-walk OHLCV candles (same seed -> same data), built without Python loops.
+    """
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0.0, 0.003, rows)
+    close = price * np.exp(np.cumsum(log_returns))
+    open_ = np.empty(rows)
+    open_[0] = price
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.normal(0.0, 0.0015, (2, rows)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(3.0, 1.0, rows)
+    timestamp = pd.date_range(start, periods=rows, freq=f'{minutes}min')
+    return pd.DataFrame({'timestamp': timestamp, 'open': open_, 'high': high, 'low': low,
+                         'close': close, 'volume': volume})
+
+
+def synthetic_mtf(rows, seed=42):
+    """
+    `rows` 15m candles plus 1h/4h/1d candles covering a similar span, with indicators,
+    shaped like the `mtf_data` dict the dashboard passes to the signal functions.
+    Every timeframe keeps at least 300 candles so EMA 200 is defined, as in the dashboard.
+    """
+    frames = {}
+    for i, (tf, minutes) in enumerate([('15m', 15), ('1h', 60), ('4h', 240), ('1d', 1440)]):
+        frames[tf] = synthetic_ohlcv(max(rows * 15 // minutes, 300), minutes=minutes, seed=seed + i)
+    return {tf: calculate_technical_indicators(df) for tf, df in frames.items()}
+
+
+# name -> (function, builds the call arguments from the prepared data)
+BENCHMARKS = {
+    'indicators': (calculate_technical_indicators, lambda data: (data['raw'].copy(),)),
+    'fib': (calculate_fibonacci_levels, lambda data: (data['mtf']['15m'],)),
+    'levels': (calculate_historical_levels, lambda data: (data['raw'],)),
+    'patterns': (detect_patterns, lambda data: (data['raw'],)),
+    'scan_patterns': (scan_patterns, lambda data: (data['raw'],)),
+    'mtf_trend': (analyze_mtf_trend, lambda data: (data['mtf'],)),
+    'signal': (generate_trading_signal, lambda data: (data['mtf'],)),
+    'chart': (chart_data, lambda data: (data['mtf']['15m'],)),
+}
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    factor = {'k': 1000, 'm': 1000000}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * factor)
+
+
+def run_benchmark(name, data, repeat):
+    func, make_args = BENCHMARKS[name]
+    timings = []
+    for _ in range(repeat):
+        args = make_args(data)  # copie e preparazione fuori dal tempo misurato
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+
+    args = make_args(data)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    del args
+
+    return {
+        'benchmark': name,
+        'rows': len(data['raw']),
+        'repeat': repeat,
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'peak_mb': peak / 2**20,
+    }
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return out + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def metadata(seed):
+    try:
+        from importlib.metadata import version
+        pandas_ta_version = version('pandas_ta')
+    except Exception:
+        pandas_ta_version = None
+    return {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pandas_ta': pandas_ta_version,
+        'seed': seed,
+    }
+
+
+def compare(results, baseline_path, threshold, min_delta=0.001):
+    """
+    Print current vs baseline (min time) and return the benchmarks slower than `threshold`x.
+    Sub-millisecond differences (`min_delta` seconds) are timer noise, never regressions.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {(r['benchmark'], r['rows']): r for r in baseline['results']}
+    print(f"\nvs {baseline['meta']['commit']} ({baseline_path})")
+
+    regressions = []
+    for r in results:
+        old = before.get((r['benchmark'], r['rows']))
+        if old is None:
+            continue
+        ratio = r['min_s'] / old['min_s'] if old['min_s'] else float('inf')
+        regressed = ratio > threshold and r['min_s'] - old['min_s'] > min_delta
+        flag = '  REGRESSION' if regressed else ''
+        print(f"  {r['benchmark']:<14} {r['rows']:>10,}  {old['min_s']:>9.4f}s -> {r['min_s']:>9.4f}s "
+              f"x{ratio:5.2f}  mem {old['peak_mb']:>8.1f} -> {r['peak_mb']:>8.1f} MB{flag}")
+        if regressed:
+            regressions.append(r)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'row counts (default {DEFAULT_SIZES})')
+    parser.add_argument('--only', help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark (1 above 1M rows)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='JSON output path (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio counted as regression')
+    parser.add_argument('--min-delta', type=float, default=0.001, help='ignore slowdowns below this many seconds')
+    args = parser.parse_args(argv)
+
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    meta = metadata(args.seed)
+    results = []
+    for rows in map(parse_size, args.sizes.split(',')):
+        started = time.perf_counter()
+        data = {'raw': synthetic_ohlcv(rows, seed=args.seed)}
+        if {'fib', 'mtf_trend', 'signal', 'chart'} & set(names):
+            data['mtf'] = synthetic_mtf(rows, seed=args.seed)
+        print(f"{rows:,} rows (setup {time.perf_counter() - started:.1f}s)")
+
+        repeat = args.repeat if rows <= 1000000 else 1
+        for name in names:
+            result = run_benchmark(name, data, repeat)
+            results.append(result)
+            print(f"  {name:<14} min {result['min_s']:>9.4f}s  median {result['median_s']:>9.4f}s  "
+                  f"peak {result['peak_mb']:>8.1f} MB")
+        del data
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{meta['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+    print(f"\nresults: {output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold, args.min_delta) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Startup-time benchmark: import time per module, checked against a budget.
+
+    python benchmarks/startup.py                    # every target in startup_budget.json
+    python benchmarks/startup.py utils.core --json  # one target, machine-readable
+
+Each target is imported in a fresh interpreter with `python -X importtime`, `repeat` times;
+the median cumulative time is compared with `budget_ms`, and none of the `lazy` modules
+may appear in the import graph. Exits with status 1 when a budget is exceeded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_budget.json')
+
+
+def import_times(module):
+    """
+    One cold import of `module`. Returns {module name: cumulative microseconds}.
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module, repeat=3):
+    """
+    Median import time of `module` and of everything it pulls in, over `repeat` cold runs.
+    """
+    runs = [import_times(module) for _ in range(repeat)]
+    names = set().union(*runs)
+    return {
+        name: statistics.median(run.get(name, 0) for run in runs) / 1000.0
+        for name in names
+    }
+
+
+def check(module, config, repeat=3, top=8):
+    modules_ms = measure(module, repeat)
+    total_ms = modules_ms.get(module, 0.0)
+    loaded_lazy = sorted({
+        lazy for lazy in config.get('lazy', [])
+        for name in modules_ms if name == lazy or name.startswith(lazy + '.')
+    })
+    budget_ms = config.get('budget_ms')
+
+    failures = []
+    if budget_ms is not None and total_ms > budget_ms:
+        failures.append(f"{total_ms:.0f} ms > budget {budget_ms} ms")
+    if loaded_lazy:
+        failures.append(f"eager import of {', '.join(loaded_lazy)}")
+
+    # Solo i moduli di primo livello (dipendenze dirette), i più lenti per primi
+    heaviest = sorted(((name, ms) for name, ms in modules_ms.items() if '.' not in name and name != module),
+                      key=lambda item: -item[1])[:top]
+    return {
+        'target': module,
+        'total_ms': round(total_ms, 1),
+        'budget_ms': budget_ms,
+        'project_ms': {name: round(ms, 1) for name, ms in sorted(modules_ms.items())
+                       if name.startswith('utils.') or name == module},
+        'heaviest_ms': {name: round(ms, 1) for name, ms in heaviest},
+        'eager_lazy_modules': loaded_lazy,
+        'failures': failures,
+        'ok': not failures,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('targets', nargs='*', help='modules to check (default: all in the budget file)')
+    parser.add_argument('--budget', default=DEFAULT_BUDGET, help='JSON budget file')
+    parser.add_argument('--repeat', type=int, help='cold imports per target (median is used)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    with open(args.budget) as f:
+        budget = json.load(f)
+    repeat = args.repeat or budget.get('repeat', 3)
+    targets = args.targets or list(budget['targets'])
+
+    results = [check(t, budget['targets'].get(t, {}), repeat) for t in targets]
+
+    if args.json:
+        print(json.dumps({'python': sys.version.split()[0], 'repeat': repeat, 'results': results}, indent=2))
+    else:
+        for r in results:
+            status = 'OK  ' if r['ok'] else 'FAIL'
+            print(f"{status} {r['target']:<18} {r['total_ms']:>8.1f} ms  (budget {r['budget_ms']} ms)")
+            for name, ms in r['heaviest_ms'].items():
+                print(f"       {name:<24} {ms:>8.1f} ms")
+            for failure in r['failures']:
+                print(f"       !! {failure}")
+    return 0 if all(r['ok'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
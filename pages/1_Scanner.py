@@ -0,0 +1,20 @@
+import streamlit as st
+from utils.scanner import scan_market, DEFAULT_WATCHLIST
+
+st.set_page_config(page_title="Scanner Mercato", layout="wide", page_icon="🔎")
+
+st.title("🔎 Scanner Multi-Simbolo")
+st.caption("Stessa analisi della dashboard (Trend MTF + Smart Trend Follower) su una watchlist di coppie.")
+
+watchlist_text = st.text_area("Watchlist (una coppia per riga)", "\n".join(DEFAULT_WATCHLIST), height=250)
+
+if st.button("Avvia Scansione"):
+    watchlist = [s.strip().upper() for s in watchlist_text.splitlines() if s.strip()]
+    with st.spinner(f"Scansione di {len(watchlist)} coppie (rispettando il rate limit di Kraken)..."):
+        results, info = scan_market(watchlist)
+
+    st.caption(f"Coppie analizzate: {info['scanned']}/{info['symbols']} | "
+               f"Download: {info['fetch_s']:.1f}s | Analisi: {info['analysis_s']:.1f}s")
+    if info['skipped']:
+        st.warning("Coppie escluse: " + "; ".join(f"{symbol} ({reason})" for symbol, reason in info['skipped'].items()))
+    st.dataframe(results, use_container_width=True, hide_index=True)
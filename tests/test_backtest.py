@@ -0,0 +1,58 @@
+import numpy as np
+
+from utils import backtest
+
+
+def _signals(n, side, entry, stop, target):
+    # Un solo setup sulla barra 0, ordine valido sulla barra 1
+    sig = {'below_fast': np.zeros(n, dtype=bool)}
+    for prefix in ('long_', 'short_'):
+        sig[prefix + 'setup'] = np.zeros(n, dtype=bool)
+        for name in ('entry', 'stop', 'target'):
+            sig[prefix + name] = np.full(n, np.nan)
+    sig[side + '_setup'][0] = True
+    sig[side + '_entry'][:] = entry
+    sig[side + '_stop'][:] = stop
+    sig[side + '_target'][:] = target
+    return sig
+
+
+def _arrays(open_, high, low, close):
+    n = len(close)
+    return {'timestamp': np.arange(n, dtype='int64') * 3600000, 'open': np.array(open_, dtype='float64'),
+            'high': np.array(high, dtype='float64'), 'low': np.array(low, dtype='float64'),
+            'close': np.array(close, dtype='float64')}
+
+
+def test_long_entry_bar_gapping_through_stop_exits_at_open(monkeypatch):
+    monkeypatch.setattr(backtest, 'compute_signals', lambda *args: _signals(3, 'long', 100.0, 95.0, 110.0))
+    arrays = _arrays(open_=[101, 90, 91], high=[102, 92, 93], low=[100, 89, 90], close=[101, 91, 92])
+
+    trade = backtest.run_backtest(None, arrays=arrays)['trades'].iloc[0]
+
+    assert trade['outcome'] == 'stop'
+    assert trade['entry'] == 90.0
+    assert trade['exit'] == 90.0
+    assert trade['return_pct'] <= 0
+
+
+def test_short_entry_bar_gapping_through_stop_exits_at_open(monkeypatch):
+    monkeypatch.setattr(backtest, 'compute_signals', lambda *args: _signals(3, 'short', 100.0, 105.0, 90.0))
+    arrays = _arrays(open_=[99, 110, 109], high=[100, 111, 110], low=[98, 108, 107], close=[99, 109, 108])
+
+    trade = backtest.run_backtest(None, arrays=arrays)['trades'].iloc[0]
+
+    assert trade['outcome'] == 'stop'
+    assert trade['entry'] == 110.0
+    assert trade['exit'] == 110.0
+    assert trade['return_pct'] <= 0
+
+
+def test_entry_bar_stop_without_gap_exits_at_stop(monkeypatch):
+    monkeypatch.setattr(backtest, 'compute_signals', lambda *args: _signals(3, 'long', 100.0, 95.0, 110.0))
+    arrays = _arrays(open_=[101, 101, 94], high=[102, 102, 95], low=[100, 94, 93], close=[101, 96, 94])
+
+    trade = backtest.run_backtest(None, arrays=arrays)['trades'].iloc[0]
+
+    assert trade['entry'] == 100.0
+    assert trade['exit'] == 95.0
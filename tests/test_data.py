@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+from utils import data, store
+
+HOUR_MS = 3600000
+
+
+class _FakeKraken:
+    """
+    Like Kraken: at most the last 720 candles, whatever `limit` or `since` asks for.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.now = int(time.time() * 1000) // HOUR_MS * HOUR_MS
+
+    def fetch_ohlcv(self, symbol, timeframe=None, since=None, limit=None):
+        self.calls.append({'since': since, 'limit': limit})
+        first = max(since or 0, self.now - (data.KRAKEN_MAX_CANDLES - 1) * HOUR_MS)
+        return [[ts, 1.0, 2.0, 0.5, 1.5, 3.0] for ts in range(first, self.now + 1, HOUR_MS)]
+
+
+@pytest.fixture
+def kraken(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'DB_PATH', str(tmp_path / 'candles.sqlite'))
+    exchange = _FakeKraken()
+    monkeypatch.setattr(data, 'get_exchange', lambda exchange_id: exchange)
+    monkeypatch.setattr(data, 'throttle', lambda *args, **kwargs: None)
+    return exchange
+
+
+def test_refresh_is_incremental_when_limit_exceeds_kraken_window(kraken):
+    fetch = data.fetch_crypto_data.__wrapped__
+
+    first = fetch('BTC/USD', timeframe='1h', limit=1000)
+    second = fetch('BTC/USD', timeframe='1h', limit=1000)
+
+    assert len(first) == len(second) == data.KRAKEN_MAX_CANDLES
+    assert kraken.calls[0]['since'] is None
+    # Seconda chiamata: solo dall'ultima candela salvata, non di nuovo tutta la finestra
+    assert kraken.calls[1]['since'] == kraken.now
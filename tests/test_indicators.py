@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.candles import INDICATOR_COLUMNS
+from utils.indicators import IndicatorEngine, batch_indicators
+
+pytest.importorskip('pandas_ta')
+from utils.analysis import calculate_technical_indicators  # noqa: E402
+
+
+def _ohlcv(rows, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=rows, freq='1D'),
+        'open': close * (1 + rng.normal(0, 0.002, rows)),
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'close': close,
+        'volume': rng.uniform(10, 100, rows),
+    })
+
+
+def _assert_batch_parity(result, df):
+    # L'engine conserva lo storico: il riferimento è il batch su tutto `df`, dalla prima riga di `result`
+    expected = calculate_technical_indicators(df.copy())
+    expected = expected[expected['timestamp'] >= result['timestamp'].iloc[0]].reset_index(drop=True)
+    assert list(result['timestamp']) == list(expected['timestamp'])
+    for name in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(result[name].to_numpy(), expected[name].to_numpy(),
+                                   rtol=1e-7, atol=1e-9, equal_nan=True, err_msg=name)
+
+
+def test_sync_appends_new_candles_like_the_batch_path():
+    df = _ohlcv(400)
+    engine = IndicatorEngine(dtype='float64')
+    engine.sync(df.iloc[:300].reset_index(drop=True))
+
+    result = engine.sync(df.iloc[100:].reset_index(drop=True))
+
+    assert len(result) == 300
+    _assert_batch_parity(result, df)
+    assert len(engine) == 400
+
+
+def test_sync_rebuilds_when_older_history_appears():
+    df = _ohlcv(400)
+    engine = IndicatorEngine(dtype='float64')
+    engine.sync(df.iloc[-30:].reset_index(drop=True))
+
+    result = engine.sync(df)
+
+    assert len(result) == 400
+    assert result['EMA_200'].notna().any()
+    _assert_batch_parity(result, df)
+
+
+def test_sync_rebuilds_when_a_closed_candle_is_revised():
+    df = _ohlcv(300)
+    engine = IndicatorEngine(dtype='float64')
+    engine.sync(df)
+
+    revised = df.copy()
+    revised.loc[250, 'close'] *= 1.05
+    _assert_batch_parity(engine.sync(revised), revised)
+
+
+def test_sync_revises_the_live_candle():
+    df = _ohlcv(300)
+    engine = IndicatorEngine(dtype='float64')
+    engine.sync(df)
+
+    revised = df.copy()
+    revised.loc[299, ['close', 'volume']] = [revised.loc[299, 'close'] * 0.98, 500.0]
+    _assert_batch_parity(engine.sync(revised), revised)
+
+
+def test_batch_indicators_match_the_batch_path():
+    frames = {'a': _ohlcv(400, seed=1), 'b': _ohlcv(400, seed=2), 'c': _ohlcv(250, seed=3), 'short': _ohlcv(150)}
+
+    results = batch_indicators(frames)
+
+    assert set(results) == {'a', 'b', 'c'}
+    for key, result in results.items():
+        _assert_batch_parity(result, frames[key])
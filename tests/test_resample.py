@@ -0,0 +1,84 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import resample, store
+from utils.resample import derive_timeframe, resample_ohlcv
+
+HOUR_MS = 3600000
+
+
+def _hourly(start_ms, rows):
+    close = np.arange(rows, dtype='float64') + 100
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(start_ms + np.arange(rows) * HOUR_MS, unit='ms'),
+        'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': np.ones(rows),
+    })
+
+
+@pytest.fixture
+def candle_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'DB_PATH', str(tmp_path / 'candles.sqlite'))
+
+
+@pytest.fixture
+def exchange_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(resample, 'fetch_crypto_data', lambda *args, **kwargs: calls.append((args, kwargs)))
+    return calls
+
+
+def test_resample_drops_the_partial_first_bucket_and_keeps_the_last():
+    # 02:00 -> 13:00: il primo blocco 4h (00:00) è incompleto, l'ultimo (12:00) è la candela aperta
+    df = _hourly(2 * HOUR_MS, 12)
+
+    out = resample_ohlcv(df, 240)
+
+    assert list(out['timestamp']) == list(pd.to_datetime([4 * HOUR_MS, 8 * HOUR_MS, 12 * HOUR_MS], unit='ms'))
+    first = out.iloc[0]
+    assert (first['open'], first['high'], first['low'], first['close'], first['volume']) == (102, 106, 101, 105, 4)
+    assert out.iloc[-1]['volume'] == 2
+
+
+def _derive_setup(stored_rows, fetched_at):
+    now = int(time.time() * 1000) // (4 * HOUR_MS) * (4 * HOUR_MS)
+    base = _hourly(now - 47 * HOUR_MS, 48)
+    first_ms = now - 44 * HOUR_MS
+    older = [[first_ms - (i + 1) * 4 * HOUR_MS, 1.0, 2.0, 0.5, 1.5, 3.0] for i in range(stored_rows)][::-1]
+    store.save_candles('BTC/USD', 240, older)
+    with store.get_connection() as conn:
+        conn.execute("UPDATE candle_fetches SET fetched_at = ?", (fetched_at(first_ms),))
+    return base, first_ms
+
+
+def test_derive_stitches_closed_history_from_the_store(candle_store, exchange_calls):
+    base, first_ms = _derive_setup(10, lambda first_ms: first_ms + HOUR_MS)
+
+    out = derive_timeframe(base, '4h', 20, symbol='BTC/USD')
+
+    assert exchange_calls == []
+    assert len(out) == 20
+    timestamps = out['timestamp'].to_numpy(dtype='datetime64[ms]').astype('int64')
+    assert (np.diff(timestamps) == 4 * HOUR_MS).all()
+    # 12 candele derivate dalla base (da first_ms), le 8 più vecchie dallo store
+    assert timestamps[8] == first_ms
+    assert (out['close'].iloc[:8] == 1.5).all()
+
+
+def test_derive_fetches_when_the_store_is_not_contiguous(candle_store, exchange_calls):
+    base, _ = _derive_setup(5, lambda first_ms: first_ms + HOUR_MS)
+
+    derive_timeframe(base, '4h', 20, symbol='BTC/USD')
+
+    assert len(exchange_calls) == 1
+
+
+def test_derive_fetches_when_the_last_stored_candle_was_open(candle_store, exchange_calls):
+    # Ultimo salvataggio durante la candela precedente al primo blocco derivato: era ancora aperta
+    base, _ = _derive_setup(10, lambda first_ms: first_ms - 2 * HOUR_MS)
+
+    derive_timeframe(base, '4h', 20, symbol='BTC/USD')
+
+    assert len(exchange_calls) == 1
@@ -0,0 +1,110 @@
+import socketserver
+import threading
+import time
+
+import pytest
+
+from utils.cache import _shared_call
+from utils.shared_cache import RedisBackend, SQLiteBackend
+
+
+class _RESPHandler(socketserver.StreamRequestHandler):
+    # Sottoinsieme dei comandi usati da RedisBackend: GET, SET PX [NX], EVAL (compare-and-delete)
+    def handle(self):
+        store, lock = self.server.store, self.server.lock
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                size = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(size + 2)[:-2])
+            command = args[0].upper()
+            with lock:
+                now = time.time()
+                for key in [key for key, (_, expires_at) in store.items() if expires_at <= now]:
+                    del store[key]
+                if command == b'GET':
+                    value = store.get(args[1], (None,))[0]
+                    reply = b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+                elif command == b'SET':
+                    options = [arg.upper() for arg in args[3:]]
+                    expires_at = now + int(args[3 + options.index(b'PX') + 1]) / 1000
+                    if b'NX' in options and args[1] in store:
+                        reply = b'$-1\r\n'
+                    else:
+                        store[args[1]] = (args[2], expires_at)
+                        reply = b'+OK\r\n'
+                elif command == b'EVAL':
+                    key, token = args[3], args[4]
+                    owned = store.get(key, (None,))[0] == token
+                    if owned:
+                        del store[key]
+                    reply = b':%d\r\n' % owned
+                else:
+                    reply = b'-ERR unknown command\r\n'
+            self.wfile.write(reply)
+
+
+class _RESPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+@pytest.fixture
+def redis_backend():
+    server = _RESPServer(('127.0.0.1', 0), _RESPHandler)
+    server.store, server.lock = {}, threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield RedisBackend(*server.server_address)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / 'cache.sqlite'))
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def backend(request):
+    return request.getfixturevalue(f'{request.param}_backend')
+
+
+def test_concurrent_misses_make_one_upstream_call(backend):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return {'price': 42}
+
+    results = []
+    # Ogni thread fa la parte di un worker separato: si coordinano solo tramite il backend
+    threads = [threading.Thread(target=lambda: results.append(_shared_call(backend, 'trading:test:key', 60, compute)))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 10
+    assert [status for _, _, status in results].count('miss') == 1
+
+
+def test_release_only_deletes_the_owned_lease(backend):
+    first = backend.acquire('lock:key', 0.2)
+    assert first is not None
+    assert backend.acquire('lock:key', 0.2) is None
+
+    # Lease scaduto e preso da un altro worker: il vecchio proprietario non lo cancella
+    time.sleep(0.3)
+    second = backend.acquire('lock:key', 30)
+    assert second is not None
+    backend.release('lock:key', first)
+    assert backend.acquire('lock:key', 30) is None
+
+    backend.release('lock:key', second)
+    assert backend.acquire('lock:key', 30) is not None
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import stream
+from utils.stream import CandleBuilder, StreamingAnalyzer, Trade, TradeSource
+
+HOUR_MS = 3600000
+
+
+def test_trade_source_is_abstract():
+    with pytest.raises(TypeError):
+        TradeSource()
+
+
+def test_seeded_candle_skips_trades_already_counted():
+    closed = []
+    live = {'1h': [0, 100.0, 101.0, 99.0, 100.0, 5.0]}
+    builder = CandleBuilder(('1h',), on_candle=lambda tf, candle, is_closed: is_closed and closed.append(candle),
+                            live=live, seeded_at={'1h': 1000})
+
+    # Snapshot del WebSocket: trade fino al momento del seed, già nel volume dello storico
+    builder.add_trade(Trade(500, 102.0, 1.0))
+    builder.add_trade(Trade(1000, 98.0, 1.0))
+    assert builder.live['1h'] == [0, 100.0, 101.0, 99.0, 100.0, 5.0]
+
+    builder.add_trade(Trade(1001, 103.0, 2.0))
+    assert builder.live['1h'] == [0, 100.0, 103.0, 99.0, 103.0, 7.0]
+
+    builder.add_trade(Trade(HOUR_MS, 104.0, 1.0))
+    assert closed == [[0, 100.0, 103.0, 99.0, 103.0, 7.0]]
+    assert builder.live['1h'] == [HOUR_MS, 104.0, 104.0, 104.0, 104.0, 1.0]
+
+
+def _history(rows=50):
+    now = int(time.time() * 1000) // HOUR_MS * HOUR_MS
+    close = np.linspace(100, 110, rows)
+    return {'1h': pd.DataFrame({
+        'timestamp': pd.to_datetime(now - np.arange(rows)[::-1] * HOUR_MS, unit='ms'),
+        'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': np.ones(rows),
+    })}
+
+
+def test_analyzer_does_not_double_count_the_live_candle(monkeypatch):
+    monkeypatch.setattr(stream, 'generate_trading_signal', lambda frames: {'score': 0})
+    history = _history()
+    analyzer = StreamingAnalyzer(history, min_interval=0)
+
+    analyzer.process(Trade(int(time.time() * 1000) - 1000, 110.0, 5.0))
+    assert analyzer.builder.live['1h'][5] == 1.0
+
+    analyzer.process(Trade(int(time.time() * 1000) + 10, 111.0, 2.0))
+    assert analyzer.builder.live['1h'][5] == 3.0
+
+
+def test_throttled_update_is_flushed_without_a_new_trade(monkeypatch):
+    monkeypatch.setattr(stream, 'generate_trading_signal',
+                        lambda frames: {'close': float(frames['1h']['close'].iloc[-1])})
+    signals = []
+    flushed = threading.Event()
+
+    def on_signal(signal, latency):
+        signals.append(signal)
+        if len(signals) == 2:
+            flushed.set()
+
+    history = _history()
+    analyzer = StreamingAnalyzer(history, on_signal=on_signal, min_interval=0.2)
+    ts = int(time.time() * 1000) + 10
+
+    assert analyzer.process(Trade(ts, 111.0, 1.0)) is not None
+    assert analyzer.process(Trade(ts + 1, 112.0, 1.0)) is None
+    assert analyzer.process(Trade(ts + 2, 113.0, 1.0)) is None
+
+    # Nessun altro trade: l'ultimo aggiornamento arriva comunque dal flush
+    assert flushed.wait(2)
+    assert signals[-1] == {'close': 113.0}
+    assert len(signals) == 2
@@ -0,0 +1,146 @@
+"""
+Headless entry point: runs the dashboard analysis without starting Streamlit.
+
+    python trading.py analyze --symbol BTC/USDT --json
+    python trading.py scan --symbols BTC/USDT ETH/USDT
+    python trading.py backfill --timeframe 15m --days 730
+    python trading.py dataset research --symbols bitstamp:BTC/USD --timeframe 15m
+"""
+import argparse
+import json
+import logging
+import sys
+
+
+def _print_analysis(summary):
+    signal = summary['signal']
+    print(f"{summary['symbol']}  {summary['price']}  ({summary['change_pct'] or 0:.2f}%)")
+    print(f"Segnale: {signal['opinion']} (score {signal['score']}) - {signal['advice']}")
+    print(f"Trend 1H: {summary['trend']}  RSI: {summary['rsi'] or 0:.1f}  MTF: {summary['mtf_score']}")
+    for tf, status in summary['mtf'].items():
+        print(f"  {tf}: {status}")
+    for reason in signal['reasons']:
+        print(f"  - {reason}")
+    print(f"DXY: {summary['dxy']['trend']}  Sentiment: {summary['sentiment']['label']}")
+    for error in summary['errors']:
+        print(f"[{error['level']}] {error['source']}: {error['message']}", file=sys.stderr)
+
+
+def cmd_analyze(args):
+    from utils.core import run_analysis, summarize
+    from utils.profiler import Trace
+
+    trace = Trace('analyze', cprofile=args.cprofile, sample_interval=args.sample)
+    with trace:
+        summary = summarize(run_analysis(args.symbol))
+    if args.profile:
+        for path in trace.dump(args.profile):
+            print(f"profile: {path}", file=sys.stderr)
+    if args.json:
+        print(json.dumps(summary, indent=2, default=str))
+    else:
+        _print_analysis(summary)
+    return 1 if not summary['candles']['1h'] else 0
+
+
+def cmd_scan(args):
+    from utils.scanner import scan_market
+
+    results, info = scan_market(args.symbols or None, max_workers=args.workers)
+    if args.json:
+        print(json.dumps({'results': json.loads(results.to_json(orient='records')), 'info': info}, indent=2))
+    else:
+        print(results.to_string(index=False))
+        print(f"{info['scanned']}/{info['symbols']} simboli in {info['fetch_s'] + info['analysis_s']:.1f}s")
+        for symbol, reason in info['skipped'].items():
+            print(f"[skip] {symbol}: {reason}", file=sys.stderr)
+    return 0
+
+
+def cmd_backfill(args):
+    from datetime import datetime, timezone
+
+    from utils.backfill import backfill_history
+
+    info = backfill_history(args.symbol, timeframe=args.timeframe, days=args.days,
+                            exchange_id=args.exchange, max_workers=args.workers)
+    if args.json:
+        print(json.dumps(info, indent=2, default=str))
+        return 0 if not info['errors'] else 1
+
+    def _day(ms):
+        return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+
+    verify = info['verify']
+    print(f"{info['symbol']} {info['timeframe']} da {info['exchange']}: {info['saved']} candele salvate, "
+          f"{info['complete']}/{info['chunks']} chunk completi ({info['resumed']} già presenti), "
+          f"{info['duplicates']} duplicati scartati")
+    print(f"Store: {verify['candles']}/{verify['expected']} candele, {len(verify['gaps'])} buchi, "
+          f"{verify['off_grid']} fuori griglia")
+    for first, last, count in verify['gaps'][:10]:
+        print(f"  buco {_day(first)} -> {_day(last)} ({count} candele)")
+    for start, error in info['errors'].items():
+        print(f"[error] chunk {_day(start)}: {error}", file=sys.stderr)
+    return 0 if not info['errors'] else 1
+
+
+def cmd_dataset(args):
+    import time
+
+    from utils.data import TIMEFRAME_MINUTES
+    from utils.dataset import write_dataset
+
+    since = int((time.time() - args.days * 86400) * 1000) if args.days else None
+    dataset = write_dataset(args.name, args.symbols, TIMEFRAME_MINUTES[args.timeframe], since=since,
+                            dtype=args.dtype)
+    for symbol, (_, rows, first, last) in dataset.index.items():
+        print(f"{symbol}: {rows} candele" + (f" ({first} -> {last})" if rows else ""))
+    print(f"{dataset.path}: {len(dataset)} righe, {dataset.values.nbytes + dataset.timestamp.nbytes} byte")
+    return 0 if len(dataset) else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='trading', description='BTC trading assistant (headless).')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log data-layer errors to stderr')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    analyze = commands.add_parser('analyze', help='run the dashboard analysis for one symbol')
+    analyze.add_argument('--symbol', default='BTC/USDT')
+    analyze.add_argument('--json', action='store_true', help='machine-readable output')
+    analyze.add_argument('--profile', metavar='DIR', help='write per-stage spans (Chrome trace) to DIR')
+    analyze.add_argument('--cprofile', action='store_true', help='also capture cProfile stats (.prof)')
+    analyze.add_argument('--sample', type=float, metavar='SECONDS',
+                         help='also sample stacks every SECONDS (.folded, for flamegraphs)')
+    analyze.set_defaults(func=cmd_analyze)
+
+    scan = commands.add_parser('scan', help='rank a watchlist by signal strength')
+    scan.add_argument('--symbols', nargs='*', help='default: utils.scanner.DEFAULT_WATCHLIST')
+    scan.add_argument('--workers', type=int, default=8)
+    scan.add_argument('--json', action='store_true', help='machine-readable output')
+    scan.set_defaults(func=cmd_scan)
+
+    backfill = commands.add_parser('backfill', help='fill deep OHLCV history into the local store (resumable)')
+    backfill.add_argument('--symbol', default='BTC/USDT')
+    backfill.add_argument('--timeframe', default='1h', choices=['15m', '1h', '4h', '1d'])
+    backfill.add_argument('--days', type=int, default=365)
+    backfill.add_argument('--exchange', help='default: utils.backfill.BACKFILL_EXCHANGE')
+    backfill.add_argument('--workers', type=int, default=4)
+    backfill.add_argument('--json', action='store_true', help='machine-readable output')
+    backfill.set_defaults(func=cmd_backfill)
+
+    dataset = commands.add_parser('dataset', help='export stored candles to a memory-mapped research dataset')
+    dataset.add_argument('name', help='dataset name (under data/datasets) or directory')
+    dataset.add_argument('--symbols', nargs='+', default=['BTC/USD'], help='store symbols, e.g. BTC/USD or bitstamp:BTC/USD (backfill)')
+    dataset.add_argument('--timeframe', default='1h', choices=['15m', '1h', '4h', '1d'])
+    dataset.add_argument('--days', type=int, help='only the last DAYS days (default: everything stored)')
+    dataset.add_argument('--dtype', default='float64', choices=['float64', 'float32'])
+    dataset.set_defaults(func=cmd_dataset)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.verbose else logging.CRITICAL,
+                        format='%(levelname)s %(name)s: %(message)s')
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
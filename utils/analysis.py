@@ -1,8 +1,10 @@
 
-import pandas_ta as ta
 import pandas as pd
 import numpy as np
 
+from utils.profiler import profiled
+
+@profiled()
 def calculate_technical_indicators(df):
     """
     Calculate technical indicators: RSI, MACD, Bollinger Bands, EMAs, Volume SMA.
@@ -10,26 +12,24 @@ def calculate_technical_indicators(df):
     if df.empty:
         return df
 
+    # Import pesante (~0.7s): registra l'accessor df.ta solo al primo uso
+    import pandas_ta  # noqa: F401
+
     # RSI
     df['RSI'] = df.ta.rsi(length=14)
 
-    # MACD
+    # MACD e Bollinger: colonne assegnate al frame esistente (pd.concat copiava tutto il frame)
     macd = df.ta.macd(fast=12, slow=26, signal=9)
-    df = pd.concat([df, macd], axis=1)
+    if macd is not None:
+        for col in macd.columns:
+            df[col] = macd[col]
 
     # Bollinger Bands
     bbands = df.ta.bbands(length=20, std=2)
     if bbands is not None and not bbands.empty:
-        new_names = {}
         for col in bbands.columns:
-            if col.startswith('BBL'): new_names[col] = 'BBL'
-            elif col.startswith('BBM'): new_names[col] = 'BBM'
-            elif col.startswith('BBU'): new_names[col] = 'BBU'
-            elif col.startswith('BBB'): new_names[col] = 'BBB'
-            elif col.startswith('BBP'): new_names[col] = 'BBP'
-        bbands.rename(columns=new_names, inplace=True)
-    
-    df = pd.concat([df, bbands], axis=1)
+            name = next((p for p in ('BBL', 'BBM', 'BBU', 'BBB', 'BBP') if col.startswith(p)), col)
+            df[name] = bbands[col]
 
     # EMAs
     df['EMA_50'] = df.ta.ema(length=50)
@@ -41,15 +41,16 @@ def calculate_technical_indicators(df):
     
     return df
 
-def calculate_fibonacci_levels(df):
+@profiled()
+def calculate_fibonacci_levels(df, window=100):
     """
     Calculate Fibonacci retracement levels based on the recent high and low.
     """
     if df.empty:
         return {}
     
-    recent_high = df['high'].rolling(window=100).max().iloc[-1]
-    recent_low = df['low'].rolling(window=100).min().iloc[-1]
+    recent_high = df['high'].rolling(window=window).max().iloc[-1]
+    recent_low = df['low'].rolling(window=window).min().iloc[-1]
     
     diff = recent_high - recent_low
     levels = {
@@ -62,47 +63,95 @@ def calculate_fibonacci_levels(df):
     }
     return levels
 
+def _find_pivots(df, window):
+    """
+    Return (prices, positions) of local highs/lows: bars whose high (low) is the max (min)
+    of the centered `window`. The input frame is not modified.
+    """
+    high = df['high']
+    low = df['low']
+    is_high = (high == high.rolling(window=window, center=True).max()).to_numpy()
+    is_low = (low == low.rolling(window=window, center=True).min()).to_numpy()
+
+    high_pos = np.flatnonzero(is_high)
+    low_pos = np.flatnonzero(is_low)
+    prices = np.concatenate([high.to_numpy(dtype='float64')[high_pos], low.to_numpy(dtype='float64')[low_pos]])
+    positions = np.concatenate([high_pos, low_pos])
+    return prices, positions
+
+def _cluster_pivots(prices, tolerance):
+    """
+    Sort pivot prices and split them into clusters wherever the gap to the previous
+    pivot exceeds `tolerance`. Returns (order, starts): sorting permutation and the
+    start offset of each cluster in the sorted array.
+    """
+    order = np.argsort(prices, kind='stable')
+    sorted_prices = prices[order]
+    breaks = sorted_prices[1:] > sorted_prices[:-1] * (1 + tolerance)
+    starts = np.flatnonzero(np.r_[True, breaks])
+    return order, starts
+
+def score_historical_levels(df, window=20, tolerance=0.02, half_life=None):
+    """
+    Historical Support/Resistance levels with a strength score.
+    Each level is the average of a cluster of pivots; `touches` is the number of pivots in
+    the cluster and `score` weights touches by recency (halved every `half_life` bars,
+    default half of the history). Returns a DataFrame sorted by level.
+    """
+    columns = ['level', 'touches', 'last_touch', 'bars_ago', 'score']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    prices, positions = _find_pivots(df, window)
+    if len(prices) == 0:
+        return pd.DataFrame(columns=columns)
+
+    order, starts = _cluster_pivots(prices, tolerance)
+    sorted_prices = prices[order]
+    sorted_positions = positions[order]
+
+    touches = np.diff(np.r_[starts, len(sorted_prices)])
+    levels = np.add.reduceat(sorted_prices, starts) / touches
+    last_pos = np.maximum.reduceat(sorted_positions, starts)
+    bars_ago = len(df) - 1 - last_pos
+
+    half_life = half_life or max(len(df) / 2, 1)
+    score = touches * np.power(0.5, bars_ago / half_life)
+
+    if 'timestamp' in df.columns:
+        last_touch = df['timestamp'].to_numpy()[last_pos]
+    else:
+        last_touch = df.index.to_numpy()[last_pos]
+
+    return pd.DataFrame({
+        'level': levels,
+        'touches': touches,
+        'last_touch': last_touch,
+        'bars_ago': bars_ago,
+        'score': score,
+    })
+
+@profiled()
 def calculate_historical_levels(df, window=20, tolerance=0.02):
     """
     Identify historical Support/Resistance levels based on Price Pivots (Highs/Lows)
     over a long period.
+    Vectorized: pivots via rolling max/min, clustering via sort + diff/cumsum.
     """
     if df.empty:
         return []
-    
-    levels = []
-    
-    # Identify local highs and lows
-    # We use a rolling window to find points that are the max/min of their neighborhood
-    df['is_high'] = df['high'] == df['high'].rolling(window=window, center=True).max()
-    df['is_low'] = df['low'] == df['low'].rolling(window=window, center=True).min()
-    
-    highs = df[df['is_high']]['high'].tolist()
-    lows = df[df['is_low']]['low'].tolist()
-    
-    all_pivots = sorted(highs + lows)
-    
-    # Cluster levels that are close to each other
-    if not all_pivots:
+
+    prices, _ = _find_pivots(df, window)
+    if len(prices) == 0:
         return []
-        
-    merged_levels = []
-    current_cluster = [all_pivots[0]]
-    
-    for i in range(1, len(all_pivots)):
-        if all_pivots[i] <= current_cluster[-1] * (1 + tolerance):
-            current_cluster.append(all_pivots[i])
-        else:
-            # Average the cluster to get a single strong level
-            merged_levels.append(sum(current_cluster) / len(current_cluster))
-            current_cluster = [all_pivots[i]]
-            
-    merged_levels.append(sum(current_cluster) / len(current_cluster))
-    
-    # Filter only significant levels (e.g. those tested multiple times would be better, 
-    # but for now we essentially have all major pivots)
-    return merged_levels
 
+    # Cluster levels that are close to each other and average each cluster
+    order, starts = _cluster_pivots(prices, tolerance)
+    sorted_prices = prices[order]
+    counts = np.diff(np.r_[starts, len(sorted_prices)])
+    return (np.add.reduceat(sorted_prices, starts) / counts).tolist()
+
+@profiled()
 def analyze_trend(df):
     """
     Simple trend analysis for display.
@@ -150,41 +199,108 @@ def detect_structure(df, window=5):
     else:
         return "Range / Consolidamento"
 
+# Etichette mostrate in dashboard per ogni colonna della matrice dei pattern
+PATTERN_LABELS = {
+    'pin_bar_bull': "Pin Bar Rialzista (Hammer)",
+    'pin_bar_bear': "Pin Bar Ribassista (Shooting Star)",
+    'engulfing_bull': "Bullish Engulfing",
+    'engulfing_bear': "Bearish Engulfing",
+    'doji': "Doji (Indecisione)",
+    'inside_bar': "Inside Bar",
+    'outside_bar': "Outside Bar",
+    'morning_star': "Morning Star",
+    'evening_star': "Evening Star",
+    'three_white_soldiers': "Tre Soldati Bianchi",
+    'three_black_crows': "Tre Corvi Neri",
+}
+
+BULLISH_PATTERNS = ['pin_bar_bull', 'engulfing_bull', 'morning_star', 'three_white_soldiers']
+BEARISH_PATTERNS = ['pin_bar_bear', 'engulfing_bear', 'evening_star', 'three_black_crows']
+
+@profiled()
+def scan_patterns(df):
+    """
+    Tag every bar with the candlestick patterns it completes.
+    Returns a boolean DataFrame (same index as df, one column per PATTERN_LABELS key),
+    computed in a single vectorized pass over the OHLC arrays.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=list(PATTERN_LABELS), dtype=bool)
+
+    o = df['open'].to_numpy(dtype='float64')
+    h = df['high'].to_numpy(dtype='float64')
+    l = df['low'].to_numpy(dtype='float64')
+    c = df['close'].to_numpy(dtype='float64')
+
+    def shift(a, n):
+        out = np.full_like(a, np.nan)
+        out[n:] = a[:-n]
+        return out
+
+    body = np.abs(c - o)
+    upper_wick = h - np.maximum(c, o)
+    lower_wick = np.minimum(c, o) - l
+    total_range = h - l
+    green = c > o
+    red = c < o
+
+    o1, h1, l1, c1 = shift(o, 1), shift(h, 1), shift(l, 1), shift(c, 1)
+    o2, c2 = shift(o, 2), shift(c, 2)
+    body1 = np.abs(c1 - o1)
+    body2 = np.abs(c2 - o2)
+    range2 = shift(total_range, 2)
+    green1, red1 = c1 > o1, c1 < o1
+    green2, red2 = c2 > o2, c2 < o2
+
+    # Pin Bar (Hammer/Shooting Star-like)
+    pin_bull = (total_range > 0) & (lower_wick > body * 2) & (upper_wick < body)
+    pin_bear = (total_range > 0) & (upper_wick > body * 2) & (lower_wick < body) & ~pin_bull
+
+    # Engulfing: the current body covers the previous one in the opposite direction
+    engulf_bull = red1 & green & (c > o1) & (o < c1)
+    engulf_bear = green1 & red & (c < o1) & (o > c1)
+
+    doji = (total_range > 0) & (body <= 0.1 * total_range)
+    inside = (h < h1) & (l > l1)
+    outside = (h > h1) & (l < l1)
+
+    # Star: long body, small "star" body, then a close beyond the midpoint of the first body
+    long_first = body2 > 0.5 * range2
+    small_star = body1 < 0.3 * body2
+    morning = red2 & long_first & small_star & green & (c > (o2 + c2) / 2)
+    evening = green2 & long_first & small_star & red & (c < (o2 + c2) / 2)
+
+    # Three soldiers/crows: three same-colour bars, each opening inside the previous body
+    soldiers = (green & green1 & green2 & (c > c1) & (c1 > c2)
+                & (o > o1) & (o < c1) & (o1 > o2) & (o1 < c2))
+    crows = (red & red1 & red2 & (c < c1) & (c1 < c2)
+             & (o < o1) & (o > c1) & (o1 < o2) & (o1 > c2))
+
+    return pd.DataFrame({
+        'pin_bar_bull': pin_bull,
+        'pin_bar_bear': pin_bear,
+        'engulfing_bull': engulf_bull,
+        'engulfing_bear': engulf_bear,
+        'doji': doji,
+        'inside_bar': inside,
+        'outside_bar': outside,
+        'morning_star': morning,
+        'evening_star': evening,
+        'three_white_soldiers': soldiers,
+        'three_black_crows': crows,
+    }, index=df.index)
+
+@profiled()
 def detect_patterns(df):
     """
-    Detect basic candlestick patterns on the last completed candle.
+    Detect candlestick patterns on the last completed candle.
     """
     if df.empty:
         return []
-    
-    row = df.iloc[-1]
-    prev = df.iloc[-2]
-    
-    patterns = []
-    
-    body = abs(row['close'] - row['open'])
-    upper_wick = row['high'] - max(row['close'], row['open'])
-    lower_wick = min(row['close'], row['open']) - row['low']
-    total_range = row['high'] - row['low']
-    
-    # Pin Bar (Hammer/Shooting Star-like)
-    if total_range > 0 and lower_wick > (body * 2) and upper_wick < body:
-        patterns.append("Pin Bar Rialzista (Hammer)")
-    elif total_range > 0 and upper_wick > (body * 2) and lower_wick < body:
-        patterns.append("Pin Bar Ribassista (Shooting Star)")
-        
-    # Engulfing
-    # Bullish: Previous Red, Current Green and covers previous body + wick
-    if prev['close'] < prev['open'] and row['close'] > row['open']:
-         if row['close'] > prev['open'] and row['open'] < prev['close']:
-             patterns.append("Bullish Engulfing")
-             
-    # Bearish: Previous Green, Current Red
-    if prev['close'] > prev['open'] and row['close'] < row['open']:
-         if row['close'] < prev['open'] and row['open'] > prev['close']:
-             patterns.append("Bearish Engulfing")
-             
-    return patterns
+
+    # Bastano le ultime 3 candele per tutti i pattern
+    last = scan_patterns(df.iloc[-3:]).iloc[-1]
+    return [PATTERN_LABELS[name] for name, found in last.items() if found]
 
 def analyze_volume(df):
     """
@@ -203,12 +319,26 @@ def analyze_volume(df):
     else:
         return "Normale"
 
-def generate_trading_signal(mtf_data):
+# Soglie della strategia "Smart Trend Follower" (usate anche da backtest e ottimizzatore)
+SIGNAL_PARAMS = {
+    'rsi_long_max': 70,          # RSI > 70: vietato comprare
+    'rsi_long_oversold': 35,     # RSI < 35: occasione long
+    'rsi_short_min': 30,         # RSI < 30: vietato vendere
+    'rsi_short_overbought': 65,  # RSI > 65: occasione short
+    'long_stop_mult': 0.99,      # Stop long: EMA 200 H1 * 0.99
+    'short_stop_mult': 1.01,     # Stop short: EMA 200 H1 * 1.01
+    'fib_window': 100,           # Finestra H1 per i livelli di Fibonacci
+}
+
+@profiled()
+def generate_trading_signal(mtf_data, params=None):
     """
     LOGICA STRATEGICA AGGIORNATA: "SMART TREND FOLLOWER"
     OBIETTIVO: Identificare la tendenza primaria e sfruttare i ritracciamenti.
     Note: Requires mtf_data with '1d', '4h', '1h' keys containing dataframes with indicators.
+    `params` overrides SIGNAL_PARAMS (soglie RSI, moltiplicatori stop, finestra Fibonacci).
     """
+    p = dict(SIGNAL_PARAMS, **(params or {}))
     # Initialize default response
     default_response = {
         "opinion": "DATI INSUFFICIENTI",
@@ -216,7 +346,8 @@ def generate_trading_signal(mtf_data):
         "reasons": [],
         "advice": "Dati insufficienti per generare un segnale affidabile.",
         "color": "gray",
-        "structure": "N/A"
+        "structure": "N/A",
+        "direction": "NEUTRAL"
     }
 
     # Extract dataframes
@@ -314,27 +445,27 @@ def generate_trading_signal(mtf_data):
     can_trade = True
     
     if bias_fondo == "LONG":
-        if h1_rsi > 70:
-            reasons.append("⚠️ RSI > 70: Mercato Ipercomprato. Vietato Comprare.")
-            advice_text = "Mercato Euforico (RSI > 70). Non entrare ora, rischio correzione immediata."
+        if h1_rsi > p['rsi_long_max']:
+            reasons.append(f"⚠️ RSI > {p['rsi_long_max']}: Mercato Ipercomprato. Vietato Comprare.")
+            advice_text = f"Mercato Euforico (RSI > {p['rsi_long_max']}). Non entrare ora, rischio correzione immediata."
             can_trade = False
             opinion_header = "NEUTRAL (RSI HIGH)"
             rsi_state = "IPERCOMPRATO"
-        elif h1_rsi < 35:
-            reasons.append("✅ RSI < 35: Mercato Ipervenduto (Occasione).")
-            advice_text = "RSI in zona di Panico/Sconto (< 35). Ottimo per cercare ingressi se su supporto."
+        elif h1_rsi < p['rsi_long_oversold']:
+            reasons.append(f"✅ RSI < {p['rsi_long_oversold']}: Mercato Ipervenduto (Occasione).")
+            advice_text = f"RSI in zona di Panico/Sconto (< {p['rsi_long_oversold']}). Ottimo per cercare ingressi se su supporto."
             rsi_state = "IPERVENDUTO"
     
     elif bias_fondo == "SHORT":
-        if h1_rsi < 30:
-            reasons.append("⚠️ RSI < 30: Mercato Ipervenduto. Vietato Vendere.")
-            advice_text = "Mercato Stanco (RSI < 30). Non shortare ora, rischio rimbalzo."
+        if h1_rsi < p['rsi_short_min']:
+            reasons.append(f"⚠️ RSI < {p['rsi_short_min']}: Mercato Ipervenduto. Vietato Vendere.")
+            advice_text = f"Mercato Stanco (RSI < {p['rsi_short_min']}). Non shortare ora, rischio rimbalzo."
             can_trade = False
             opinion_header = "NEUTRAL (RSI LOW)"
             rsi_state = "IPERVENDUTO"
-        elif h1_rsi > 65:
-            reasons.append("✅ RSI > 65: Rimbalzo tecnico (Occasione Short).")
-            advice_text = "RSI in zona di 'respiro' (> 65). Ottimo per cercare ingressi Short."
+        elif h1_rsi > p['rsi_short_overbought']:
+            reasons.append(f"✅ RSI > {p['rsi_short_overbought']}: Rimbalzo tecnico (Occasione Short).")
+            advice_text = f"RSI in zona di 'respiro' (> {p['rsi_short_overbought']}). Ottimo per cercare ingressi Short."
             rsi_state = "IPERCOMPRATO"
 
     # --- FASE 4: CALCOLO LIVELLI OPERATIVI (Smart Levels) ---
@@ -345,7 +476,7 @@ def generate_trading_signal(mtf_data):
     # Utilizziamo i livelli calcolati precedentemente o calcoliamoli qui se necessario
     
     if can_trade:
-        fib_levels = calculate_fibonacci_levels(df_1h) # Usiamo H1 per livelli operativi
+        fib_levels = calculate_fibonacci_levels(df_1h, window=p['fib_window']) # Usiamo H1 per livelli operativi
         
         # Trova livelli vicini
         supports = sorted([v for k,v in fib_levels.items() if v < h1_close], reverse=True)
@@ -371,7 +502,7 @@ def generate_trading_signal(mtf_data):
             entry_zone_low = sup_2
             entry_zone_high = sup_1
             target = res_1
-            invalidazione = h1_ema200 * 0.99
+            invalidazione = h1_ema200 * p['long_stop_mult']
             
             advice_text = (
                 f"Non operare contro il trend primario. L'azione consigliata è ATTENDERE che il prezzo ritracci verso la zona di valore "
@@ -388,7 +519,7 @@ def generate_trading_signal(mtf_data):
             entry_zone_low = res_1
             entry_zone_high = res_2
             target = sup_1
-            invalidazione = h1_ema200 * 1.01
+            invalidazione = h1_ema200 * p['short_stop_mult']
             
             advice_text = (
                 f"Non operare contro il trend primario. L'azione consigliata è ATTENDERE che il prezzo rimbalzi verso la zona di offerta "
@@ -420,15 +551,20 @@ def generate_trading_signal(mtf_data):
     if bias_fondo == "LONG": score += 5
     if can_trade: score += 2
 
+    # Direzione operativa esplicita (i consumatori non devono interpretare il testo dell'opinione)
+    direction = "LONG" if opinion_header.startswith("BULLISH") else "SHORT" if opinion_header.startswith("BEARISH") else "NEUTRAL"
+
     return {
         "opinion": opinion_header,
         "score": score,
         "reasons": reasons,
         "advice": final_advice, # Contains both Analysis Context and Operational Advice
         "color": color,
-        "structure": structure
+        "structure": structure,
+        "direction": direction
     }
 
+@profiled()
 def analyze_mtf_trend(dfs_dict):
     """
     Analyze trend across multiple timeframes (15m, 1h, 4h, 1d).
@@ -448,6 +584,7 @@ def analyze_mtf_trend(dfs_dict):
         valid_tfs += 1
         # Recalculate basic EMAs if missing (simple check)
         if 'EMA_50' not in df.columns:
+            import pandas_ta  # noqa: F401  (registra df.ta, come in calculate_technical_indicators)
             df['EMA_50'] = df.ta.ema(length=50)
             df['EMA_200'] = df.ta.ema(length=200)
             
@@ -480,9 +617,12 @@ def analyze_mtf_trend(dfs_dict):
         
     return results, score_text
 
-def analyze_dxy_correlation(dxy_df, btc_trend):
+@profiled()
+def analyze_dxy_correlation(dxy_df, direction, btc_dxy_corr=None):
     """
-    Analyze DXY trend and warn if it contradicts BTC position.
+    Analyze DXY trend and warn if it contradicts the BTC signal direction ("LONG"/"SHORT").
+    With the rolling BTC/DXY correlation (utils/correlation.py) the warning is raised only
+    while the two actually move inversely (correlation < 0).
     """
     if dxy_df.empty:
         return "N/A", None, 0
@@ -498,14 +638,17 @@ def analyze_dxy_correlation(dxy_df, btc_trend):
     
     dxy_trend = "Neutrale"
     warning = None
-    
+    known_corr = btc_dxy_corr is not None and not pd.isna(btc_dxy_corr)
+    inverse = not known_corr or btc_dxy_corr < 0
+    corr_note = f" (correlazione BTC/DXY {btc_dxy_corr:+.2f})" if known_corr else ""
+
     if dxy_close > sma_20 * 1.002: # 0.2% filter
         dxy_trend = "Rialzista (USD Forte) 💵"
-        if "LONG" in btc_trend or "Bullish" in btc_trend:
-             warning = "⚠️ DXY in salita: Rischio per i Long su BTC!"
+        if direction == "LONG" and inverse:
+             warning = f"⚠️ DXY in salita: Rischio per i Long su BTC!{corr_note}"
     elif dxy_close < sma_20 * 0.998:
         dxy_trend = "Ribassista (USD Debole) 📉"
-        if "SHORT" in btc_trend or "Bearish" in btc_trend:
-             warning = "⚠️ DXY in discesa: Rischio per gli Short su BTC!"
-             
+        if direction == "SHORT" and inverse:
+             warning = f"⚠️ DXY in discesa: Rischio per gli Short su BTC!{corr_note}"
+
     return dxy_trend, warning, dxy_change
@@ -0,0 +1,172 @@
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+
+import numpy as np
+
+from utils.data import TIMEFRAME_MINUTES, to_exchange_symbol
+from utils.exchange import get_exchange, throttle
+from utils.profiler import profiled, span
+from utils.runtime import logger
+from utils.store import get_connection, save_candles
+
+# Kraken restituisce solo le ultime 720 candele qualunque sia `since`: lo storico profondo
+# viene da un exchange che pagina l'OHLC all'indietro, salvato nello store sotto una chiave
+# propria ('bitstamp:BTC/USD') per non mescolare prezzi e volumi con la serie live di Kraken
+BACKFILL_EXCHANGE = os.environ.get('TRADING_BACKFILL_EXCHANGE', 'bitstamp')
+
+PAGE_LIMIT = 1000  # candele per richiesta (massimo Bitstamp)
+CHUNK_CANDLES = 5000  # candele per chunk: l'unità di lavoro parallela e di ripresa
+DAY_MS = 86400000
+
+
+def backfill_key(symbol, exchange_id=None):
+    """
+    Store symbol of the backfilled series of `symbol` (exchange-qualified, e.g. 'bitstamp:BTC/USD').
+    """
+    return f"{exchange_id or BACKFILL_EXCHANGE}:{to_exchange_symbol(symbol)}"
+
+
+def _ensure_schema(conn):
+    # Stato di ogni chunk: un job interrotto riparte dai chunk non ancora completi
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_chunks (
+            symbol TEXT NOT NULL,
+            timeframe INTEGER NOT NULL,
+            start INTEGER NOT NULL,
+            end INTEGER NOT NULL,
+            exchange TEXT,
+            status TEXT,
+            rows INTEGER,
+            missing INTEGER,
+            updated_at INTEGER,
+            PRIMARY KEY (symbol, timeframe, start)
+        ) WITHOUT ROWID
+    """)
+
+
+def missing_runs(timestamps, since, before, tf_ms):
+    """
+    Runs of candles missing from sorted `timestamps` on the [since, before) grid of `tf_ms`:
+    a list of (first missing ms, last missing ms, count).
+    """
+    expected = np.arange(since, before, tf_ms, dtype='int64')
+    missing = np.setdiff1d(expected, np.asarray(timestamps, dtype='int64'), assume_unique=True)
+    if not len(missing):
+        return []
+    breaks = np.flatnonzero(np.diff(missing) != tf_ms) + 1
+    return [(int(run[0]), int(run[-1]), len(run)) for run in np.split(missing, breaks)]
+
+
+def verify_history(symbol, timeframe, since, before, db_path=None):
+    """
+    Check the stored candles of symbol/timeframe (minutes) in [since, before) ms:
+    {'candles', 'expected', 'gaps': missing_runs(...), 'off_grid': candles not aligned to the timeframe}.
+    Duplicates cannot be stored (the store is keyed by timestamp); they are dropped and counted
+    while fetching.
+    """
+    tf_ms = int(timeframe) * 60000
+    with closing(get_connection(db_path)) as conn:
+        rows = conn.execute(
+            "SELECT timestamp FROM candles WHERE symbol = ? AND timeframe = ? AND timestamp >= ? AND timestamp < ? "
+            "ORDER BY timestamp", (symbol, int(timeframe), int(since), int(before))).fetchall()
+    timestamps = np.fromiter((row[0] for row in rows), dtype='int64', count=len(rows))
+    on_grid = timestamps[timestamps % tf_ms == 0]
+    return {
+        'candles': len(timestamps),
+        'expected': len(range(since, before, tf_ms)),
+        'gaps': missing_runs(on_grid, since, before, tf_ms),
+        'off_grid': int(len(timestamps) - len(on_grid)),
+    }
+
+
+def _fetch_chunk(exchange, exchange_id, symbol, timeframe, start, end):
+    """
+    Page one chunk forward with `since` cursors. Returns (rows sorted and unique, duplicates dropped).
+    """
+    tf_ms = TIMEFRAME_MINUTES[timeframe] * 60000
+    rows = {}
+    duplicates = 0
+    cursor = start
+    while cursor < end:
+        throttle(exchange_id)
+        with span('backfill.fetch_ohlcv', symbol=symbol, timeframe=timeframe, since=cursor):
+            page = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=cursor,
+                                        limit=max(1, min(PAGE_LIMIT, (end - cursor) // tf_ms)))
+        page = [candle for candle in page if cursor <= candle[0] < end]
+        if not page:
+            break  # nessun dato oltre il cursore: buco dell'exchange o inizio dello storico
+        for candle in page:
+            duplicates += candle[0] in rows
+            rows[candle[0]] = candle
+        cursor = page[-1][0] + tf_ms
+    return [rows[ts] for ts in sorted(rows)], duplicates
+
+
+@profiled()
+def backfill_history(symbol='BTC/USDT', timeframe='1h', days=365, exchange_id=None, max_workers=4,
+                     db_path=None):
+    """
+    Fill `days` of symbol/timeframe candles into the local store under backfill_key(), newest
+    chunks first; the live series fetched by fetch_crypto_data is never touched.
+    The range is split into fixed CHUNK_CANDLES chunks (aligned to the epoch, so reruns
+    see the same chunks) fetched concurrently; every request goes through the shared
+    utils.exchange.throttle bucket. Each chunk is checked for gaps and duplicates before
+    being marked complete, so an interrupted or failed job resumes from the missing chunks.
+    Returns an info dict with the per-chunk outcome and a final verify_history() of the range.
+    """
+    minutes = TIMEFRAME_MINUTES[timeframe]
+    timeframe = next(name for name, value in TIMEFRAME_MINUTES.items() if value == minutes)
+    exchange_id = exchange_id or BACKFILL_EXCHANGE
+    symbol = to_exchange_symbol(symbol)
+    key = backfill_key(symbol, exchange_id)
+    tf_ms = minutes * 60000
+    chunk_ms = CHUNK_CANDLES * tf_ms
+
+    now_ms = int(time.time() * 1000)
+    closed = now_ms // tf_ms * tf_ms  # inizio della candela ancora aperta
+    since = (now_ms - days * DAY_MS) // tf_ms * tf_ms
+    first = since // chunk_ms * chunk_ms
+    chunks = [(start, min(start + chunk_ms, closed + tf_ms)) for start in range(first, closed + tf_ms, chunk_ms)][::-1]
+
+    with closing(get_connection(db_path)) as conn:
+        _ensure_schema(conn)
+        done = {row[0] for row in conn.execute(
+            "SELECT start FROM backfill_chunks WHERE symbol = ? AND timeframe = ? AND status = 'done'",
+            (key, minutes))}
+        conn.commit()
+    pending = [chunk for chunk in chunks if chunk[0] not in done]
+
+    info = {'symbol': key, 'timeframe': timeframe, 'exchange': exchange_id, 'chunks': len(chunks),
+            'resumed': len(chunks) - len(pending), 'complete': 0, 'partial': 0, 'saved': 0,
+            'duplicates': 0, 'errors': {}}
+    if pending:
+        exchange = get_exchange(exchange_id)
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as pool:
+            futures = {pool.submit(contextvars.copy_context().run, _fetch_chunk, exchange, exchange_id,
+                                   symbol, timeframe, start, end): (start, end) for start, end in pending}
+            for future in as_completed(futures):
+                start, end = futures[future]
+                try:
+                    rows, duplicates = future.result()
+                except Exception as e:
+                    logger.warning("backfill %s %s chunk %d failed: %s", symbol, timeframe, start, e)
+                    info['errors'][start] = str(e)
+                    continue
+                save_candles(key, minutes, rows, db_path=db_path)
+                missing = sum(run[2] for run in missing_runs([row[0] for row in rows], start, end, tf_ms))
+                # Il chunk con la candela aperta va riscaricato alla prossima esecuzione
+                status = 'done' if not missing and end <= closed else 'partial'
+                info['complete' if status == 'done' else 'partial'] += 1
+                info['saved'] += len(rows)
+                info['duplicates'] += duplicates
+                with closing(get_connection(db_path)) as conn:
+                    conn.execute("INSERT OR REPLACE INTO backfill_chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (key, minutes, start, end, exchange_id, status, len(rows), missing,
+                                  int(time.time() * 1000)))
+                    conn.commit()
+
+    info['verify'] = verify_history(key, minutes, since, closed + tf_ms, db_path=db_path)
+    return info
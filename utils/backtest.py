@@ -0,0 +1,286 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.analysis import SIGNAL_PARAMS
+from utils.resample import resample_ohlcv
+
+# Stessi valori usati da generate_trading_signal ("Smart Trend Follower")
+DEFAULT_PARAMS = dict(SIGNAL_PARAMS, **{
+    'daily_ema': 200,        # Bias di fondo: prezzo vs EMA 200 Daily
+    'ema_fast': 50,          # EMA veloce H1 (diagnosi ritracciamento/spinta, non cambia i livelli)
+    'ema_slow': 200,         # EMA lenta H1 (base dello Stop Loss)
+    'rsi_length': 14,
+    'rsi_long_entry': None,  # Es. 35: entra long solo con RSI sotto soglia (None = nessun filtro)
+    'rsi_short_entry': None, # Es. 65: entra short solo con RSI sopra soglia
+    'fee': 0.0,              # Commissione per lato (frazione, es. 0.0026 su Kraken)
+})
+
+FIB_RATIOS = [0.0, 0.236, 0.382, 0.5, 0.618, 1.0]
+
+
+def ema(close, length):
+    """
+    EMA seeded with the SMA of the first `length` values (same as pandas_ta ema).
+    """
+    close = pd.Series(np.asarray(close, dtype='float64'))
+    if len(close) < length:
+        return np.full(len(close), np.nan)
+    seeded = close.copy()
+    seeded.iloc[:length - 1] = np.nan
+    seeded.iloc[length - 1] = close.iloc[:length].mean()
+    return seeded.ewm(span=length, adjust=False).mean().to_numpy()
+
+
+def rsi(close, length=14):
+    """
+    Wilder RSI (same as pandas_ta rsi with the default rma smoothing).
+    """
+    change = pd.Series(np.asarray(close, dtype='float64')).diff()
+    alpha = 1.0 / length
+    pos = change.clip(lower=0).ewm(alpha=alpha, adjust=False).mean()
+    neg = change.clip(upper=0).abs().ewm(alpha=alpha, adjust=False).mean()
+    return (100 * pos / (pos + neg)).to_numpy()
+
+
+def _indicator(arrays, key, compute):
+    """
+    Return a precomputed column from `arrays` (e.g. shared memory) or compute it.
+    """
+    if key in arrays:
+        return arrays[key]
+    return compute()
+
+
+def _first_level_below(levels, price):
+    """
+    Per row: first and second level (columns sorted descending) strictly below `price`.
+    """
+    below = levels < price[:, None]
+    count = below.sum(axis=1)
+    first = below.argmax(axis=1)
+    rows = np.arange(len(price))
+    lvl_1 = np.where(count > 0, levels[rows, first], np.nan)
+    lvl_2 = np.where(count > 1, levels[rows, np.minimum(first + 1, levels.shape[1] - 1)], np.nan)
+    return lvl_1, lvl_2
+
+
+def _first_level_above(levels, price):
+    """
+    Per row: first and second level (columns sorted descending) strictly above `price`,
+    i.e. the closest resistances.
+    """
+    above = levels[:, ::-1] > price[:, None]
+    count = above.sum(axis=1)
+    first = above.argmax(axis=1)
+    rows = np.arange(len(price))
+    ascending = levels[:, ::-1]
+    lvl_1 = np.where(count > 0, ascending[rows, first], np.nan)
+    lvl_2 = np.where(count > 1, ascending[rows, np.minimum(first + 1, levels.shape[1] - 1)], np.nan)
+    return lvl_1, lvl_2
+
+
+def compute_signals(df_1h, df_daily=None, params=None, arrays=None):
+    """
+    Evaluate the generate_trading_signal rules on every 1h bar (vectorized, no lookahead).
+    The daily bias uses the EMA of the last completed daily candle, which gives the same
+    answer as the live candle used by generate_trading_signal (close > EMA ⇔ close > previous EMA).
+    `arrays` may carry precomputed columns (e.g. shared across a parameter sweep).
+    Returns a dict of NumPy arrays: setups (long/short), entry, stop and target per bar.
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    arrays = arrays or {}
+
+    ts = arrays['timestamp'] if 'timestamp' in arrays else df_1h['timestamp'].to_numpy(dtype='datetime64[ms]').astype('int64')
+    high = arrays['high'] if 'high' in arrays else df_1h['high'].to_numpy(dtype='float64')
+    low = arrays['low'] if 'low' in arrays else df_1h['low'].to_numpy(dtype='float64')
+    close = arrays['close'] if 'close' in arrays else df_1h['close'].to_numpy(dtype='float64')
+
+    # --- Bias Daily (senza lookahead) ---
+    if 'daily_timestamp' in arrays:
+        daily_ts, daily_close = arrays['daily_timestamp'], arrays['daily_close']
+    else:
+        if df_daily is None:
+            df_daily = resample_ohlcv(df_1h, 1440)
+        daily_ts = df_daily['timestamp'].to_numpy(dtype='datetime64[ms]').astype('int64')
+        daily_close = df_daily['close'].to_numpy(dtype='float64')
+    daily_ema = _indicator(arrays, f"daily_ema_{p['daily_ema']}", lambda: ema(daily_close, p['daily_ema']))
+    day_start = ts - ts % 86400000
+    prev_day = np.searchsorted(daily_ts, day_start, side='left') - 1
+    daily_ema_at = np.where(prev_day >= 0, daily_ema[np.maximum(prev_day, 0)], np.nan)
+
+    bias_long = close > daily_ema_at
+    bias_short = close < daily_ema_at
+
+    # --- Momentum H1 ---
+    ema_fast = _indicator(arrays, f"ema_{p['ema_fast']}", lambda: ema(close, p['ema_fast']))
+    ema_slow = _indicator(arrays, f"ema_{p['ema_slow']}", lambda: ema(close, p['ema_slow']))
+    rsi_values = _indicator(arrays, f"rsi_{p['rsi_length']}", lambda: rsi(close, p['rsi_length']))
+
+    can_long = bias_long & ~(rsi_values > p['rsi_long_max'])
+    can_short = bias_short & ~(rsi_values < p['rsi_short_min'])
+    if p['rsi_long_entry'] is not None:
+        can_long &= rsi_values < p['rsi_long_entry']
+    if p['rsi_short_entry'] is not None:
+        can_short &= rsi_values > p['rsi_short_entry']
+
+    # --- Livelli operativi (Fibonacci su finestra H1) ---
+    window = p['fib_window']
+    recent_high = _indicator(arrays, f'fib_high_{window}', lambda: pd.Series(high).rolling(window=window).max().to_numpy())
+    recent_low = _indicator(arrays, f'fib_low_{window}', lambda: pd.Series(low).rolling(window=window).min().to_numpy())
+    diff = recent_high - recent_low
+    levels = np.column_stack([recent_high - r * diff for r in FIB_RATIOS])
+
+    sup_1, _ = _first_level_below(levels, close)
+    res_1, _ = _first_level_above(levels, close)
+    sup_1 = np.where(np.isnan(sup_1), close * 0.98, sup_1)
+    res_1 = np.where(np.isnan(res_1), close * 1.02, res_1)
+    valid_levels = ~np.isnan(recent_high)
+
+    long_entry, long_target = sup_1, res_1
+    long_stop = ema_slow * p['long_stop_mult']
+    short_entry, short_target = res_1, sup_1
+    short_stop = ema_slow * p['short_stop_mult']
+
+    # Setup coerente: stop dal lato giusto dell'ingresso
+    long_setup = can_long & valid_levels & (long_stop < long_entry) & (long_target > long_entry)
+    short_setup = can_short & valid_levels & (short_stop > short_entry) & (short_target < short_entry)
+
+    return {
+        # Prezzo sotto EMA veloce: ritracciamento (DIP/RALLY), sopra: spinta (MOMENTUM)
+        'below_fast': close < ema_fast,
+        'long_setup': long_setup, 'long_entry': long_entry, 'long_stop': long_stop, 'long_target': long_target,
+        'short_setup': short_setup, 'short_entry': short_entry, 'short_stop': short_stop, 'short_target': short_target,
+    }
+
+
+def _first_hit(mask_fn, start, n, chunk=256):
+    """
+    Index of the first bar >= start where mask_fn(slice) is True, scanning in growing chunks.
+    """
+    i = start
+    while i < n:
+        end = min(n, i + chunk)
+        hits = mask_fn(slice(i, end))
+        if hits.any():
+            return i + int(hits.argmax())
+        i = end
+        chunk *= 2
+    return -1
+
+
+def run_backtest(df_1h, df_daily=None, params=None, arrays=None):
+    """
+    Replay the "Smart Trend Follower" rules over every 1h bar.
+    A setup on bar t places a limit order at the nearest Fibonacci level (support for
+    longs, resistance for shorts) valid on bar t+1; stop and target are frozen at fill.
+    If stop and target are both touched in the same bar the stop is assumed (conservative);
+    an entry bar that opens beyond the stop (gap) is filled and stopped at its open.
+    Returns trades, equity curve, win rate, max drawdown and runtime.
+    """
+    started = time.perf_counter()
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    arrays = arrays or {}
+    sig = compute_signals(df_1h, df_daily, p, arrays)
+
+    ts = arrays['timestamp'] if 'timestamp' in arrays else df_1h['timestamp'].to_numpy(dtype='datetime64[ms]').astype('int64')
+    open_ = arrays['open'] if 'open' in arrays else df_1h['open'].to_numpy(dtype='float64')
+    high = arrays['high'] if 'high' in arrays else df_1h['high'].to_numpy(dtype='float64')
+    low = arrays['low'] if 'low' in arrays else df_1h['low'].to_numpy(dtype='float64')
+    close = arrays['close'] if 'close' in arrays else df_1h['close'].to_numpy(dtype='float64')
+    n = len(close)
+
+    # Fill possibili: setup sulla barra j-1, prezzo raggiunge il limite sulla barra j
+    long_fill = np.zeros(n, dtype=bool)
+    short_fill = np.zeros(n, dtype=bool)
+    long_fill[1:] = sig['long_setup'][:-1] & (low[1:] <= sig['long_entry'][:-1])
+    short_fill[1:] = sig['short_setup'][:-1] & (high[1:] >= sig['short_entry'][:-1])
+    fill_idx = np.flatnonzero(long_fill | short_fill)
+
+    trades = []
+    i = 0
+    while True:
+        k = np.searchsorted(fill_idx, i)
+        if k >= len(fill_idx):
+            break
+        j = int(fill_idx[k])
+        side = 'LONG' if long_fill[j] else 'SHORT'
+        prefix = 'long_' if side == 'LONG' else 'short_'
+        limit = sig[prefix + 'entry'][j - 1]
+        stop = sig[prefix + 'stop'][j - 1]
+        target = sig[prefix + 'target'][j - 1]
+
+        if side == 'LONG':
+            entry = min(open_[j], limit)
+            # Barra di ingresso: solo lo stop conta (non sappiamo l'ordine intrabar)
+            if low[j] <= stop:
+                exit_idx, outcome = j, 'stop'
+            else:
+                exit_idx = _first_hit(lambda s: (low[s] <= stop) | (high[s] >= target), j + 1, n)
+                outcome = None
+            if exit_idx == -1:
+                exit_idx, exit_price, outcome = n - 1, close[-1], 'open'
+            elif outcome == 'stop' or low[exit_idx] <= stop:
+                # Apertura già sotto lo stop (gap): si esce all'apertura, mai sopra l'ingresso
+                exit_price, outcome = min(open_[exit_idx], stop) if exit_idx > j else min(entry, stop), 'stop'
+            else:
+                exit_price, outcome = max(open_[exit_idx], target), 'target'
+            gross = exit_price / entry - 1
+        else:
+            entry = max(open_[j], limit)
+            if high[j] >= stop:
+                exit_idx, outcome = j, 'stop'
+            else:
+                exit_idx = _first_hit(lambda s: (high[s] >= stop) | (low[s] <= target), j + 1, n)
+                outcome = None
+            if exit_idx == -1:
+                exit_idx, exit_price, outcome = n - 1, close[-1], 'open'
+            elif outcome == 'stop' or high[exit_idx] >= stop:
+                exit_price, outcome = max(open_[exit_idx], stop) if exit_idx > j else max(entry, stop), 'stop'
+            else:
+                exit_price, outcome = min(open_[exit_idx], target), 'target'
+            gross = 1 - exit_price / entry
+
+        below_fast = sig['below_fast'][j - 1]
+        if side == 'LONG':
+            context = 'BULLISH DIP' if below_fast else 'BULLISH MOMENTUM'
+        else:
+            context = 'BEARISH MOMENTUM' if below_fast else 'BEARISH RALLY'
+
+        trades.append({
+            'entry_time': ts[j], 'exit_time': ts[exit_idx], 'side': side, 'context': context,
+            'entry': entry, 'stop': stop, 'target': target, 'exit': exit_price,
+            'return_pct': (gross - 2 * p['fee']) * 100,
+            'bars_held': exit_idx - j, 'outcome': outcome,
+            '_exit_idx': exit_idx,
+        })
+        # Una posizione alla volta: il prossimo ingresso parte dalla barra successiva all'uscita
+        i = exit_idx + 1
+
+    trades_df = pd.DataFrame(trades, columns=['entry_time', 'exit_time', 'side', 'context', 'entry', 'stop', 'target',
+                                              'exit', 'return_pct', 'bars_held', 'outcome', '_exit_idx'])
+
+    # Equity (capitale iniziale = 1) aggiornata alla chiusura di ogni trade
+    equity = np.ones(n)
+    if len(trades_df):
+        growth = np.ones(n)
+        np.multiply.at(growth, trades_df['_exit_idx'].to_numpy(), 1 + trades_df['return_pct'].to_numpy() / 100)
+        equity = np.cumprod(growth)
+    running_max = np.maximum.accumulate(equity)
+    drawdown = equity / running_max - 1
+
+    trades_df = trades_df.drop(columns='_exit_idx')
+    trades_df['entry_time'] = pd.to_datetime(trades_df['entry_time'], unit='ms')
+    trades_df['exit_time'] = pd.to_datetime(trades_df['exit_time'], unit='ms')
+    closed = trades_df[trades_df['outcome'] != 'open']
+
+    return {
+        'trades': trades_df,
+        'equity': pd.Series(equity, index=pd.to_datetime(ts, unit='ms'), name='equity'),
+        'n_trades': len(trades_df),
+        'win_rate': float((closed['return_pct'] > 0).mean() * 100) if len(closed) else 0.0,
+        'total_return_pct': float((equity[-1] - 1) * 100) if n else 0.0,
+        'max_drawdown_pct': float(drawdown.min() * 100) if n else 0.0,
+        'runtime_s': time.perf_counter() - started,
+    }
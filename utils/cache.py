@@ -0,0 +1,171 @@
+import copy
+import functools
+import hashlib
+import pickle
+import threading
+import time
+
+from utils.profiler import span
+from utils.runtime import in_streamlit, logger
+from utils.shared_cache import KEY_PREFIX, CacheBackendError, get_backend
+
+# Conta le esecuzioni reali per thread: sotto Streamlit è l'unico modo di distinguere hit e miss
+_local = threading.local()
+
+# Attesa massima di un risultato calcolato da un altro worker prima di calcolarlo in proprio
+LEASE_SECONDS = 30
+POLL_SECONDS = 0.05
+
+
+def _shared_call(backend, key, ttl, compute, min_expiry=0):
+    """
+    Read-through on the shared backend with request coalescing across processes: the first
+    worker that misses takes a lease and calls upstream, the others wait for its result.
+    Entries expiring before `min_expiry` (epoch seconds) count as misses.
+    Returns (pickled value, expires_at, status); status is 'shared', 'wait' or 'miss'.
+    Backend errors before the upstream call propagate (the caller computes locally);
+    after it they are only logged.
+    """
+    started = time.time()
+    waited = False
+    token = None
+    while True:
+        blob = backend.get(key)
+        if blob is not None:
+            expires_at, payload = pickle.loads(blob)
+            if expires_at > max(time.time(), min_expiry):
+                return payload, expires_at, 'wait' if waited else 'shared'
+        token = backend.acquire('lock:' + key, LEASE_SECONDS)
+        # Dopo LEASE_SECONDS si calcola comunque, ma senza lease: non si rilascia quello altrui
+        if token is not None or time.time() - started > LEASE_SECONDS:
+            break
+        waited = True
+        time.sleep(POLL_SECONDS)
+
+    try:
+        expires_at = time.time() + ttl
+        payload = pickle.dumps(compute(), protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            backend.set(key, pickle.dumps((expires_at, payload), protocol=pickle.HIGHEST_PROTOCOL), ttl)
+        except CacheBackendError as e:
+            logger.warning("shared cache write failed for %s: %s", key, e)
+    finally:
+        if token is not None:
+            try:
+                backend.release('lock:' + key, token)
+            except CacheBackendError:
+                pass  # il lease scade comunque da solo
+    return payload, expires_at, 'miss'
+
+
+def ttl_cache(ttl):
+    """
+    Cache a data function for `ttl` seconds.
+    Under Streamlit this is st.cache_data (shared by every session of the server);
+    headless (CLI, workers, tests) an in-process cache with the same semantics is used,
+    returning copies so callers can mutate results freely.
+    With a shared backend configured (utils/shared_cache.py) entries live there instead,
+    so every process behind a load balancer reuses the same upstream response, and
+    concurrent misses for one key (threads or processes) make a single upstream call.
+    Each call is a profiler span annotated with cache 'hit', 'shared', 'wait' or 'miss'.
+    `func.get_fresh(not_before, *args, **kwargs)` is the refresh used by the background
+    prefetcher: only a value computed at or after `not_before` (epoch seconds) is accepted,
+    so with a shared backend one worker refreshes and the others reuse its result.
+    """
+    def decorator(func):
+        entries = {}
+        lock = threading.Lock()
+        key_locks = {}
+        st_cached = []
+        label = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            _local.misses = getattr(_local, 'misses', 0) + 1
+            return func(*args, **kwargs)
+
+        def shared_cached_call(backend, args, kwargs, min_expiry=0):
+            key = f"{KEY_PREFIX}{label}:{hashlib.sha1(repr((args, sorted(kwargs.items()))).encode()).hexdigest()}"
+            with lock:
+                entry = entries.get(key)
+                key_lock = key_locks.setdefault(key, threading.Lock())
+            if entry is not None and entry[0] > max(time.time(), min_expiry):
+                return pickle.loads(entry[1]), 'hit'
+
+            # Un solo thread per chiave: gli altri trovano il risultato appena scritto
+            with key_lock:
+                with lock:
+                    entry = entries.get(key)
+                if entry is not None and entry[0] > max(time.time(), min_expiry):
+                    return pickle.loads(entry[1]), 'hit'
+                try:
+                    payload, expires_at, status = _shared_call(backend, key, ttl, lambda: func(*args, **kwargs),
+                                                               min_expiry)
+                except CacheBackendError as e:
+                    # Backend non raggiungibile: si degrada alla cache in memoria
+                    logger.warning("shared cache unavailable for %s: %s", label, e)
+                    payload, expires_at, status = pickle.dumps(func(*args, **kwargs)), time.time() + ttl, 'miss'
+                with lock:
+                    entries[key] = (expires_at, payload)
+            return pickle.loads(payload), status
+
+        def cached_call(args, kwargs):
+            backend = get_backend()
+            if backend is not None:
+                return shared_cached_call(backend, args, kwargs)
+
+            if in_streamlit():
+                if not st_cached:
+                    import streamlit as st
+                    st_cached.append(st.cache_data(ttl=ttl)(compute))
+                misses = getattr(_local, 'misses', 0)
+                value = st_cached[0](*args, **kwargs)
+                return value, 'hit' if getattr(_local, 'misses', 0) == misses else 'miss'
+
+            key = (args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                key = repr(key)
+            now = time.monotonic()
+            with lock:
+                entry = entries.get(key)
+            if entry is not None and now - entry[0] < ttl:
+                return copy.deepcopy(entry[1]), 'hit'
+
+            value = func(*args, **kwargs)
+            with lock:
+                entries[key] = (now, value)
+            return copy.deepcopy(value), 'miss'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label) as record:
+                value, status = cached_call(args, kwargs)
+                if record is not None:
+                    record['cache'] = status
+                return value
+
+        def get_fresh(not_before, *args, **kwargs):
+            backend = get_backend()
+            with span(label) as record:
+                if backend is not None:
+                    value, status = shared_cached_call(backend, args, kwargs, min_expiry=not_before + ttl)
+                else:
+                    # Senza backend nessun altro processo può aver già aggiornato il valore
+                    value, status = func(*args, **kwargs), 'miss'
+                if record is not None:
+                    record['cache'] = status
+                return value
+
+        def clear():
+            with lock:
+                entries.clear()
+            if st_cached:
+                st_cached[0].clear()
+
+        wrapper.clear = clear
+        wrapper.get_fresh = get_fresh
+        wrapper.ttl = ttl
+        return wrapper
+    return decorator
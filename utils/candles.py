@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+INDICATOR_COLUMNS = [
+    'RSI', 'MACD_12_26_9', 'MACDh_12_26_9', 'MACDs_12_26_9',
+    'BBL', 'BBM', 'BBU', 'BBB', 'BBP', 'EMA_50', 'EMA_200', 'VOL_SMA_20'
+]
+
+
+def to_ms(timestamp):
+    """
+    pandas/NumPy timestamp (or epoch ms) -> epoch milliseconds as int.
+    """
+    if isinstance(timestamp, (int, np.integer)):
+        return int(timestamp)
+    return pd.Timestamp(timestamp).value // 10**6
+
+
+class CandleArray:
+    """
+    Compact, growable candle container: int64 timestamps (epoch ms) plus one contiguous
+    2-D block (one row per column, float32 by default) holding OHLCV and, optionally,
+    preallocated slots for INDICATOR_COLUMNS.
+    to_frame() exports read-only zero-copy views, so pandas code can read the data
+    without duplicating it; the capacity doubles when full (amortized O(1) appends).
+    """
+
+    def __init__(self, capacity=0, indicators=True, dtype='float32'):
+        self.dtype = np.dtype(dtype)
+        self.columns = PRICE_COLUMNS + (INDICATOR_COLUMNS if indicators else [])
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self.timestamp = np.empty(capacity, dtype='int64')
+        self.values = np.full((len(self.columns), capacity), np.nan, dtype=self.dtype)
+        self.size = 0
+
+    @classmethod
+    def from_rows(cls, rows, indicators=False, dtype='float32', capacity=0):
+        """
+        Build from CCXT-style rows ([ms, open, high, low, close, volume], e.g. sqlite fetchall).
+        """
+        data = np.asarray(rows, dtype='float64').reshape(-1, 6)
+        n = len(data)
+        candles = cls(max(capacity, n), indicators, dtype)
+        candles.timestamp[:n] = data[:, 0]
+        candles.values[:len(PRICE_COLUMNS), :n] = data[:, 1:].T
+        candles.size = n
+        return candles
+
+    @classmethod
+    def from_frame(cls, df, indicators=False, dtype='float32', capacity=0):
+        """
+        Build from an OHLCV DataFrame; indicator columns present in `df` are copied too.
+        """
+        n = len(df)
+        candles = cls(max(capacity, n), indicators, dtype)
+        if n:
+            candles.timestamp[:n] = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype('int64')
+            for name, i in candles._index.items():
+                if name in df:
+                    candles.values[i, :n] = df[name].to_numpy(dtype='float64')
+        candles.size = n
+        return candles
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self.timestamp)
+
+    @property
+    def nbytes(self):
+        return self.timestamp.nbytes + self.values.nbytes
+
+    @property
+    def last_timestamp(self):
+        """
+        Last timestamp in epoch ms, or None when empty.
+        """
+        return int(self.timestamp[self.size - 1]) if self.size else None
+
+    def _grow(self, needed):
+        capacity = max(needed, 2 * self.capacity, 64)
+        timestamp = np.empty(capacity, dtype='int64')
+        timestamp[:self.size] = self.timestamp[:self.size]
+        values = np.full((len(self.columns), capacity), np.nan, dtype=self.dtype)
+        values[:, :self.size] = self.values[:, :self.size]
+        # Le viste esportate prima restano valide: puntano ancora ai vecchi buffer
+        self.timestamp, self.values = timestamp, values
+
+    def append(self, timestamp_ms, values):
+        """
+        Append one candle; `values` follows `self.columns` (it may stop after OHLCV).
+        """
+        if self.size == self.capacity:
+            self._grow(self.size + 1)
+        self.set_row(self.size, timestamp_ms, values)
+        self.size += 1
+
+    def set_row(self, index, timestamp_ms, values):
+        """
+        Overwrite candle `index` in place (e.g. a revision of the still-open candle).
+        """
+        self.timestamp[index] = timestamp_ms
+        self.values[:len(values), index] = values
+
+    def search(self, timestamp_ms):
+        """
+        Index of the first candle at or after `timestamp_ms`.
+        """
+        return int(np.searchsorted(self.timestamp[:self.size], timestamp_ms, side='left'))
+
+    def column(self, name):
+        """
+        Read-only view of one column (no copy).
+        """
+        view = self.values[self._index[name], :self.size]
+        view.flags.writeable = False
+        return view
+
+    def to_frame(self, start=0, stop=None):
+        """
+        DataFrame over candles [start, stop) backed by read-only views of this container:
+        no data is copied, and in-place writes raise instead of corrupting the buffers.
+        Adding or replacing whole columns on the returned frame is fine.
+        """
+        stop = self.size if stop is None else min(stop, self.size)
+        start = min(start, stop)
+        block = self.values[:, start:stop]
+        block.flags.writeable = False
+        timestamp = self.timestamp[start:stop].view('datetime64[ms]')
+        timestamp.flags.writeable = False
+
+        # Il blocco (colonne x righe) è già il layout interno di pandas: nessuna copia
+        df = pd.DataFrame(block.T, columns=self.columns, copy=False)
+        df.insert(0, 'timestamp', pd.Series(timestamp, copy=False))
+        return df
@@ -0,0 +1,117 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Pixel minimi per candela: sotto questa soglia le candele si fondono e conviene aggregarle
+PX_PER_CANDLE = 4
+
+LINE_COLUMNS = ['EMA_50', 'EMA_200']
+BAND_COLUMNS = ('BBU', 'BBL')
+
+
+def visible_slice(df, start=None, end=None):
+    """
+    Rows of `df` whose timestamp falls in [start, end] (binary search, no boolean mask).
+    """
+    timestamps = df['timestamp'].to_numpy()
+    lo = 0 if start is None else int(np.searchsorted(timestamps, np.datetime64(pd.Timestamp(start)), 'left'))
+    hi = len(df) if end is None else int(np.searchsorted(timestamps, np.datetime64(pd.Timestamp(end)), 'right'))
+    return df.iloc[lo:hi]
+
+
+def bucket_starts(n, size):
+    """
+    Start index of each group of `size` consecutive rows out of `n`. Groups are aligned to
+    the end, so the latest candle always closes the last group and only the oldest one
+    can be partial.
+    """
+    first = n % size or size
+    return np.concatenate([[0], np.arange(first, n, size)]).astype('int64')
+
+
+def aggregate_ohlc(df, buckets):
+    """
+    Merge consecutive candles into at most `buckets` candles: open of the first, max high,
+    min low, close of the last, summed volume. Timestamps are the bucket opening times.
+    Bollinger columns keep their envelope (max upper, min lower).
+    Returns (frame, candles per bucket); frames that already fit are returned as they are.
+    """
+    if len(df) <= buckets:
+        return df, 1
+    size = math.ceil(len(df) / buckets)
+    starts = bucket_starts(len(df), size)
+    ends = np.append(starts[1:], len(df)) - 1
+    out = {
+        'timestamp': df['timestamp'].to_numpy()[starts],
+        'open': df['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(), starts),
+        'close': df['close'].to_numpy()[ends],
+    }
+    if 'volume' in df:
+        out['volume'] = np.add.reduceat(df['volume'].to_numpy(), starts)
+    upper, lower = BAND_COLUMNS
+    if upper in df and lower in df:
+        # fmax/fmin ignorano i NaN del riscaldamento delle bande
+        out[upper] = np.fmax.reduceat(df[upper].to_numpy(), starts)
+        out[lower] = np.fmin.reduceat(df[lower].to_numpy(), starts)
+    return pd.DataFrame(out), size
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points of (x, y) that keep the
+    visual shape of the line (peaks and troughs survive, flat stretches are thinned out).
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    x = x - x[0]
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype('int64')
+    selected = np.empty(threshold, dtype='int64')
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Vertice C: media del bucket successivo (l'ultimo bucket usa l'ultimo punto)
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_line(x, y, threshold):
+    """
+    LTTB on the non-NaN part of a series (indicator warm-up is dropped). Returns (x, y).
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype='float64')
+    valid = ~np.isnan(y)
+    x, y = x[valid], y[valid]
+    index = lttb(x.astype('int64') if x.dtype.kind == 'M' else x, y, threshold)
+    return x[index], y[index]
+
+
+def chart_data(df, start=None, end=None, width_px=1200):
+    """
+    Chart-ready data for the visible range of an indicator frame, sized to the chart width:
+    candles aggregated to about one every PX_PER_CANDLE pixels, indicator lines reduced
+    with LTTB to about one point per pixel. Returns a dict with 'candles' (DataFrame),
+    'lines' ({column: (x, y)}), 'bucket' (source candles per drawn candle) and 'rows'.
+    """
+    visible = visible_slice(df, start, end)
+    candles, bucket = aggregate_ohlc(visible, max(1, width_px // PX_PER_CANDLE))
+
+    x = visible['timestamp'].to_numpy()
+    lines = {}
+    for column in LINE_COLUMNS:
+        if column in visible:
+            lines[column] = downsample_line(x, visible[column].to_numpy(), width_px)
+    return {'candles': candles, 'lines': lines, 'bucket': bucket, 'rows': len(visible)}
@@ -0,0 +1,183 @@
+import math
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.analysis import (calculate_fibonacci_levels, analyze_trend, generate_trading_signal,
+                            calculate_historical_levels, analyze_mtf_trend, analyze_dxy_correlation)
+from utils.correlation import CorrelationEngine
+from utils.indicators import IndicatorEngine
+from utils.loader import load_market_data
+from utils.profiler import span
+from utils.runtime import capture_errors
+
+EMPTY_SIGNAL = {"opinion": "N/A", "color": "gray", "score": 0, "advice": "", "reasons": [], "structure": "N/A",
+                "direction": "NEUTRAL"}
+
+# Asset del motore di correlazione -> nome nel paniere macro (utils/macro.py)
+CORRELATION_ASSETS = {'DXY': 'dxy', 'SPX': 'spx', 'NDX': 'ndx'}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_indicator_engine(symbol, timeframe):
+    """
+    One IndicatorEngine per symbol/timeframe, shared for the life of the process
+    (dashboard reruns, CLI loops, workers): only new or revised candles are computed.
+    """
+    with _engines_lock:
+        engine = _engines.get((symbol, timeframe))
+        if engine is None:
+            engine = _engines[(symbol, timeframe)] = IndicatorEngine()
+        return engine
+
+
+def get_correlation_engine(symbol):
+    """
+    One CorrelationEngine per symbol (vs DXY and the equity indices), shared like the
+    indicator engines: each rerun only folds in the new or revised daily bars.
+    """
+    with _engines_lock:
+        engine = _engines.get((symbol, 'correlation'))
+        if engine is None:
+            engine = _engines[(symbol, 'correlation')] = CorrelationEngine()
+        return engine
+
+
+def run_analysis(symbol='BTC/USDT'):
+    """
+    The dashboard pipeline without any UI: fetch, indicators, MTF trend, trading signal,
+    Fibonacci and historical levels, DXY correlation and news sentiment.
+    Errors reported by the data layer are returned in `errors` instead of being raised.
+    """
+    started = time.perf_counter()
+    with capture_errors() as errors:
+        # 1. Fetch concorrente di tutte le sorgenti (crypto MTF, DXY, azioni, news)
+        with span('pipeline.fetch'):
+            market_data = load_market_data(symbol)
+        fetched_at = time.perf_counter()
+
+        # 2. Indicatori incrementali per ogni timeframe
+        mtf_data = {tf: market_data[tf] for tf in ['1h', '15m', '4h', '1d']}
+        with span('pipeline.indicators'):
+            for tf, df in mtf_data.items():
+                if not df.empty:
+                    mtf_data[tf] = get_indicator_engine(symbol, tf).sync(df)
+        df_main = mtf_data['1h']
+
+        result = {
+            'symbol': symbol,
+            'mtf_data': mtf_data,
+            'fib_levels': {},
+            'trend': "N/A",
+            'rsi': 0,
+            'signal': dict(EMPTY_SIGNAL),
+            'mtf_results': {},
+            'mtf_score': "N/A",
+            'historical_levels': [],
+            'dxy_data': market_data['dxy'],
+            'dxy_trend': "N/A",
+            'dxy_warning': None,
+            'dxy_change': 0.0,
+            'stock_data': market_data['stocks'],
+            'daily_hist': market_data['daily_hist'],
+            'correlation': {'assets': [], 'as_of': None, 'windows': {}},
+        }
+
+        # 3. Analisi (sul 1h) solo se ci sono dati
+        if not df_main.empty:
+            with span('pipeline.analysis'):
+                result['fib_levels'] = calculate_fibonacci_levels(df_main)
+                result['trend'], result['rsi'] = analyze_trend(df_main)
+                result['signal'] = generate_trading_signal(mtf_data)
+                result['mtf_results'], result['mtf_score'] = analyze_mtf_trend(mtf_data)
+                result['historical_levels'] = calculate_historical_levels(market_data['daily_hist'])
+                frames = {'BTC': mtf_data['1d']}
+                frames.update({asset: market_data['macro'].get(name) for asset, name in CORRELATION_ASSETS.items()})
+                result['correlation'] = get_correlation_engine(symbol).sync(frames).snapshot()
+                result['dxy_trend'], result['dxy_warning'], result['dxy_change'] = analyze_dxy_correlation(
+                    market_data['dxy'], result['signal']['direction'], btc_dxy_correlation(result['correlation']))
+
+        result['sentiment_label'], result['sentiment_score'], result['news'] = market_data['news']
+
+    result['errors'] = errors
+    result['timings'] = {
+        'fetch_s': fetched_at - started,
+        'analysis_s': time.perf_counter() - fetched_at,
+    }
+    return result
+
+
+def btc_dxy_correlation(correlation, window=60):
+    """
+    BTC/DXY correlation from a CorrelationEngine snapshot (None when not available).
+    """
+    stats = correlation['windows'].get(window)
+    if stats is None or 'DXY' not in stats['corr']:
+        return None
+    return stats['corr'].iloc[0]['DXY']
+
+
+def _plain(value):
+    """
+    Convert numpy/pandas scalars to JSON-friendly Python values (NaN -> None).
+    """
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def summarize(result):
+    """
+    JSON-serializable summary of run_analysis() (no DataFrames), used by the CLI.
+    """
+    df_main = result['mtf_data']['1h']
+    price = change_pct = last_candle = None
+    if len(df_main) >= 2:
+        price = df_main['close'].iloc[-1]
+        prev_close = df_main['close'].iloc[-2]
+        change_pct = (price - prev_close) / prev_close * 100
+        last_candle = df_main['timestamp'].iloc[-1]
+
+    return _plain({
+        'symbol': result['symbol'],
+        'price': price,
+        'change_pct': change_pct,
+        'last_candle': last_candle,
+        'trend': result['trend'],
+        'rsi': result['rsi'],
+        'signal': result['signal'],
+        'mtf': result['mtf_results'],
+        'mtf_score': result['mtf_score'],
+        'fibonacci': result['fib_levels'],
+        'historical_levels': result['historical_levels'],
+        'dxy': {
+            'trend': result['dxy_trend'],
+            'change_pct': result['dxy_change'],
+            'warning': result['dxy_warning'],
+        },
+        'correlation': {
+            str(window): {asset: {'corr': stats['corr'].iloc[0][asset], 'beta': stats['beta'].iloc[0][asset]}
+                          for asset in stats['corr'].columns[1:]}
+            for window, stats in result['correlation']['windows'].items()
+        },
+        'sentiment': {
+            'label': result['sentiment_label'],
+            'score': result['sentiment_score'],
+            'headlines': len(result['news']),
+        },
+        'candles': {tf: len(df) for tf, df in result['mtf_data'].items()},
+        'errors': result['errors'],
+        'timings': result['timings'],
+    })
@@ -0,0 +1,167 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.profiler import profiled
+
+# Finestre (barre daily) delle correlazioni/beta rolling
+CORRELATION_WINDOWS = (20, 60, 120)
+
+
+def daily_closes(frame):
+    """
+    Close series indexed by calendar day, from a candle frame (timestamp/close, as
+    fetch_crypto_data) or a yfinance-shaped frame (Date index, Close).
+    """
+    if frame is None or frame.empty:
+        return pd.Series(dtype='float64')
+    if 'timestamp' in frame:
+        index, close = frame['timestamp'], frame['close']
+    else:
+        index, close = frame.index, frame['Close']
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    series = pd.Series(close.to_numpy(dtype='float64'), index=index.normalize().as_unit('ms'))
+    return series[~series.index.duplicated(keep='last')].dropna()
+
+
+def align_closes(frames):
+    """
+    Inner-join the daily closes of every non-empty frame on their common days.
+    BTC trades every day and the macro assets only on business days: weekend moves of BTC
+    end up in the first common day's return.
+    """
+    closes = {name: daily_closes(frame) for name, frame in frames.items()}
+    closes = {name: series for name, series in closes.items() if not series.empty}
+    if not closes:
+        return pd.DataFrame()
+    return pd.concat(closes, axis=1, join='inner').sort_index()
+
+
+class CorrelationEngine:
+    """
+    Rolling correlation and beta matrices between assets on a common daily index.
+    Log returns and their pairwise products are kept as prefix sums, so the statistics
+    of any window at any bar are one subtraction; sync() only recomputes from the first
+    bar that is new or revised (usually just the last one).
+    """
+
+    def __init__(self, windows=CORRELATION_WINDOWS):
+        self.windows = tuple(windows)
+        self._lock = threading.RLock()
+        self._reset([])
+
+    def __len__(self):
+        return len(self.index)
+
+    def _reset(self, assets):
+        k = len(assets)
+        self.assets = list(assets)
+        self.index = np.empty(0, dtype='datetime64[ms]')
+        self.closes = np.empty((0, k))
+        self.prefix = np.empty((0, k + k * k))
+
+    @profiled('correlation.sync')
+    def sync(self, frames):
+        """
+        Bring the engine up to date with {asset: frame}; returns self.
+        """
+        aligned = align_closes(frames)
+        with self._lock:
+            self._sync(aligned)
+        return self
+
+    def _sync(self, aligned):
+        if list(aligned.columns) != self.assets:
+            self._reset(aligned.columns)
+        if aligned.empty:
+            return
+
+        index = aligned.index.to_numpy(dtype='datetime64[ms]')
+        closes = aligned.to_numpy(dtype='float64')
+
+        # Prima barra nuova o modificata rispetto allo storico già elaborato
+        start = int(np.searchsorted(self.index, index[0]))
+        overlap = min(len(self.index) - start, len(index))
+        same = (self.index[start:start + overlap] == index[:overlap]) & \
+            (self.closes[start:start + overlap] == closes[:overlap]).all(axis=1)
+        keep = start + (overlap if same.all() else int(np.argmin(same)))
+        new = keep - start
+        if keep == len(self.index) and new == len(index):
+            return
+
+        self.index = np.concatenate([self.index[:keep], index[new:]])
+        self.closes = np.concatenate([self.closes[:keep], closes[new:]])
+        self._update_prefix(keep)
+
+    def _update_prefix(self, first):
+        """
+        Recompute prefix sums of [returns, returns x returns] from bar `first` on.
+        """
+        k = len(self.assets)
+        returns = np.zeros_like(self.closes[max(first - 1, 0):])
+        returns[1:] = np.diff(np.log(self.closes[max(first - 1, 0):]), axis=0)
+        if first > 0:
+            returns = returns[1:]
+        features = np.concatenate([returns, (returns[:, :, None] * returns[:, None, :]).reshape(-1, k * k)], axis=1)
+        base = self.prefix[first - 1] if first > 0 else np.zeros(k + k * k)
+        self.prefix = np.concatenate([self.prefix[:first], base + np.cumsum(features, axis=0)])
+
+    def _window_stats(self, window, last=False):
+        """
+        Covariance-style sums over the `window` returns ending at each bar: (n*Sxy - SxSy)
+        as a (bars, k, k) array, for every bar with a full window (only the latest with `last`).
+        """
+        k = len(self.assets)
+        if len(self.prefix) <= window:
+            return np.empty((0, k, k))
+        if last:
+            sums = self.prefix[-1:] - self.prefix[-1 - window:-window]
+        else:
+            sums = self.prefix[window:] - self.prefix[:-window]
+        sx = sums[:, :k]
+        sxy = sums[:, k:].reshape(-1, k, k)
+        return window * sxy - sx[:, :, None] * sx[:, None, :]
+
+    def rolling(self, window):
+        """
+        Correlation and beta matrices for every bar with a full window:
+        (timestamps, corr[bars, k, k], beta[bars, k, k]); beta[i, j] is the beta of asset i on asset j.
+        """
+        with self._lock:
+            cov = self._window_stats(window)
+            index = self.index[window:]
+        var = np.diagonal(cov, axis1=1, axis2=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.sqrt(var[:, :, None] * var[:, None, :])
+            beta = cov / var[:, None, :]
+        return index, corr, beta
+
+    def snapshot(self):
+        """
+        Latest correlation/beta matrices per window (windows longer than the history are
+        skipped): {'assets', 'as_of', 'windows': {window: {'corr': DataFrame, 'beta': DataFrame}}}.
+        """
+        with self._lock:
+            assets = list(self.assets)
+            as_of = pd.Timestamp(self.index[-1]) if len(self.index) else None
+            stats = {window: self._window_stats(window, last=True) for window in self.windows}
+
+        result = {'assets': assets, 'as_of': as_of, 'windows': {}}
+        if len(assets) < 2:
+            return result
+        for window, cov in stats.items():
+            if not len(cov):
+                continue
+            cov = cov[-1]
+            var = np.diag(cov)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                corr = cov / np.sqrt(np.outer(var, var))
+                beta = cov / var[None, :]
+            result['windows'][window] = {
+                'corr': pd.DataFrame(corr, index=assets, columns=assets),
+                'beta': pd.DataFrame(beta, index=assets, columns=assets),
+            }
+        return result
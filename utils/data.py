@@ -1,9 +1,41 @@
-import ccxt
 import pandas as pd
-import yfinance as yf
-import streamlit as st
+import time
+from utils.store import save_candles, last_timestamp, load_candles
+from utils.exchange import get_exchange, throttle
+from utils.cache import ttl_cache
+from utils.macro import fetch_macro_data
+from utils.profiler import span
+from utils.runtime import report_error, report_warning
 
-@st.cache_data(ttl=60)
+# Map timeframes to Kraken standard (minutes)
+TIMEFRAME_MINUTES = {
+    '15m': 15,
+    '1h': 60,
+    '4h': 240,
+    '1d': 1440,
+    '1D': 1440
+}
+
+KRAKEN_MAX_CANDLES = 720  # Kraken restituisce al massimo le ultime 720 candele
+
+def to_exchange_symbol(symbol, markets=None):
+    """
+    Map the dashboard symbol to the one actually traded on Kraken.
+    With `markets` (exchange.markets), any */USDT pair missing on Kraken falls back to */USD.
+    """
+    # Kraken a volte usa XBT invece di BTC, ma ccxt gestisce la mappatura.
+    # Se BTC/USDT dà problemi, il bot userà automaticamente BTC/USD
+    if symbol == 'BTC/USDT':
+        # Kraken ha liquidità maggiore su USD. 
+        # Per il bot l'analisi tecnica è identica tra USDT e USD.
+        return 'BTC/USD'
+    if markets is not None and symbol not in markets and symbol.endswith('/USDT'):
+        usd_symbol = symbol[:-1]
+        if usd_symbol in markets:
+            return usd_symbol
+    return symbol
+
+@ttl_cache(ttl=60)
 def fetch_crypto_data(symbol='BTC/USDT', timeframe='1h', limit=1000):
     """
     Fetch OHLCV data from KRAKEN (US Friendly) via CCXT.
@@ -11,62 +43,56 @@ def fetch_crypto_data(symbol='BTC/USDT', timeframe='1h', limit=1000):
     """
     try:
         # USARE KRAKEN INVECE DI BYBIT (Bybit blocca gli USA)
-        exchange = ccxt.kraken()
-        
-        # Kraken a volte usa XBT invece di BTC, ma ccxt gestisce la mappatura.
-        # Se BTC/USDT dà problemi, il bot userà automaticamente BTC/USD
-        if symbol == 'BTC/USDT':
-            # Kraken ha liquidità maggiore su USD. 
-            # Per il bot l'analisi tecnica è identica tra USDT e USD.
-            symbol = 'BTC/USD' 
+        symbol = to_exchange_symbol(symbol)
+        kraken_tf = TIMEFRAME_MINUTES.get(timeframe, 60) # Default 60 se non trova
+        tf_ms = kraken_tf * 60 * 1000
+
+        # Store locale: chiediamo all'exchange solo le candele successive all'ultima salvata.
+        # L'ultima candela salvata viene richiesta di nuovo perché potrebbe essere ancora aperta.
+        stored_last, stored_count = last_timestamp(symbol, kraken_tf)
+        now_ms = int(time.time() * 1000)
+        # Kraken restituisce al massimo 720 candele recenti: oltre quella finestra
+        # l'aggiornamento incrementale lascerebbe un buco, quindi riscarichiamo tutto.
+        # Con limit > 720 anche un download completo ne porta solo 720: basta averne tante.
+        incremental = (
+            stored_last is not None
+            and stored_count >= min(limit, KRAKEN_MAX_CANDLES)
+            and (now_ms - stored_last) < (KRAKEN_MAX_CANDLES - 20) * tf_ms
+        )
+
+        import ccxt  # caricato al primo fetch reale (importa l'intero catalogo exchange)
 
-        # Map timeframes to Kraken standard (minutes)
-        tf_map = {
-            '15m': 15,
-            '1h': 60,
-            '4h': 240,
-            '1d': 1440,
-            '1D': 1440
-        }
-        kraken_tf = tf_map.get(timeframe, 60) # Default 60 se non trova
-        
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe=kraken_tf, limit=limit)
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        return df
+        try:
+            # Client condiviso: riusa sessione HTTP, rate limit e metadati dei mercati
+            with span('kraken.get_exchange'):
+                exchange = get_exchange('kraken')
+            with span('kraken.throttle'):
+                throttle('kraken')
+            with span('kraken.fetch_ohlcv', symbol=symbol, timeframe=timeframe):
+                if incremental:
+                    ohlcv = exchange.fetch_ohlcv(symbol, timeframe=kraken_tf, since=stored_last)
+                else:
+                    ohlcv = exchange.fetch_ohlcv(symbol, timeframe=kraken_tf, limit=limit)
+            save_candles(symbol, kraken_tf, ohlcv)
+        except ccxt.BaseError as e:
+            # Exchange non raggiungibile: se abbiamo uno storico locale usiamo quello
+            if not stored_count:
+                raise
+            report_warning('crypto', f"Kraken non raggiungibile, uso i dati locali: {e}")
+
+        return load_candles(symbol, kraken_tf, limit=limit)
     except Exception as e:
-        st.error(f"Error fetching crypto data: {e}")
+        report_error('crypto', f"Error fetching crypto data: {e}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=300)
-def fetch_stock_data(tickers=['^GSPC', '^IXIC']):
+def fetch_stock_data(tickers=('^GSPC', '^IXIC')):
     """
-    Fetch stock market data (S&P 500, Nasdaq) using yfinance.
+    Fetch stock market data (S&P 500, Nasdaq): daily bars from the batched macro loader.
     """
-    data = {}
-    for ticker in tickers:
-        try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period="5d")
-            data[ticker] = hist
-        except Exception as e:
-            st.error(f"Error fetching stock data for {ticker}: {e}")
-    return data
+    return fetch_macro_data(tuple(tickers))
 
-@st.cache_data(ttl=300)
 def fetch_dxy_data():
     """
-    Fetch US Dollar Index (DXY) data.
+    Fetch US Dollar Index (DXY) data (DX-Y.NYB, falling back to the DX=F future).
     """
-    try:
-        # DX-Y.NYB is standard on Yahoo Finance, DX=F is futures
-        ticker = "DX-Y.NYB" 
-        dxy = yf.Ticker(ticker)
-        hist = dxy.history(period="1mo", interval="1d")
-        if hist.empty:
-             # Fallback to Futures if needed
-             hist = yf.Ticker("DX=F").history(period="1mo", interval="1d")
-        return hist
-    except Exception as e:
-        st.error(f"Error fetching DXY data: {e}")
-        return pd.DataFrame()
+    return fetch_macro_data(('dxy',))['dxy']
@@ -0,0 +1,208 @@
+import json
+import os
+import shutil
+import time
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from utils.candles import PRICE_COLUMNS
+from utils.runtime import DATA_DIR
+from utils.store import get_connection
+
+# Dataset di ricerca: cartella con colonne binarie a larghezza fissa, aperte in memory mapping
+#   CURRENT              nome della versione in uso (sostituito atomicamente a ogni export)
+#   v<ns>/meta.json      versione, timeframe, dtype, simboli -> (prima riga, righe, primo/ultimo timestamp)
+#   v<ns>/timestamp.bin  int64 epoch ms, un blocco ordinato per simbolo
+#   v<ns>/ohlcv.bin      matrice (colonne x righe): ogni colonna è contigua, le viste non copiano nulla
+DATASET_DIR = os.path.join(DATA_DIR, 'datasets')
+FORMAT_VERSION = 1
+BATCH_ROWS = 200000  # righe lette dallo store per volta durante l'export
+DAY_MS = 86400000
+
+
+def dataset_path(name):
+    """
+    Directory of dataset `name` (a bare name lives under DATASET_DIR, a path is used as is).
+    """
+    return name if os.sep in name else os.path.join(DATASET_DIR, name)
+
+
+def _mapped(path, dtype, shape, mode):
+    if not np.prod(shape):
+        return np.empty(shape, dtype=dtype)  # mmap non accetta file vuoti
+    return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+
+def write_dataset(name, symbols, timeframe, since=None, before=None, dtype='float64', db_path=None):
+    """
+    Export stored candles of `symbols` (store keys, e.g. 'BTC/USD') at `timeframe` minutes into
+    dataset `name`, optionally bounded to [since, before) ms. Rows are streamed from the store
+    into the mapped files in batches, so the export never holds the whole history in memory.
+    Each export is a new version directory, published by atomically replacing the CURRENT
+    pointer: readers see either the old or the new version, and keep their old mapping.
+    The previous version is kept for readers that were opening it; older ones are removed.
+    Returns the opened Dataset.
+    """
+    path = dataset_path(name)
+    dtype = np.dtype(dtype).newbyteorder('<')
+    where = "symbol = ? AND timeframe = ?"
+    bounds = []
+    if since is not None:
+        where += " AND timestamp >= ?"
+        bounds.append(int(since))
+    if before is not None:
+        where += " AND timestamp < ?"
+        bounds.append(int(before))
+
+    with closing(get_connection(db_path)) as conn:
+        counts = {symbol: conn.execute(f"SELECT COUNT(*) FROM candles WHERE {where}",
+                                       [symbol, int(timeframe)] + bounds).fetchone()[0] for symbol in symbols}
+        total = sum(counts.values())
+
+        version = f"v{time.time_ns()}"
+        version_path = os.path.join(path, version)
+        os.makedirs(version_path)
+        timestamp = _mapped(os.path.join(version_path, 'timestamp.bin'), '<i8', (total,), 'w+')
+        values = _mapped(os.path.join(version_path, 'ohlcv.bin'), dtype, (len(PRICE_COLUMNS), total), 'w+')
+
+        index, row = {}, 0
+        for symbol in symbols:
+            start = row
+            cursor = conn.execute(f"SELECT timestamp, open, high, low, close, volume FROM candles WHERE {where} "
+                                  "ORDER BY timestamp", [symbol, int(timeframe)] + bounds)
+            while True:
+                batch = cursor.fetchmany(BATCH_ROWS)
+                if not batch:
+                    break
+                data = np.asarray(batch, dtype='float64')
+                timestamp[row:row + len(data)] = data[:, 0]
+                values[:, row:row + len(data)] = data[:, 1:].T
+                row += len(data)
+            index[symbol] = [start, row - start,
+                             int(timestamp[start]) if row > start else None,
+                             int(timestamp[row - 1]) if row > start else None]
+
+    for array in (timestamp, values):
+        if isinstance(array, np.memmap):
+            array.flush()
+    del timestamp, values
+    with open(os.path.join(version_path, 'meta.json'), 'w') as f:
+        json.dump({'version': FORMAT_VERSION, 'timeframe': int(timeframe), 'rows': total,
+                   'dtype': dtype.str, 'columns': PRICE_COLUMNS, 'symbols': index}, f, indent=1)
+
+    # Pubblicazione atomica: os.replace del puntatore, mai una finestra senza dataset
+    previous = _current_version(path)
+    pointer = os.path.join(path, f'CURRENT.{version}')
+    with open(pointer, 'w') as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(path, 'CURRENT'))
+    for entry in os.listdir(path):
+        if entry.startswith('v') and entry not in (version, previous):
+            shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+    return Dataset(path)
+
+
+def _current_version(path):
+    try:
+        with open(os.path.join(path, 'CURRENT')) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+class Dataset:
+    """
+    Read-only, memory-mapped multi-symbol OHLCV dataset (see write_dataset).
+    Every accessor returns zero-copy NumPy views on the mapped files: nothing is loaded
+    up front, pages are read on demand and shared through the OS page cache by every
+    process that opens the same dataset. Rows are located through the per-symbol index in
+    meta.json plus a binary search on the timestamps.
+    """
+
+    def __init__(self, name):
+        self.path = dataset_path(name)
+        for attempt in range(3):
+            try:
+                self._open(_current_version(self.path))
+                break
+            except FileNotFoundError:
+                # Versione rimossa da due export ravvicinati: si rilegge il puntatore
+                if attempt == 2 or _current_version(self.path) is None:
+                    raise
+
+    def _open(self, version):
+        if version is None:
+            raise FileNotFoundError(f"no dataset in {self.path}")
+        self.version_path = os.path.join(self.path, version)
+        with open(os.path.join(self.version_path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError(f"unsupported dataset version {meta['version']} in {self.path}")
+        rows = meta['rows']
+        self.timestamp = _mapped(os.path.join(self.version_path, 'timestamp.bin'), '<i8', (rows,), 'r')
+        self.values = _mapped(os.path.join(self.version_path, 'ohlcv.bin'), meta['dtype'],
+                              (len(meta['columns']), rows), 'r')
+        self.timeframe = meta['timeframe']
+        self.columns = meta['columns']
+        self.index = {symbol: tuple(entry) for symbol, entry in meta['symbols'].items()}
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @property
+    def symbols(self):
+        return list(self.index)
+
+    def rows(self, symbol, since=None, before=None):
+        """
+        Row range [start, stop) of `symbol` with timestamps in [since, before) ms.
+        """
+        if symbol not in self.index:
+            raise KeyError(f"{symbol} is not in dataset {self.path}")
+        start, count = self.index[symbol][:2]
+        stop = start + count
+        timestamps = self.timestamp[start:stop]
+        if since is not None:
+            start += int(np.searchsorted(timestamps, since, side='left'))
+        if before is not None:
+            stop = start + int(np.searchsorted(self.timestamp[start:stop], before, side='left'))
+        return start, stop
+
+    def column(self, name, symbol, since=None, before=None):
+        """
+        Read-only view of one column ('timestamp' or an OHLCV column) for `symbol`.
+        """
+        start, stop = self.rows(symbol, since, before)
+        if name == 'timestamp':
+            return self.timestamp[start:stop]
+        return self.values[self.columns.index(name), start:stop]
+
+    def arrays(self, symbol, since=None, before=None):
+        """
+        Inputs of utils.backtest (run_backtest(None, arrays=...) / compute_signals): 'timestamp'
+        and OHLCV views, plus 'daily_timestamp'/'daily_close' for the daily bias. The daily
+        arrays are small copies built like resample_ohlcv (a partial first day is dropped).
+        """
+        start, stop = self.rows(symbol, since, before)
+        arrays = {'timestamp': self.timestamp[start:stop]}
+        for i, name in enumerate(self.columns):
+            arrays[name] = self.values[i, start:stop]
+
+        days = arrays['timestamp'] // DAY_MS
+        ends = np.r_[np.flatnonzero(days[1:] != days[:-1]) + 1, len(days)] if len(days) else np.empty(0, dtype='int64')
+        first = 1 if len(days) and arrays['timestamp'][0] % DAY_MS else 0
+        arrays['daily_timestamp'] = days[ends[first:] - 1] * DAY_MS
+        arrays['daily_close'] = np.asarray(arrays['close'][ends[first:] - 1], dtype='float64')
+        return arrays
+
+    def to_frame(self, symbol, since=None, before=None):
+        """
+        DataFrame shaped like fetch_crypto_data output, backed by the mapped files (no copy):
+        in-place writes raise, adding indicator columns (calculate_technical_indicators) is fine.
+        """
+        start, stop = self.rows(symbol, since, before)
+        df = pd.DataFrame(self.values[:, start:stop].T, columns=self.columns, copy=False)
+        df.insert(0, 'timestamp', pd.Series(self.timestamp[start:stop].view('datetime64[ms]'), copy=False))
+        return df
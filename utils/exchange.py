@@ -0,0 +1,178 @@
+import threading
+import time
+
+# Metadati dei mercati (simboli, precisioni, limiti) cambiano raramente
+MARKETS_TTL = 3600
+
+# Limiti REST per exchange: (burst massimo, richieste recuperate al secondo).
+# Kraken usa un contatore per IP che arriva a 15 e scala di circa 1 al secondo sugli endpoint pubblici
+RATE_LIMITS = {
+    'kraken': (15, 1.0),
+}
+
+_lock = threading.Lock()  # solo per i dizionari: mai tenuto durante sleep o chiamate di rete
+_clients = {}
+_client_locks = {}  # un lock per exchange: serializza il caricamento dei mercati
+_pacers = {}
+_pacers_lock = threading.Lock()
+_markets_loaded_at = {}
+_stats = {
+    'clients_created': 0,
+    'clients_reused': 0,
+    'markets_loads': 0,
+    'markets_cache_hits': 0,
+}
+
+
+def get_exchange(exchange_id='kraken', markets_ttl=MARKETS_TTL):
+    """
+    Return a shared, long-lived CCXT client for `exchange_id`.
+    The same instance (and its HTTP session, rate-limit state and market metadata)
+    is reused across calls; markets are reloaded once `markets_ttl` seconds have passed.
+    Only the first load makes callers wait: during a reload one thread refreshes the markets
+    and the others keep using the loaded ones, and other exchanges are never blocked.
+    """
+    import ccxt  # import lento (tutti gli exchange): solo quando serve davvero un client
+
+    with _lock:
+        client = _clients.get(exchange_id)
+        if client is None:
+            # Il rate limit interno di ccxt non è thread-safe: le richieste passano da throttle()
+            client = getattr(ccxt, exchange_id)({'enableRateLimit': False})
+            _clients[exchange_id] = client
+            _client_locks[exchange_id] = threading.Lock()
+            _stats['clients_created'] += 1
+        else:
+            _stats['clients_reused'] += 1
+        client_lock = _client_locks[exchange_id]
+        loaded_at = _markets_loaded_at.get(exchange_id)
+
+    if loaded_at is not None and time.time() - loaded_at <= markets_ttl:
+        with _lock:
+            _stats['markets_cache_hits'] += 1
+        return client
+
+    # Primo caricamento: si aspetta; ricarica: la fa un solo thread, gli altri non aspettano
+    if not client_lock.acquire(blocking=loaded_at is None):
+        with _lock:
+            _stats['markets_cache_hits'] += 1
+        return client
+    try:
+        loaded_at = _markets_loaded_at.get(exchange_id)
+        if loaded_at is None or time.time() - loaded_at > markets_ttl:
+            throttle(exchange_id)
+            client.load_markets(reload=loaded_at is not None)
+            with _lock:
+                _markets_loaded_at[exchange_id] = time.time()
+                _stats['markets_loads'] += 1
+        else:
+            with _lock:
+                _stats['markets_cache_hits'] += 1
+    finally:
+        client_lock.release()
+    return client
+
+
+class _TokenBucket:
+    """
+    Thread-safe token bucket: bursts of up to `capacity` requests, refilled at `rate` per second.
+    A caller reserves its token before sleeping, so waiters are served in arrival order.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self, cost=1):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if delay > 0:
+            time.sleep(delay)
+
+
+def set_rate_limit(exchange_id, requests_per_second, burst=1):
+    """
+    Override the request rate (and burst size) used by throttle() for `exchange_id`.
+    """
+    with _pacers_lock:
+        _pacers[exchange_id] = _TokenBucket(requests_per_second, burst)
+
+
+def throttle(exchange_id='kraken', cost=1):
+    """
+    Block until the next request to `exchange_id` is allowed.
+    Shared by every thread, so concurrent fetches respect the exchange rate limit:
+    RATE_LIMITS for the exchanges we know (Kraken: bursts of 15, then ~1 request/s),
+    otherwise one request per ccxt `rateLimit`; set_rate_limit overrides both.
+    """
+    with _pacers_lock:
+        pacer = _pacers.get(exchange_id)
+        if pacer is None:
+            if exchange_id in RATE_LIMITS:
+                burst, rate = RATE_LIMITS[exchange_id]
+            else:
+                import ccxt
+                burst, rate = 1, 1000.0 / (getattr(ccxt, exchange_id)().rateLimit or 1000)
+            pacer = _pacers[exchange_id] = _TokenBucket(rate, burst)
+    pacer.wait(cost)
+
+
+def reset_exchanges():
+    """
+    Drop every pooled client (e.g. after a network change or in tests).
+    """
+    with _lock:
+        for client in _clients.values():
+            session = getattr(client, 'session', None)
+            if session is not None:
+                session.close()
+        _clients.clear()
+        _client_locks.clear()
+        _markets_loaded_at.clear()
+
+
+def _pool_counts(session):
+    """
+    (requests, connections) over the urllib3 pools of a requests session; (0, 0) when the
+    pool internals are not available (other HTTP stacks or urllib3 versions).
+    """
+    requests_count = connections = 0
+    for adapter in session.adapters.values():
+        pools = getattr(getattr(adapter, 'poolmanager', None), 'pools', None)
+        try:
+            for key in list(pools.keys()):
+                pool = pools[key]
+                requests_count += getattr(pool, 'num_requests', 0)
+                connections += getattr(pool, 'num_connections', 0)
+        except (AttributeError, KeyError, TypeError):
+            continue  # pool rimosso nel frattempo o API diversa: statistica non disponibile
+    return requests_count, connections
+
+
+def get_connection_stats():
+    """
+    Report client and HTTP connection reuse for the pooled exchanges.
+    `http_requests - http_connections` is the number of requests served on a kept-alive connection.
+    """
+    with _lock:
+        stats = dict(_stats)
+        sessions = [getattr(client, 'session', None) for client in _clients.values()]
+
+    requests_count = connections = 0
+    for session in sessions:
+        if session is not None:
+            counts = _pool_counts(session)
+            requests_count += counts[0]
+            connections += counts[1]
+
+    stats['http_requests'] = requests_count
+    stats['http_connections'] = connections
+    stats['http_reused'] = max(requests_count - connections, 0)
+    return stats
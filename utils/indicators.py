@@ -0,0 +1,347 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from utils.candles import CandleArray, INDICATOR_COLUMNS, PRICE_COLUMNS, to_ms
+from utils.profiler import profiled
+
+NAN = float('nan')
+
+
+class _EMA:
+    """
+    EMA seeded with the SMA of the first `length` values (same as pandas_ta presma).
+    """
+    __slots__ = ('length', 'alpha', 'count', 'total', 'value')
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, x):
+        self.count += 1
+        if self.count < self.length:
+            self.total += x
+        elif self.count == self.length:
+            self.value = (self.total + x) / self.length
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+    def copy(self):
+        other = _EMA.__new__(_EMA)
+        other.length, other.alpha, other.count = self.length, self.alpha, self.count
+        other.total, other.value = self.total, self.value
+        return other
+
+
+class _RMA:
+    """
+    Wilder moving average (ewm alpha=1/length, adjust=False), as used by pandas_ta RSI.
+    """
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, length):
+        self.alpha = 1.0 / length
+        self.value = NAN
+
+    def update(self, x):
+        if math.isnan(self.value):
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+    def copy(self):
+        other = _RMA.__new__(_RMA)
+        other.alpha, other.value = self.alpha, self.value
+        return other
+
+
+class _Rolling:
+    """
+    Rolling mean / sample std over a fixed window using running sums.
+    Sums are kept relative to a shift value and recomputed exactly once per window
+    so floating point drift cannot accumulate.
+    """
+    __slots__ = ('length', 'window', 'shift', 'total', 'total_sq', 'since_reset')
+
+    def __init__(self, length):
+        self.length = length
+        self.window = deque(maxlen=length)
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.since_reset = 0
+
+    def update(self, x):
+        if self.shift is None:
+            self.shift = x
+        if len(self.window) == self.length:
+            old = self.window[0] - self.shift
+            self.total -= old
+            self.total_sq -= old * old
+        self.window.append(x)
+        d = x - self.shift
+        self.total += d
+        self.total_sq += d * d
+
+        self.since_reset += 1
+        if self.since_reset >= self.length:
+            self.shift = self.window[-1]
+            self.total = sum(v - self.shift for v in self.window)
+            self.total_sq = sum((v - self.shift) ** 2 for v in self.window)
+            self.since_reset = 0
+
+    def mean(self):
+        if len(self.window) < self.length:
+            return NAN
+        return self.shift + self.total / self.length
+
+    def std(self):
+        if len(self.window) < self.length:
+            return NAN
+        n = self.length
+        var = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(var) if var > 0 else 0.0
+
+    def copy(self):
+        other = _Rolling.__new__(_Rolling)
+        other.length = self.length
+        other.window = deque(self.window, maxlen=self.length)
+        other.shift, other.total, other.total_sq = self.shift, self.total, self.total_sq
+        other.since_reset = self.since_reset
+        return other
+
+
+class _State:
+    __slots__ = ('prev_close', 'rsi_pos', 'rsi_neg', 'ema_fast', 'ema_slow', 'macd_signal',
+                 'bb', 'ema_50', 'ema_200', 'vol')
+
+    def copy(self):
+        other = _State.__new__(_State)
+        other.prev_close = self.prev_close
+        for name in self.__slots__[1:]:
+            setattr(other, name, getattr(self, name).copy())
+        return other
+
+
+class IndicatorEngine:
+    """
+    Stateful version of calculate_technical_indicators.
+    Keeps running state (Wilder RSI averages, EMAs, rolling sums for Bollinger Bands and
+    volume SMA) so each appended candle, or a revision of the live candle, costs O(1).
+    Outputs match the pandas_ta batch path to within floating point tolerance; history is
+    kept in a CandleArray (float32 by default, `dtype='float64'` for exact parity).
+    """
+
+    def __init__(self, dtype='float32'):
+        self.dtype = dtype
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        state = _State()
+        state.prev_close = None
+        state.rsi_pos, state.rsi_neg = _RMA(14), _RMA(14)
+        state.ema_fast, state.ema_slow, state.macd_signal = _EMA(12), _EMA(26), _EMA(9)
+        state.bb = _Rolling(20)
+        state.ema_50, state.ema_200 = _EMA(50), _EMA(200)
+        state.vol = _Rolling(20)
+        self._state = state
+        # Stato prima dell'ultima candela: serve per rivedere la candela ancora aperta
+        self._prev_state = None
+        self.candles = CandleArray(indicators=True, dtype=self.dtype)
+        self._last = None
+
+    @property
+    def last_timestamp(self):
+        return self._last
+
+    def __len__(self):
+        return len(self.candles)
+
+    def _apply(self, state, close, volume):
+        if state.prev_close is None:
+            rsi = NAN
+        else:
+            change = close - state.prev_close
+            pos = state.rsi_pos.update(max(change, 0.0))
+            neg = state.rsi_neg.update(min(change, 0.0))
+            denom = pos + abs(neg)
+            rsi = 100.0 * pos / denom if denom != 0 else NAN
+        state.prev_close = close
+
+        fast = state.ema_fast.update(close)
+        slow = state.ema_slow.update(close)
+        macd = fast - slow
+        # La signal line parte dal primo valore valido del MACD
+        signal = state.macd_signal.update(macd) if not math.isnan(macd) else NAN
+
+        state.bb.update(close)
+        mid = state.bb.mean()
+        dev = 2.0 * state.bb.std()
+        lower, upper = mid - dev, mid + dev
+        width = upper - lower
+        bbb = 100.0 * width / mid if mid else NAN
+        bbp = (close - lower) / width if width else NAN
+
+        state.vol.update(volume)
+
+        return (rsi, macd, macd - signal, signal, lower, mid, upper, bbb, bbp,
+                state.ema_50.update(close), state.ema_200.update(close), state.vol.mean())
+
+    def update(self, timestamp, open_, high, low, close, volume):
+        """
+        Append a new candle, or revise the last one if `timestamp` equals the last timestamp.
+        Returns a dict with the indicator values for that candle.
+        """
+        with self._lock:
+            last = self.last_timestamp
+            revision = last is not None and timestamp == last
+            if revision:
+                # Candela live rivista: ripartiamo dallo stato precedente
+                self._state = self._prev_state.copy()
+            elif last is not None and timestamp < last:
+                raise ValueError(f"Candle {timestamp} is older than the last candle {last}")
+            else:
+                self._prev_state = self._state.copy()
+
+            row = self._apply(self._state, float(close), float(volume))
+            values = (open_, high, low, close, volume) + row
+            if revision:
+                self.candles.set_row(len(self.candles) - 1, to_ms(timestamp), values)
+            else:
+                self.candles.append(to_ms(timestamp), values)
+                self._last = pd.Timestamp(timestamp)
+        return dict(zip(INDICATOR_COLUMNS, row))
+
+    def load(self, df):
+        """
+        Feed every candle of an OHLCV frame (warm-up, O(n) once).
+        """
+        for row in df[['timestamp', 'open', 'high', 'low', 'close', 'volume']].itertuples(index=False):
+            self.update(*row)
+        return self
+
+    @profiled('indicators.sync')
+    def sync(self, df):
+        """
+        Bring the engine up to date with `df` (output of fetch_crypto_data) and return
+        the frame with indicators, like calculate_technical_indicators.
+        Only candles at or after the last processed timestamp are fed to the engine;
+        the state is rebuilt from `df` when it does not reach the last processed candle,
+        starts before the engine history (e.g. older candles filled in by a backfill) or
+        revises a candle before the last one.
+        """
+        if df.empty:
+            return df
+        timestamps = df['timestamp']
+        with self._lock:
+            last = self.last_timestamp
+            if last is None or not (timestamps == last).any() or not self._history_matches(df):
+                # Nessuna sovrapposizione, storico più lungo o candele chiuse riviste: da zero
+                self.reset()
+                self.load(df)
+            else:
+                self.load(df[timestamps >= last])
+            return self.to_frame(since=timestamps.iloc[0])
+
+    def _history_matches(self, df):
+        """
+        True when the candles of `df` before the last processed one are exactly the engine
+        history from the first candle of `df` on (same timestamps and OHLCV values).
+        """
+        timestamps = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype('int64')
+        if timestamps[0] < self.candles.timestamp[0]:
+            return False
+        closed = timestamps < self.candles.last_timestamp
+        start, stop = self.candles.search(timestamps[0]), len(self.candles) - 1
+        if not np.array_equal(timestamps[closed], self.candles.timestamp[start:stop]):
+            return False
+        for i, name in enumerate(PRICE_COLUMNS):
+            values = np.asarray(df[name].to_numpy()[closed], dtype=self.candles.dtype)
+            if not np.array_equal(values, self.candles.values[i, start:stop], equal_nan=True):
+                return False
+        return True
+
+    def to_frame(self, since=None):
+        """
+        Export candles and indicators as a DataFrame (optionally only from `since`).
+        The frame is a zero-copy read-only view of the engine history; a later revision of
+        the live candle is visible through it.
+        """
+        with self._lock:
+            start = self.candles.search(to_ms(since)) if since is not None else 0
+            return self.candles.to_frame(start)
+
+
+def _ema_columns(values, length):
+    """
+    EMA of every column of `values` (rows x columns, no NaN), seeded with the SMA of the
+    first `length` rows like pandas_ta ema.
+    """
+    out = np.full(values.shape, np.nan)
+    if len(values) < length:
+        return out
+    seeded = values.copy()
+    seeded[:length - 1] = np.nan
+    seeded[length - 1] = values[:length].mean(axis=0)
+    out[:] = pd.DataFrame(seeded).ewm(span=length, adjust=False).mean().to_numpy()
+    return out
+
+
+@profiled('indicators.batch')
+def batch_indicators(frames, min_rows=200):
+    """
+    calculate_technical_indicators for many OHLCV frames at once (e.g. a market scan).
+    Frames of equal length are stacked into (rows x frames) matrices, so every indicator is
+    a single vectorized pass over the whole group instead of one pandas_ta call per frame.
+    Returns {key: copy of the frame with INDICATOR_COLUMNS}; frames shorter than
+    `min_rows` (EMA 200 warm-up) are left out, callers handle them one by one.
+    """
+    groups = {}
+    for key, df in frames.items():
+        if len(df) >= min_rows:
+            groups.setdefault(len(df), []).append(key)
+
+    results = {}
+    for keys in groups.values():
+        close = np.column_stack([frames[key]['close'].to_numpy(dtype='float64') for key in keys])
+        volume = np.column_stack([frames[key]['volume'].to_numpy(dtype='float64') for key in keys])
+
+        # RSI di Wilder (rma = ewm alpha 1/14), come pandas_ta rsi
+        change = pd.DataFrame(close).diff()
+        pos = change.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        neg = change.clip(upper=0).abs().ewm(alpha=1 / 14, adjust=False).mean()
+        rsi = (100 * pos / (pos + neg)).to_numpy()
+
+        # MACD: la signal line parte dal primo valore valido del MACD
+        macd = _ema_columns(close, 12) - _ema_columns(close, 26)
+        signal = np.full(macd.shape, np.nan)
+        signal[25:] = _ema_columns(macd[25:], 9)
+
+        rolling = pd.DataFrame(close).rolling(window=20)
+        mid = rolling.mean().to_numpy()
+        dev = 2.0 * rolling.std().to_numpy()
+        lower, upper = mid - dev, mid + dev
+
+        columns = {
+            'RSI': rsi, 'MACD_12_26_9': macd, 'MACDh_12_26_9': macd - signal, 'MACDs_12_26_9': signal,
+            'BBL': lower, 'BBM': mid, 'BBU': upper, 'BBB': 100 * (upper - lower) / mid,
+            'BBP': (close - lower) / (upper - lower),
+            'EMA_50': _ema_columns(close, 50), 'EMA_200': _ema_columns(close, 200),
+            'VOL_SMA_20': pd.DataFrame(volume).rolling(window=20).mean().to_numpy(),
+        }
+        block = np.stack([columns[name] for name in INDICATOR_COLUMNS])  # (indicatori, righe, frame)
+        for i, key in enumerate(keys):
+            df = frames[key].drop(columns=INDICATOR_COLUMNS, errors='ignore')
+            indicators = pd.DataFrame(block[:, :, i].T, columns=INDICATOR_COLUMNS, index=df.index)
+            results[key] = pd.concat([df, indicators], axis=1)
+    return results
@@ -0,0 +1,107 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.data import TIMEFRAME_MINUTES, fetch_crypto_data
+from utils.macro import MACRO_SYMBOLS, fetch_macro_data
+from utils.sentiment import fetch_news_sentiment
+from utils.prefetch import get_prefetcher
+from utils.resample import derive_timeframe
+from utils.profiler import profiled
+from utils.runtime import in_streamlit, report_error
+
+# Paniere macro della dashboard: DXY per la correlazione, poi gli indici azionari
+DASHBOARD_MACRO = ('dxy', 'spx', 'nasdaq', 'ndx')
+MACRO_HISTORY = 250  # barre daily: coprono la finestra di correlazione più lunga (120) con margine
+
+
+def _call_key(func, args, kwargs):
+    key = (func, tuple(args), tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        # Argomenti non hashable (es. DataFrame): la chiamata non viene deduplicata
+        return object()
+    return key
+
+
+def run_parallel(tasks, max_workers=8):
+    """
+    Run independent I/O calls concurrently on a thread pool.
+    tasks: dict {name: (func, args, kwargs)}. Identical calls (same function and
+    arguments) are issued only once and their result is shared by every name.
+    Returns dict {name: result}; a call that raises yields None for its names.
+    """
+    ctx = None
+    if in_streamlit():
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        ctx = get_script_run_ctx()
+
+    def _attach_ctx():
+        # Senza il contesto Streamlit i thread non possono mostrare st.error/st.warning
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+
+    unique = {}
+    for name, (func, args, kwargs) in tasks.items():
+        unique.setdefault(_call_key(func, args, kwargs), ((func, args, kwargs), []))[1].append(name)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers, initializer=_attach_ctx) as pool:
+        # Ogni task gira in una copia del contesto del chiamante (trace del profiler attiva)
+        futures = {pool.submit(contextvars.copy_context().run, func, *args, **kwargs): names
+                   for (func, args, kwargs), names in unique.values()}
+        for future, names in futures.items():
+            try:
+                value = future.result()
+            except Exception as e:
+                report_error(names[0], f"Error in parallel fetch {names}: {e}")
+                value = None
+            for name in names:
+                results[name] = value
+    return results
+
+
+@profiled()
+def load_market_data(symbol='BTC/USDT'):
+    """
+    Fetch every data source used by the dashboard concurrently.
+    Wall-clock time is bounded by the slowest single call instead of their sum.
+    With the background prefetcher running (utils/prefetch.py) the last good values are
+    served at once and only a cold start waits for the network.
+    4h and 1d candles are derived locally from the 1h series (see utils/resample.py).
+    """
+    tasks = {
+        '1h': (fetch_crypto_data, (symbol,), {'timeframe': '1h', 'limit': 500}),
+        '15m': (fetch_crypto_data, (symbol,), {'timeframe': '15m', 'limit': 400}),
+        # DXY e indici azionari in un solo download multi-ticker (utils/macro.py)
+        'macro': (fetch_macro_data, (DASHBOARD_MACRO,), {'limit': MACRO_HISTORY}),
+        'news': (fetch_news_sentiment, (), {}),
+    }
+    prefetcher = get_prefetcher()
+    if prefetcher is not None:
+        results = prefetcher.get_many(tasks, {name: TIMEFRAME_MINUTES[name] for name in ('1h', '15m')})
+    else:
+        results = run_parallel(tasks)
+
+    base = results['1h'] if results['1h'] is not None else pd.DataFrame()
+    derived = run_parallel({
+        '4h': (derive_timeframe, (base, '4h', 400), {'symbol': symbol}),
+        '1d': (derive_timeframe, (base, '1d', 400), {'symbol': symbol}),
+    })
+    results.update(derived)
+    macro = results['macro'] = results['macro'] or {}
+    results['dxy'] = macro.get('dxy')
+    results['stocks'] = {MACRO_SYMBOLS[name][0]: macro[name] for name in DASHBOARD_MACRO[1:] if name in macro}
+    # Lo storico daily per i livelli storici è lo stesso frame del '1d'
+    results['daily_hist'] = results['1d']
+
+    # Default in caso di errore, come nel caricamento sequenziale
+    for key in ['1h', '15m', '4h', '1d', 'daily_hist', 'dxy']:
+        if results[key] is None:
+            results[key] = pd.DataFrame()
+    if results['news'] is None:
+        results['news'] = ("Neutral", 0, [])
+    return results
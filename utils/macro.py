@@ -0,0 +1,133 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.cache import ttl_cache
+from utils.profiler import profiled, span
+from utils.runtime import report_error, report_warning
+from utils.store import last_timestamp, load_candles, save_candles
+
+# Paniere macro: nome -> ticker Yahoo Finance (il primo con dati vince, gli altri sono fallback)
+MACRO_SYMBOLS = {
+    'dxy': ('DX-Y.NYB', 'DX=F'),
+    'spx': ('^GSPC',),
+    'nasdaq': ('^IXIC',),
+    'ndx': ('^NDX',),
+    'us10y': ('^TNX',),
+    'gold': ('GC=F',),
+    'eth': ('ETH-USD',),
+}
+
+DAILY = 1440  # timeframe (minuti) delle barre macro nello store locale
+HISTORY_DAYS = 400  # storico scaricato la prima volta per un ticker nuovo (~275 sedute)
+DAY_MS = 86400000
+
+
+def _download(tickers, start):
+    """
+    One multi-symbol yfinance request for `tickers` from `start` (YYYY-MM-DD).
+    Returns {ticker: [[ms, o, h, l, c, v], ...]}; tickers without data are missing.
+    """
+    import yfinance as yf
+
+    with span('yfinance.download', tickers=','.join(tickers), start=start):
+        frame = yf.download(list(tickers), start=start, interval='1d', group_by='ticker',
+                            threads=True, progress=False, auto_adjust=True)
+    if frame is None or frame.empty:
+        return {}
+    if not isinstance(frame.columns, pd.MultiIndex):
+        frame.columns = pd.MultiIndex.from_product([[tickers[0]], frame.columns])
+
+    rows = {}
+    for ticker in tickers:
+        if ticker not in frame.columns.get_level_values(0):
+            continue
+        bars = frame[ticker].dropna(subset=['Close'])
+        if bars.empty:
+            continue
+        index = pd.DatetimeIndex(bars.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        # Barre daily indicizzate per data (mezzanotte UTC), come le candele 1d di Kraken
+        timestamps = index.normalize().as_unit('ms').asi8
+        volume = bars['Volume'].fillna(0.0).to_numpy() if 'Volume' in bars else [0.0] * len(bars)
+        rows[ticker] = [[int(ts), o, h, l, c, v] for ts, o, h, l, c, v in zip(
+            timestamps, bars['Open'].to_numpy(), bars['High'].to_numpy(), bars['Low'].to_numpy(),
+            bars['Close'].to_numpy(), volume)]
+    return rows
+
+
+@profiled()
+def sync_daily_bars(tickers, max_workers=4):
+    """
+    Bring the local daily bars of `tickers` up to date. Tickers are grouped by the first
+    day they are missing (the last stored bar is fetched again, it may still be open) and
+    every group is a single multi-symbol download; groups run concurrently.
+    Returns (updated tickers, {group start: error message}).
+    """
+    today_ms = int(time.time() * 1000) // DAY_MS * DAY_MS
+    groups = {}
+    for ticker in tickers:
+        stored_last, _ = last_timestamp(ticker, DAILY)
+        start_ms = stored_last if stored_last is not None else today_ms - HISTORY_DAYS * DAY_MS
+        start = time.strftime('%Y-%m-%d', time.gmtime(start_ms / 1000))
+        groups.setdefault(start, []).append(ticker)
+
+    updated, errors = [], {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(groups)) or 1) as pool:
+        futures = {start: pool.submit(contextvars.copy_context().run, _download, group, start)
+                   for start, group in groups.items()}
+        for start, future in futures.items():
+            try:
+                rows = future.result()
+            except Exception as e:
+                errors[start] = str(e)
+                continue
+            for ticker, bars in rows.items():
+                save_candles(ticker, DAILY, bars)
+                updated.append(ticker)
+    return updated, errors
+
+
+def load_daily_bars(ticker, limit=None):
+    """
+    Stored daily bars shaped like yfinance history(): Date index, Open/High/Low/Close/Volume.
+    """
+    candles = load_candles(ticker, DAILY, limit=limit)
+    frame = candles.rename(columns=str.capitalize).set_index('Timestamp')
+    frame.index.name = 'Date'
+    return frame
+
+
+@ttl_cache(ttl=300)
+def fetch_macro_data(names=('dxy', 'spx', 'nasdaq'), limit=60):
+    """
+    Daily bars for a basket of MACRO_SYMBOLS names (or raw Yahoo tickers), as {name: DataFrame}.
+    The whole basket costs one download per distinct missing-days window, not one call per
+    ticker; bars are kept in the local candle store, so only missing days are fetched and the
+    stored history is used when Yahoo is unreachable. Fallback tickers (DX=F for DXY) are
+    tried, again in one batch, only for names that still have no data.
+    """
+    candidates = {name: list(MACRO_SYMBOLS.get(name, (name,))) for name in names}
+    chosen = {}
+    errors = {}
+    while candidates:
+        batch = {name: tickers.pop(0) for name, tickers in candidates.items()}
+        _, failed = sync_daily_bars(sorted(set(batch.values())))
+        errors.update(failed)
+        for name, ticker in batch.items():
+            frame = load_daily_bars(ticker, limit=limit)
+            if not frame.empty or not candidates[name]:
+                chosen[name] = frame
+        candidates = {name: tickers for name, tickers in candidates.items()
+                      if name not in chosen}
+
+    missing = [name for name, frame in chosen.items() if frame.empty]
+    if missing:
+        detail = f" ({next(iter(errors.values()))})" if errors else ""
+        report_error('macro', f"Error fetching macro data for {', '.join(missing)}{detail}")
+    elif errors:
+        report_warning('macro', f"Yahoo Finance non raggiungibile, uso i dati locali: {next(iter(errors.values()))}")
+    return chosen
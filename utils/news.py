@@ -0,0 +1,298 @@
+import contextvars
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from xml.etree.ElementTree import iterparse
+
+from utils.profiler import span
+from utils.runtime import DATA_DIR
+
+NEWS_DB_PATH = os.path.join(DATA_DIR, 'news.sqlite')
+
+# Feed RSS/Atom interrogati ad ogni aggiornamento (sovrascrivibili con TRADING_NEWS_FEEDS, separati da virgola)
+DEFAULT_FEEDS = [
+    'https://finance.yahoo.com/rss/headline?s=BTC-USD',
+    'https://www.coindesk.com/arc/outboundfeeds/rss/',
+    'https://cointelegraph.com/rss',
+    'https://decrypt.co/feed',
+    'https://bitcoinmagazine.com/.rss/full/',
+]
+
+MAX_ITEMS_PER_FEED = 50
+RETENTION_DAYS = 30
+USER_AGENT = 'Mozilla/5.0 (trading-dashboard news reader)'
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+_session = None
+_session_lock = threading.Lock()
+
+
+def configured_feeds():
+    env = os.environ.get('TRADING_NEWS_FEEDS')
+    return [url.strip() for url in env.split(',') if url.strip()] if env else list(DEFAULT_FEEDS)
+
+
+def get_connection(db_path=None):
+    """
+    Open the local news store, creating the schema on first use.
+    """
+    db_path = db_path or NEWS_DB_PATH
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+
+    with _schema_lock:
+        if db_path not in _schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Stato HTTP per feed: validatori per le GET condizionali
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS feeds (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    checked_at INTEGER,
+                    status INTEGER
+                )
+            """)
+            # Una riga per notizia: id = hash dell'URL normalizzato, title_hash evita i duplicati tra feed
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS news (
+                    id TEXT PRIMARY KEY,
+                    title_hash TEXT UNIQUE,
+                    title TEXT NOT NULL,
+                    link TEXT,
+                    published TEXT,
+                    published_ms INTEGER,
+                    source TEXT,
+                    fetched_at INTEGER,
+                    score REAL,
+                    sentiment TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS news_published ON news (published_ms)")
+            # Punteggi di sentiment per hash del titolo (utils.sentiment_engine): mai ricalcolati
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sentiment_cache (
+                    title_hash TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    polarity REAL,
+                    subjectivity REAL
+                )
+            """)
+            conn.commit()
+            _schema_ready.add(db_path)
+    return conn
+
+
+def _get_session():
+    """
+    Shared requests session: keep-alive connections reused across polls and feeds.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+            _session.headers['User-Agent'] = USER_AGENT
+        return _session
+
+
+def normalize_url(url):
+    """
+    Canonical form of an article URL: no fragment, no tracking parameters, no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parts.query) if not k.lower().startswith(('utm_', 'guccounter'))]
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+
+def _hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _title_key(title):
+    return re.sub(r'\W+', ' ', title.lower()).strip()
+
+
+def _parse_date(text):
+    if not text:
+        return None
+    try:
+        dt = parsedate_to_datetime(text)  # RSS (RFC 822)
+    except (TypeError, ValueError):
+        try:
+            dt = datetime.fromisoformat(text.strip().replace('Z', '+00:00'))  # Atom (ISO 8601)
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_feed(stream, source, limit=MAX_ITEMS_PER_FEED):
+    """
+    Stream-parse an RSS or Atom document (file-like) into item dicts.
+    Elements are cleared as soon as they are read, so memory stays flat for large feeds.
+    """
+    items = []
+    for _, elem in iterparse(stream, events=('end',)):
+        if _local(elem.tag) not in ('item', 'entry'):
+            continue
+        fields = {}
+        for child in elem:
+            name = _local(child.tag)
+            if name == 'link' and child.get('href'):
+                # Atom: <link href="..."/>, preferiamo rel="alternate"
+                if child.get('rel', 'alternate') == 'alternate' or 'link' not in fields:
+                    fields['link'] = child.get('href')
+            elif name in ('title', 'link', 'pubDate', 'published', 'updated', 'guid', 'id') and child.text:
+                fields.setdefault(name, child.text.strip())
+        elem.clear()
+
+        title = fields.get('title')
+        link = fields.get('link') or fields.get('guid') or fields.get('id')
+        if not title:
+            continue
+        published = fields.get('pubDate') or fields.get('published') or fields.get('updated') or ''
+        items.append({
+            'title': title,
+            'link': link or '',
+            'published': published,
+            'published_ms': _parse_date(published),
+            'source': source,
+        })
+        if len(items) >= limit:
+            break
+    return items
+
+
+def _poll_feed(url, state, timeout):
+    """
+    Conditional GET of one feed. Returns (status, validators, items); 304 -> no items.
+    """
+    headers = {}
+    if state and state[0]:
+        headers['If-None-Match'] = state[0]
+    if state and state[1]:
+        headers['If-Modified-Since'] = state[1]
+
+    with span('rss.get', url=url) as record:
+        response = _get_session().get(url, headers=headers, timeout=timeout, stream=True)
+        if record is not None:
+            record['status'] = response.status_code
+    try:
+        if response.status_code == 304:
+            return 304, state, []
+        response.raise_for_status()
+        response.raw.decode_content = True  # gzip/deflate decompressi durante il parsing
+        with span('rss.parse', url=url):
+            items = parse_feed(response.raw, urlsplit(url).netloc)
+        validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return response.status_code, validators, items
+    finally:
+        response.close()
+
+
+def ingest_feeds(feeds=None, max_workers=8, timeout=5, db_path=None):
+    """
+    Poll every feed concurrently (conditional GET over a pooled session), deduplicate
+    stories by URL and title hash and store them. Returns (new items, info dict);
+    items already in the store are never returned again. Failing feeds are listed in
+    info['errors'] ({url: message}) and do not stop the others.
+    """
+    feeds = feeds or configured_feeds()
+    with closing(get_connection(db_path)) as conn:
+        states = {row[0]: (row[1], row[2]) for row in conn.execute("SELECT url, etag, last_modified FROM feeds")}
+
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(feeds)) or 1) as pool:
+        futures = {url: pool.submit(contextvars.copy_context().run, _poll_feed, url, states.get(url), timeout)
+                   for url in feeds}
+        for url, future in futures.items():
+            try:
+                results[url] = future.result()
+            except Exception as e:
+                errors[url] = str(e)
+                results[url] = None
+
+    now_ms = int(time.time() * 1000)
+    new_items = []
+    with closing(get_connection(db_path)) as conn:
+        for url, result in results.items():
+            if result is None:
+                conn.execute("INSERT INTO feeds (url, checked_at, status) VALUES (?, ?, 0) "
+                             "ON CONFLICT(url) DO UPDATE SET checked_at = excluded.checked_at, status = 0",
+                             (url, now_ms))
+                continue
+            status, validators, items = result
+            etag, last_modified = validators or (None, None)
+            conn.execute("INSERT OR REPLACE INTO feeds VALUES (?, ?, ?, ?, ?)",
+                         (url, etag, last_modified, now_ms, status))
+            for item in items:
+                item['id'] = _hash(normalize_url(item['link'])) if item['link'] else _hash(item['title'])
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO news (id, title_hash, title, link, published, published_ms, source, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (item['id'], _hash(_title_key(item['title'])), item['title'], item['link'], item['published'],
+                     item['published_ms'] or now_ms, item['source'], now_ms))
+                if cursor.rowcount:
+                    new_items.append(item)
+        conn.execute("DELETE FROM news WHERE fetched_at < ?", (now_ms - RETENTION_DAYS * 86400000,))
+        conn.commit()
+
+    info = {
+        'feeds': len(feeds),
+        'failed': len(errors),
+        'not_modified': sum(1 for r in results.values() if r and r[0] == 304),
+        'new_items': len(new_items),
+        'errors': errors,
+    }
+    return new_items, info
+
+
+def save_scores(scores, db_path=None):
+    """
+    Store sentiment for already-ingested items: {id: (score, label)}.
+    """
+    if not scores:
+        return
+    with closing(get_connection(db_path)) as conn:
+        conn.executemany("UPDATE news SET score = ?, sentiment = ? WHERE id = ?",
+                         [(score, label, item_id) for item_id, (score, label) in scores.items()])
+        conn.commit()
+
+
+def unscored_items(db_path=None):
+    with closing(get_connection(db_path)) as conn:
+        rows = conn.execute("SELECT id, title FROM news WHERE score IS NULL").fetchall()
+    return [{'id': row[0], 'title': row[1]} for row in rows]
+
+
+def latest_news(limit=10, db_path=None):
+    """
+    Most recent stored stories (newest first), shaped like the dashboard news items.
+    """
+    with closing(get_connection(db_path)) as conn:
+        rows = conn.execute(
+            "SELECT id, title, link, published, source, score, sentiment FROM news "
+            "ORDER BY published_ms DESC LIMIT ?", (int(limit),)).fetchall()
+    return [{'id': r[0], 'title': r[1], 'link': r[2], 'published': r[3], 'source': r[4],
+             'score': r[5] if r[5] is not None else 0.0, 'sentiment': r[6] or 'Neutral'} for r in rows]
@@ -0,0 +1,180 @@
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from utils.backtest import DEFAULT_PARAMS, ema, rsi, run_backtest
+from utils.resample import resample_ohlcv
+
+# Spazio di ricerca di esempio attorno ai valori attuali della strategia
+DEFAULT_SPACE = {
+    'rsi_long_max': [65, 70, 75],
+    'rsi_short_min': [25, 30, 35],
+    'rsi_long_entry': [None, 35, 45],
+    'rsi_short_entry': [None, 55, 65],
+    'ema_slow': [100, 200],
+    'daily_ema': [100, 200],
+    'long_stop_mult': [0.98, 0.99, 0.995],
+    'short_stop_mult': [1.005, 1.01, 1.02],
+    'fib_window': [50, 100, 200],
+}
+
+METRICS = ['total_return_pct', 'win_rate', 'max_drawdown_pct', 'n_trades']
+
+# Viste NumPy sulla memoria condivisa, create una volta per processo worker
+_worker_arrays = None
+_worker_blocks = []
+
+
+def parameter_grid(space):
+    """
+    Every combination of the values in `space` ({param: [values]}).
+    """
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_search(space, n_iter, seed=None):
+    """
+    `n_iter` distinct random combinations from `space` (or the full grid if smaller).
+    Combinations are drawn as indices into the grid and decoded one by one, so the grid
+    is never built: the cost depends on `n_iter`, not on the size of the space.
+    """
+    keys = list(space)
+    sizes = [len(space[k]) for k in keys]
+    total = int(np.prod(sizes, dtype=object))
+    if n_iter >= total:
+        return parameter_grid(space)
+
+    rng = random.Random(seed)
+    indices, seen = [], set()
+    while len(indices) < n_iter:
+        index = rng.randrange(total)  # interi Python: nessun limite alla dimensione dello spazio
+        if index not in seen:
+            seen.add(index)
+            indices.append(index)
+
+    combos = []
+    for index in indices:
+        combo = {}
+        # Indice in base mista, ultimo parametro più veloce (stesso ordine di parameter_grid)
+        for key, size in zip(reversed(keys), reversed(sizes)):
+            index, digit = divmod(index, size)
+            combo[key] = space[key][digit]
+        combos.append({k: combo[k] for k in keys})
+    return combos
+
+
+def precompute_arrays(df_1h, combos, df_daily=None):
+    """
+    OHLC arrays plus every indicator column needed by `combos`, computed once in the parent.
+    Keys follow the names looked up by utils.backtest.compute_signals.
+    """
+    if df_daily is None:
+        df_daily = resample_ohlcv(df_1h, 1440)
+
+    arrays = {
+        'timestamp': df_1h['timestamp'].to_numpy(dtype='datetime64[ms]').astype('int64'),
+        'daily_timestamp': df_daily['timestamp'].to_numpy(dtype='datetime64[ms]').astype('int64'),
+        'daily_close': df_daily['close'].to_numpy(dtype='float64'),
+    }
+    for col in ['open', 'high', 'low', 'close']:
+        arrays[col] = df_1h[col].to_numpy(dtype='float64')
+
+    params = [dict(DEFAULT_PARAMS, **combo) for combo in combos]
+    for length in {p['daily_ema'] for p in params}:
+        arrays[f'daily_ema_{length}'] = ema(arrays['daily_close'], length)
+    for length in {p['ema_fast'] for p in params} | {p['ema_slow'] for p in params}:
+        arrays[f'ema_{length}'] = ema(arrays['close'], length)
+    for length in {p['rsi_length'] for p in params}:
+        arrays[f'rsi_{length}'] = rsi(arrays['close'], length)
+    for window in {p['fib_window'] for p in params}:
+        arrays[f'fib_high_{window}'] = pd.Series(arrays['high']).rolling(window=window).max().to_numpy()
+        arrays[f'fib_low_{window}'] = pd.Series(arrays['low']).rolling(window=window).min().to_numpy()
+    return arrays
+
+
+def _to_shared(arrays):
+    """
+    Copy arrays into shared memory blocks. Returns (blocks, spec) where spec is the
+    picklable description ({key: (block name, shape, dtype)}) sent to the workers.
+    """
+    blocks, spec = [], {}
+    for key, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[:] = arr
+        blocks.append(block)
+        spec[key] = (block.name, arr.shape, arr.dtype.str)
+    return blocks, spec
+
+
+def _init_worker(spec):
+    global _worker_arrays
+    _worker_arrays = {}
+    for key, (name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=name)
+        _worker_blocks.append(block)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        view.flags.writeable = False
+        _worker_arrays[key] = view
+
+
+def _evaluate(combo):
+    result = run_backtest(None, params=combo, arrays=_worker_arrays)
+    row = dict(combo)
+    row.update({m: result[m] for m in METRICS})
+    row['runtime_s'] = result['runtime_s']
+    return row
+
+
+def run_sweep(df_1h, space=None, method='grid', n_iter=100, n_jobs=None, rank_by='total_return_pct',
+              ascending=False, min_trades=1, df_daily=None, seed=None):
+    """
+    Evaluate many parameter combinations of the backtest across a process pool.
+    OHLC and indicator columns are computed once and shared with the workers through
+    shared memory (read-only NumPy views, no per-worker copies).
+    `rank_by` is a metric name or a list of names; results with fewer than `min_trades`
+    trades are dropped. Returns (ranked DataFrame, info dict).
+    """
+    started = time.perf_counter()
+    space = space or DEFAULT_SPACE
+    combos = parameter_grid(space) if method == 'grid' else random_search(space, n_iter, seed)
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    arrays = precompute_arrays(df_1h, combos, df_daily)
+    if n_jobs == 1:
+        global _worker_arrays
+        _worker_arrays = arrays
+        try:
+            rows = [_evaluate(c) for c in combos]
+        finally:
+            _worker_arrays = None  # non trattenere gli array precalcolati dopo lo sweep
+    else:
+        blocks, spec = _to_shared(arrays)
+        try:
+            # Chunk grandi: meno overhead di IPC per combinazione
+            chunksize = max(1, len(combos) // (n_jobs * 4))
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(spec,)) as pool:
+                rows = list(pool.map(_evaluate, combos, chunksize=chunksize))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    results = pd.DataFrame(rows)
+    if len(results):
+        results = results[results['n_trades'] >= min_trades]
+        results = results.sort_values(rank_by, ascending=ascending).reset_index(drop=True)
+
+    info = {
+        'combinations': len(combos),
+        'n_jobs': n_jobs,
+        'elapsed_s': time.perf_counter() - started,
+    }
+    return results, info
@@ -0,0 +1,201 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.profiler import span
+from utils.runtime import defer_reports, logger, replay_reports
+
+# Un dato viene rinfrescato all'80% del suo ttl, e comunque subito dopo la chiusura di ogni candela
+REFRESH_AHEAD = 0.8
+CLOSE_DELAY = 2.0  # secondi dopo la chiusura: l'exchange ha già pubblicato la barra chiusa
+DEFAULT_TTL = 60
+IDLE_SECONDS = 1800  # chiavi non più richieste (es. simbolo cambiato) smettono di essere rinfrescate
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def next_close(now, timeframe_minutes):
+    """
+    Epoch seconds of the first candle close after `now` for a timeframe in minutes.
+    """
+    period = timeframe_minutes * 60
+    return (now // period + 1) * period
+
+
+def _is_good(value):
+    # I fetcher segnalano un fallimento con None (es. fetch_news_sentiment) o con un frame vuoto
+    if value is None:
+        return False
+    empty = getattr(value, 'empty', None)
+    return not empty if isinstance(empty, bool) else True
+
+
+class _Entry:
+    __slots__ = ('label', 'call', 'ttl', 'timeframe', 'value', 'fetched_at', 'due', 'stale_at',
+                 'last_used', 'future', 'reports')
+
+    def __init__(self, func, args, kwargs, timeframe):
+        self.label = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+        if hasattr(func, 'get_fresh'):
+            # Refresh attraverso ttl_cache: con un backend condiviso un solo worker chiama l'upstream
+            self.call = lambda not_before: func.get_fresh(not_before, *args, **kwargs)
+        else:
+            self.call = lambda not_before: func(*args, **kwargs)
+        self.ttl = getattr(func, 'ttl', DEFAULT_TTL)
+        self.timeframe = timeframe
+        self.value = None
+        self.fetched_at = None
+        self.due = self.stale_at = 0.0
+        self.last_used = time.time()
+        self.future = None
+        self.reports = []
+
+
+class Prefetcher:
+    """
+    Background refresh scheduler with stale-while-revalidate semantics.
+    Every key read through get_many() is refreshed by a worker pool ahead of its ttl and
+    right after each candle close of its timeframe; readers get the last good value at once,
+    even while a refresh is running or after it failed. Only a key never loaded before
+    (cold start) makes the reader wait. Refreshes go through the ttl_cache of the fetcher
+    (get_fresh), so with a shared backend the workers of a deployment share one upstream
+    call per refresh; exchange calls keep going through utils.exchange.throttle.
+    """
+
+    def __init__(self, max_workers=4):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='prefetch-scheduler', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule(self, entry, now):
+        entry.due = now + entry.ttl * REFRESH_AHEAD
+        entry.stale_at = now + entry.ttl
+        if entry.timeframe:
+            close = next_close(now, entry.timeframe) + CLOSE_DELAY
+            entry.due = min(entry.due, close)
+            entry.stale_at = min(entry.stale_at, close)
+
+    def _submit(self, entry):
+        # Chiamato con self._lock acquisito: al massimo un refresh in corso per chiave
+        if entry.future is None:
+            entry.future = self._pool.submit(self._refresh, entry)
+        return entry.future
+
+    def _not_before(self, entry, now):
+        """
+        Oldest computation time acceptable for a refresh: recent enough to last until the next
+        scheduled refresh, and after the last candle close for candle keys.
+        """
+        not_before = now - entry.ttl * (1 - REFRESH_AHEAD)
+        if entry.timeframe:
+            not_before = max(not_before, next_close(now, entry.timeframe) - entry.timeframe * 60 + CLOSE_DELAY)
+        return min(not_before, now)
+
+    def _refresh(self, entry):
+        with span('prefetch.refresh', task=entry.label), defer_reports() as reports:
+            try:
+                value = entry.call(self._not_before(entry, time.time()))
+            except Exception as e:
+                reports.append({'source': entry.label, 'level': 'error',
+                                'message': f"Error refreshing {entry.label}: {e}"})
+                value = None
+
+        now = time.time()
+        with self._lock:
+            # Un refresh fallito lascia in servizio l'ultimo valore buono
+            if _is_good(value) or entry.fetched_at is None:
+                entry.value = value
+            entry.fetched_at = now
+            entry.reports = reports
+            self._schedule(entry, now)
+            entry.future = None
+        self._wake.set()
+
+    def get_many(self, tasks, timeframes=None):
+        """
+        Serve {name: (func, args, kwargs)} as {name: value}, like utils.loader.run_parallel.
+        `timeframes` maps names to candle minutes for close-aligned refreshes. Cold keys are
+        loaded concurrently and waited for; stale keys are served as they are and refreshed
+        in the background. Reports raised by the refresh behind a value are replayed once,
+        in the calling thread.
+        """
+        timeframes = timeframes or {}
+        now = time.time()
+        entries, cold = {}, []
+        with self._lock:
+            for name, (func, args, kwargs) in tasks.items():
+                key = (func, tuple(args), tuple(sorted(kwargs.items())))
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = _Entry(func, args, kwargs, timeframes.get(name))
+                entry.last_used = now
+                entries[name] = entry
+                if entry.fetched_at is None:
+                    cold.append(self._submit(entry))
+                elif now >= entry.stale_at:
+                    self._submit(entry)
+        self._wake.set()
+
+        for future in cold:
+            future.result()
+
+        results, reports = {}, []
+        with self._lock:
+            for name, entry in entries.items():
+                results[name] = entry.value
+                reports.extend(entry.reports)
+                entry.reports = []
+        replay_reports(reports)
+        return results
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            now = time.time()
+            with self._lock:
+                for key, entry in list(self._entries.items()):
+                    if now - entry.last_used > IDLE_SECONDS and entry.future is None:
+                        del self._entries[key]
+                    elif entry.fetched_at is not None and entry.future is None and now >= entry.due:
+                        try:
+                            self._submit(entry)
+                        except RuntimeError:
+                            return  # pool chiuso da stop()
+                waiting = [entry.due for entry in self._entries.values() if entry.future is None]
+            timeout = min(waiting, default=now + DEFAULT_TTL) - now
+            self._wake.wait(max(timeout, 0.05))
+        logger.debug("prefetch scheduler stopped")
+
+
+def start_prefetcher(max_workers=4):
+    """
+    Start (once per process) the shared background prefetcher used by utils.loader.
+    """
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher(max_workers=max_workers).start()
+        return _prefetcher
+
+
+def get_prefetcher():
+    """
+    The running prefetcher, or None when start_prefetcher() was never called (CLI, one-shot jobs).
+    """
+    return _prefetcher
@@ -0,0 +1,193 @@
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Trace attiva nel contesto corrente; run_parallel copia il contesto nei thread worker
+_current = contextvars.ContextVar('trading_trace', default=None)
+_depth = contextvars.ContextVar('trading_span_depth', default=0)
+
+
+class Trace:
+    """
+    Timing spans recorded during one pipeline run (a dashboard rerun or a CLI call).
+    Optional capture: `cprofile=True` profiles the calling thread with cProfile,
+    `sample_interval` (seconds) samples the stacks of every thread taking part in the run.
+    """
+
+    def __init__(self, name='run', cprofile=False, sample_interval=None):
+        self.name = name
+        self.spans = []
+        self.started = None
+        self.elapsed = None
+        self.profile = cProfile.Profile() if cprofile else None
+        self.sample_interval = sample_interval
+        self.samples = Counter()  # stack "a;b;c" -> numero di campioni
+        self._threads = set()
+        self._lock = threading.Lock()
+        self._token = None
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._threads.add(threading.get_ident())
+        self._token = _current.set(self)
+        if self.profile is not None:
+            self.profile.enable()
+        if self.sample_interval:
+            self._sampler = threading.Thread(target=self._sample, name='trace-sampler', daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self):
+        if self._token is None:
+            return self
+        if self.profile is not None:
+            self.profile.disable()
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+        _current.reset(self._token)
+        self._token = None
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _add(self, record):
+        with self._lock:
+            self.spans.append(record)
+            self._threads.add(record['tid'])
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            frames = sys._current_frames()
+            with self._lock:
+                tids = list(self._threads)
+            for tid in tids:
+                frame = frames.get(tid)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if stack:
+                    self.samples[';'.join(reversed(stack))] += 1
+
+    def records(self):
+        """
+        Spans ordered by start time (seconds relative to the start of the trace).
+        """
+        with self._lock:
+            return sorted(self.spans, key=lambda r: r['start'])
+
+    def to_chrome_trace(self):
+        """
+        Spans in the Chrome trace-event format (chrome://tracing, Perfetto, speedscope).
+        """
+        pid = os.getpid()
+        events = []
+        for r in self.records():
+            args = {k: v for k, v in r.items() if k not in ('name', 'start', 'duration', 'tid', 'thread', 'depth')}
+            events.append({'name': r['name'], 'ph': 'X', 'pid': pid, 'tid': r['tid'],
+                           'ts': r['start'] * 1e6, 'dur': r['duration'] * 1e6, 'args': args})
+        threads = {r['tid']: r['thread'] for r in self.records()}
+        for tid, thread_name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': thread_name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'trace': self.name}}
+
+    def folded_stacks(self):
+        """
+        Sampled stacks in the folded format read by flamegraph.pl and speedscope.
+        """
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def profile_stats(self, limit=30):
+        """
+        Top cProfile entries by cumulative time, as text.
+        """
+        if self.profile is None:
+            return ''
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def dump(self, directory, prefix=None):
+        """
+        Write the trace to `directory`: <prefix>.trace.json (always), <prefix>.prof (cProfile,
+        for snakeviz/flameprof) and <prefix>.folded (sampled stacks). Returns the written paths.
+        """
+        os.makedirs(directory, exist_ok=True)
+        prefix = prefix or f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}"
+        base = os.path.join(directory, prefix)
+        paths = [base + '.trace.json']
+        with open(paths[0], 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+        if self.profile is not None:
+            paths.append(base + '.prof')
+            self.profile.dump_stats(paths[-1])
+        if self.samples:
+            paths.append(base + '.folded')
+            with open(paths[-1], 'w') as f:
+                f.write(self.folded_stacks())
+        return paths
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def span(name, **meta):
+    """
+    Time a block as a span of the active trace. Yields the span record (a dict the block
+    can annotate, e.g. record['cache'] = 'hit'), or None when no trace is active.
+    """
+    trace = _current.get()
+    if trace is None:
+        yield None
+        return
+
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    record = dict(meta, name=name, depth=depth, tid=threading.get_ident(),
+                  thread=threading.current_thread().name)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['start'] = started - trace.started
+        record['duration'] = time.perf_counter() - started
+        _depth.reset(token)
+        trace._add(record)
+
+
+def profiled(name=None):
+    """
+    Decorator: record every call of the function as a span (no-op without an active trace).
+    """
+    def decorator(func):
+        label = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from utils.data import fetch_crypto_data, to_exchange_symbol, TIMEFRAME_MINUTES
+from utils.store import last_fetch, load_candles
+from utils.profiler import profiled
+
+
+def _to_ms(timestamps):
+    return timestamps.to_numpy(dtype='datetime64[ms]').astype('int64')
+
+
+def infer_minutes(df):
+    """
+    Infer the candle size (minutes) of an OHLCV frame from its timestamps.
+    """
+    if len(df) < 2:
+        return None
+    return int(np.median(np.diff(_to_ms(df['timestamp']))) // 60000)
+
+
+def resample_ohlcv(df, minutes, base_minutes=None, drop_partial_first=True):
+    """
+    Aggregate a finer OHLCV frame into `minutes`-sized candles aligned to UTC epoch
+    (same alignment Kraken uses for 4h/1d).
+    open = first, high = max, low = min, close = last, volume = sum.
+    The first bucket is dropped when the base series starts in the middle of it; the
+    last bucket is kept even if incomplete, like the live candle returned by the exchange.
+    """
+    if df.empty:
+        return df.copy()
+    base_minutes = base_minutes or infer_minutes(df)
+    if base_minutes and minutes % base_minutes != 0:
+        raise ValueError(f"Cannot build {minutes}m candles from {base_minutes}m candles")
+
+    ts = _to_ms(df['timestamp'])
+    bucket_ms = minutes * 60000
+    buckets = ts // bucket_ms
+
+    # Serie ordinata: ogni cambio di bucket è l'inizio di una nuova candela
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(ts)]
+
+    open_ = df['open'].to_numpy()
+    high = df['high'].to_numpy()
+    low = df['low'].to_numpy()
+    close = df['close'].to_numpy()
+    volume = df['volume'].to_numpy()
+
+    out = pd.DataFrame({
+        'timestamp': pd.to_datetime(buckets[starts] * bucket_ms, unit='ms'),
+        'open': open_[starts],
+        'high': np.maximum.reduceat(high, starts),
+        'low': np.minimum.reduceat(low, starts),
+        'close': close[ends - 1],
+        'volume': np.add.reduceat(volume, starts),
+    })
+
+    if drop_partial_first and base_minutes and len(out) > 0:
+        if ts[0] != buckets[0] * bucket_ms:
+            out = out.iloc[1:].reset_index(drop=True)
+    return out
+
+
+@profiled()
+def derive_timeframe(base_df, timeframe, limit, symbol='BTC/USDT'):
+    """
+    Build `timeframe` candles locally from a finer base series (e.g. 4h/1d from 1h).
+    History older than the base series is read from the local store; the exchange is
+    called only when the store does not hold a contiguous block of that older history,
+    closed when it was saved (a candle stored while still open is never reused).
+    """
+    minutes = TIMEFRAME_MINUTES.get(timeframe, timeframe)
+    derived = resample_ohlcv(base_df, minutes)
+    if derived.empty:
+        return fetch_crypto_data(symbol, timeframe=timeframe, limit=limit)
+
+    need = limit - len(derived)
+    if need <= 0:
+        return derived.iloc[-limit:].reset_index(drop=True)
+
+    exchange_symbol = to_exchange_symbol(symbol)
+    first_ms = int(_to_ms(derived['timestamp'])[0])
+
+    def _older():
+        return load_candles(exchange_symbol, minutes, limit=need, before=first_ms)
+
+    older = _older()
+    fetched_at = last_fetch(exchange_symbol, minutes)
+    last_ms = int(_to_ms(older['timestamp'])[-1]) if len(older) else None
+    contiguous = (
+        len(older) == need
+        and last_ms == first_ms - minutes * 60000
+        and fetched_at is not None
+        and last_ms + minutes * 60000 <= fetched_at
+    )
+    if not contiguous:
+        # Storico mancante: una sola richiesta all'exchange, che aggiorna lo store
+        fetch_crypto_data(symbol, timeframe=timeframe, limit=limit)
+        older = _older()
+
+    return pd.concat([older, derived], ignore_index=True)
@@ -0,0 +1,103 @@
+import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger('trading')
+
+# Cartella locale dei dati persistenti (candele, notizie, lessico): sopravvive ai riavvii del processo
+DATA_DIR = os.environ.get(
+    'TRADING_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+)
+
+_collectors = []
+_collectors_lock = threading.Lock()
+_deferred = threading.local()
+
+
+def in_streamlit():
+    """
+    True when running inside `streamlit run` (the app has imported streamlit and a runtime exists).
+    Streamlit itself is never imported here, so headless use does not pay its startup cost.
+    """
+    st = sys.modules.get('streamlit')
+    if st is None:
+        return False
+    try:
+        return st.runtime.exists()
+    except AttributeError:
+        return False
+
+
+def _report(level, source, message, log=True):
+    record = {'source': source, 'level': level, 'message': message}
+    if log:
+        logger.log(logging.ERROR if level == 'error' else logging.WARNING, "%s: %s", source, message)
+    deferred = getattr(_deferred, 'records', None)
+    if deferred is not None:
+        # Lavoro in background: nessuna pagina da aggiornare, il chiamante li riproduce più tardi
+        deferred.append(record)
+        return
+
+    with _collectors_lock:
+        for collector in _collectors:
+            collector.append(record)
+
+    if in_streamlit():
+        st = sys.modules['streamlit']
+        (st.error if level == 'error' else st.warning)(message)
+
+
+def report_error(source, message):
+    """
+    Report a data/analysis error: logged, shown in the dashboard when running under
+    Streamlit, and recorded by any active capture_errors() block.
+    """
+    _report('error', source, message)
+
+
+def report_warning(source, message):
+    """
+    Same as report_error for non-fatal problems (e.g. serving stale local data).
+    """
+    _report('warning', source, message)
+
+
+@contextmanager
+def capture_errors():
+    """
+    Collect structured error records ({'source', 'level', 'message'}) reported from any thread.
+    """
+    records = []
+    with _collectors_lock:
+        _collectors.append(records)
+    try:
+        yield records
+    finally:
+        with _collectors_lock:
+            _collectors.remove(records)
+
+
+@contextmanager
+def defer_reports():
+    """
+    Hold back the reports raised by this thread (background refreshes): they are only logged
+    and collected in the yielded list, to be shown later with replay_reports().
+    """
+    previous = getattr(_deferred, 'records', None)
+    records = _deferred.records = []
+    try:
+        yield records
+    finally:
+        _deferred.records = previous
+
+
+def replay_reports(records):
+    """
+    Report records collected by defer_reports() in the current thread (e.g. the page being rendered).
+    """
+    for record in records:
+        # Già scritti nel log quando sono stati raccolti
+        _report(record['level'], record['source'], record['message'], log=False)
@@ -0,0 +1,125 @@
+import time
+
+import pandas as pd
+
+from utils.analysis import calculate_technical_indicators, analyze_mtf_trend, generate_trading_signal
+from utils.data import fetch_crypto_data, to_exchange_symbol
+from utils.exchange import get_exchange
+from utils.indicators import batch_indicators
+from utils.loader import run_parallel
+from utils.resample import derive_timeframe
+from utils.runtime import report_error
+
+DEFAULT_WATCHLIST = [
+    'BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'XRP/USDT', 'ADA/USDT', 'DOGE/USDT', 'DOT/USDT',
+    'LINK/USDT', 'LTC/USDT', 'AVAX/USDT', 'ATOM/USDT', 'XLM/USDT', 'BCH/USDT', 'UNI/USDT',
+]
+
+SCAN_COLUMNS = ['symbol', 'price', 'opinion', 'score', 'rsi_1h', 'bullish_tfs', 'bearish_tfs',
+                'confluence', 'rank_score']
+
+
+def resolve_symbols(watchlist):
+    """
+    Map a watchlist to Kraken symbols (USDT -> USD where needed) and drop unknown pairs.
+    Returns {watchlist symbol: exchange symbol}.
+    """
+    try:
+        markets = get_exchange('kraken').markets
+    except Exception as e:
+        report_error('crypto', f"Error loading Kraken markets: {e}")
+        markets = None
+
+    resolved = {}
+    for symbol in watchlist:
+        exchange_symbol = to_exchange_symbol(symbol, markets)
+        if markets is None or exchange_symbol in markets:
+            resolved[symbol] = exchange_symbol
+    return resolved
+
+
+def _fetch_symbol(symbol, limit=400):
+    """
+    Same sources as the dashboard: 15m and 1h from the exchange, 4h and 1d derived locally
+    from the 1h series (30 days), reading older history from the candle store.
+    Two requests per symbol once the store holds the older 4h/1d history, four on a cold store.
+    """
+    base = fetch_crypto_data(symbol, timeframe='1h', limit=720)
+    if base.empty:
+        return None
+    return {
+        '15m': fetch_crypto_data(symbol, timeframe='15m', limit=limit),
+        '1h': base.iloc[-limit:].reset_index(drop=True),
+        '4h': derive_timeframe(base, '4h', limit, symbol=symbol),
+        '1d': derive_timeframe(base, '1d', limit, symbol=symbol),
+    }
+
+
+def _scan_row(name, mtf_data):
+    """
+    Indicators, MTF trend and trading signal of one symbol, as a SCAN_COLUMNS row.
+    Frames already carrying indicators (batch_indicators) are used as they are.
+    """
+    mtf_data = {tf: df if 'RSI' in df else calculate_technical_indicators(df) for tf, df in mtf_data.items()}
+    mtf_results, mtf_score = analyze_mtf_trend(mtf_data)
+    signal = generate_trading_signal(mtf_data)
+
+    bullish = sum(1 for status in mtf_results.values() if status.startswith('BULLISH'))
+    bearish = sum(1 for status in mtf_results.values() if status.startswith('BEARISH'))
+    rsi_1h = mtf_data['1h']['RSI'].iloc[-1] if 'RSI' in mtf_data['1h'] else float('nan')
+    return {
+        'symbol': name,
+        'price': mtf_data['15m']['close'].iloc[-1],
+        'opinion': signal['opinion'],
+        'score': signal['score'],
+        'rsi_1h': rsi_1h,
+        'bullish_tfs': bullish,
+        'bearish_tfs': bearish,
+        'confluence': mtf_score,
+        # Score del segnale + confluenza netta dei timeframe
+        'rank_score': signal['score'] + bullish - bearish,
+    }
+
+
+def scan_market(watchlist=None, max_workers=8):
+    """
+    Run the dashboard pipeline (fetch, indicators, MTF trend, trading signal) over a watchlist.
+    Fetching is concurrent but paced by utils.exchange.throttle, so the exchange rate
+    limit is respected: with Kraken's public allowance (bursts of 15, then ~1 request/s)
+    the fetch phase is bounded by the request count (see _fetch_symbol), i.e. minutes for
+    100 symbols; set_rate_limit() with a higher allowance shortens it accordingly.
+    Indicators of every symbol and timeframe are then computed in one vectorized batch.
+    A symbol that cannot be analyzed (no data, too short a history) is skipped and listed
+    in info['skipped'] ({symbol: reason}) instead of aborting the scan.
+    Returns (ranked DataFrame, info dict).
+    """
+    started = time.perf_counter()
+    symbols = resolve_symbols(watchlist or DEFAULT_WATCHLIST)
+
+    tasks = {name: (_fetch_symbol, (exchange_symbol,), {}) for name, exchange_symbol in symbols.items()}
+    frames = run_parallel(tasks, max_workers=max_workers)
+    fetched_at = time.perf_counter()
+
+    batch = batch_indicators({(name, tf): df for name, mtf_data in frames.items() if mtf_data
+                              for tf, df in mtf_data.items()})
+    rows, skipped = [], {}
+    for name, mtf_data in frames.items():
+        if not mtf_data:
+            skipped[name] = "nessun dato dall'exchange"
+            continue
+        try:
+            rows.append(_scan_row(name, {tf: batch.get((name, tf), df) for tf, df in mtf_data.items()}))
+        except Exception as e:
+            # Es. coppia appena listata: storico troppo corto per EMA 200 su qualche timeframe
+            skipped[name] = str(e)
+
+    results = pd.DataFrame(rows, columns=SCAN_COLUMNS)
+    results = results.sort_values(['rank_score', 'rsi_1h'], ascending=[False, True]).reset_index(drop=True)
+    info = {
+        'symbols': len(symbols),
+        'scanned': len(results),
+        'skipped': skipped,
+        'fetch_s': fetched_at - started,
+        'analysis_s': time.perf_counter() - fetched_at,
+    }
+    return results, info
@@ -1,67 +1,54 @@
+from utils.cache import ttl_cache
+from utils.news import ingest_feeds, latest_news, save_scores, unscored_items
+from utils.runtime import report_error, report_warning
 
-import requests
-from textblob import TextBlob
-from bs4 import BeautifulSoup
-import streamlit as st
+# Titoli recenti che entrano nella media del sentiment (ne vengono mostrati solo NEWS_SHOWN)
+SENTIMENT_WINDOW = 50
+NEWS_SHOWN = 10
 
-@st.cache_data(ttl=600)
+
+def sentiment_label(score):
+    """
+    Map a polarity score to the dashboard label (±0.1 neutral band).
+    """
+    if score > 0.1:
+        return "Positive"
+    if score < -0.1:
+        return "Negative"
+    return "Neutral"
+
+
+@ttl_cache(ttl=600)
 def fetch_news_sentiment():
     """
-    Fetch crypto news from a source (simulated or real simple scraper) and analyze sentiment.
-    This is a simplified example. For real production, use a News API.
-    Here we will scrape CoinDesk (example) or CryptoPanic. 
-    Note: Scraping might be brittle. We'll use a safer approach:
-    Simulate fetching from a public RSS feed or simple API if available.
-    For this demo, let's try to fetch headlines from a crypto news aggregate RSS if possible, 
-    or just scraping titles from a popular site if allowed.
-    
-    Let's use a mock or simple request for now to avoid blocking.
-    Actually, let's try to get data from Yahoo Finance News RSS for BTC.
+    Ingest the configured crypto news feeds (see utils.news) and analyze sentiment.
+    New stories are scored in one batch (utils.sentiment_engine, cached by title hash);
+    the average covers the latest SENTIMENT_WINDOW stored headlines and the newest
+    NEWS_SHOWN are returned as (overall label, average polarity, news items);
+    None when the news cannot be loaded at all.
     """
-    
-    rss_url = "https://finance.yahoo.com/rss/headline?s=BTC-USD"
-    
     try:
-        response = requests.get(rss_url, timeout=5)
-        soup = BeautifulSoup(response.content, features="xml")
-        items = soup.find_all('item')
-        
-        news_items = []
-        total_polarity = 0
-        
-        for item in items[:10]:
-            title = item.title.text
-            link = item.link.text
-            pub_date = item.pubDate.text
-            
-            blob = TextBlob(title)
-            sentiment_score = blob.sentiment.polarity
-            total_polarity += sentiment_score
-            
-            sentiment_label = "Neutral"
-            if sentiment_score > 0.1:
-                sentiment_label = "Positive"
-            elif sentiment_score < -0.1:
-                sentiment_label = "Negative"
-                
-            news_items.append({
-                'title': title,
-                'link': link,
-                'published': pub_date,
-                'sentiment': sentiment_label,
-                'score': sentiment_score
-            })
-            
-        avg_sentiment = total_polarity / len(news_items) if news_items else 0
-        
-        overall_sentiment = "Neutral"
-        if avg_sentiment > 0.1:
-            overall_sentiment = "Positive"
-        elif avg_sentiment < -0.1:
-            overall_sentiment = "Negative"
-            
-        return overall_sentiment, avg_sentiment, news_items
-        
+        new_items, info = ingest_feeds()
+
+        pending = unscored_items()
+        if pending:
+            from utils.sentiment_engine import score_headlines
+
+            polarity = score_headlines([item['title'] for item in pending])
+            save_scores({item['id']: (float(score), sentiment_label(score))
+                         for item, score in zip(pending, polarity)})
+
+        window = latest_news(limit=SENTIMENT_WINDOW)
+        news_items = window[:NEWS_SHOWN]
+        if info['errors'] and info['failed'] == info['feeds'] and not window:
+            raise RuntimeError(f"nessun feed di notizie raggiungibile ({next(iter(info['errors'].values()))})")
+        if info['failed']:
+            report_warning('news', f"{info['failed']}/{info['feeds']} feed di notizie non disponibili: "
+                                   + ", ".join(info['errors']))
+
+        avg_sentiment = sum(item['score'] for item in window) / len(window) if window else 0
+        return sentiment_label(avg_sentiment), avg_sentiment, news_items
+
     except Exception as e:
-        print(f"Error fetching news: {e}")
-        return "Neutral", 0, []
+        report_error('news', f"Error fetching news: {e}")
+        return None
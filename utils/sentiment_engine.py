@@ -0,0 +1,222 @@
+import json
+import os
+import re
+import threading
+from contextlib import closing
+
+import numpy as np
+
+from utils.news import _hash, get_connection
+from utils.profiler import profiled
+from utils.runtime import DATA_DIR
+
+# Lessico compilato una volta dal pattern lexicon di TextBlob, poi letto da disco (niente import di textblob)
+LEXICON_PATH = os.path.join(DATA_DIR, 'sentiment_lexicon.json')
+ENGINE_VERSION = 1
+
+NEGATIONS = ('no', 'not', "n't", 'never')
+PUNCTUATION = ".,;:!?()[]{}`''\"@#$^&*+-|=~_"
+ABBREVIATIONS = {
+    'a.', 'adj.', 'adv.', 'al.', 'a.m.', 'c.', 'cf.', 'comp.', 'conf.', 'def.', 'ed.', 'e.g.', 'esp.', 'etc.',
+    'ex.', 'f.', 'fig.', 'gen.', 'id.', 'i.e.', 'int.', 'l.', 'm.', 'Med.', 'Mil.', 'Mr.', 'n.', 'n.q.', 'orig.',
+    'pl.', 'pred.', 'pres.', 'p.m.', 'ref.', 'v.', 'vs.', 'w/',
+}
+
+# Tokenizer: stesse regole di textblob find_tokens, con le regex compilate una volta sola
+_CONTRACTIONS = re.compile(r"('d|'m|'s|'ll|'re|'ve|n't)")
+_QUOTES = str.maketrans({q: f' {q} ' for q in '“”‘’\'"'})
+_LEADING = tuple(PUNCTUATION.replace('.', ''))
+_TRAILING = _LEADING + ('.',)
+_ABBR = re.compile(r"^(?:[A-Za-z]\.|(?:[A-Za-z]\.)+|[A-Z][bcdfghjklmnpqrstvwxz|]+.)$")
+_SARCASM = re.compile(r'\( ?! ?\)')
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def compile_lexicon(path=None):
+    """
+    Compile TextBlob's English sentiment lexicon (shipped with the package, no network)
+    into a flat JSON table: word -> [polarity, subjectivity, intensity, is_modifier].
+    """
+    from importlib.metadata import version
+    from textblob import _text
+    from textblob.en import sentiment
+
+    sentiment.load()
+    words = {}
+    for word, senses in dict.items(sentiment):
+        polarity, subjectivity, intensity = senses[None]
+        words[word] = [polarity, subjectivity, intensity, 'RB' in senses]
+    emoticons = {}
+    for (_, polarity), faces in _text.EMOTICONS.items():
+        for face in faces:
+            emoticons.setdefault(face, polarity)
+
+    lexicon = {'source': f"textblob-{version('textblob')}", 'words': words, 'emoticons': emoticons}
+    path = path or LEXICON_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(lexicon, f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+    return lexicon
+
+
+def load_lexicon(path=None):
+    path = path or LEXICON_PATH
+    if not os.path.exists(path):
+        return compile_lexicon(path)
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def tokenize(text, emoticons=()):
+    """
+    Lower-cased tokens of a headline, split like TextBlob's pattern tokenizer;
+    tokens found in `emoticons` (":-)", ":D", ...) are kept whole.
+    """
+    text = _CONTRACTIONS.sub(r' \1', text).translate(_QUOTES)
+    tokens = []
+    for t in text.split():
+        if t in emoticons:
+            tokens.append(t)
+            continue
+        tail = []
+        while t.startswith(_LEADING):
+            tokens.append(t[0])
+            t = t[1:]
+        while t.endswith(_TRAILING):
+            if t.endswith(_LEADING):
+                tail.append(t[-1])
+                t = t[:-1]
+            if t.endswith('...'):
+                tail.append('...')
+                t = t[:-3].rstrip('.')
+            if t.endswith('.'):
+                if t in ABBREVIATIONS or _ABBR.match(t):
+                    break
+                tail.append('.')
+                t = t[:-1]
+        if t:
+            tokens.append(t)
+        tokens.extend(reversed(tail))
+    joined = _SARCASM.sub('(!)', ' '.join(tokens))
+    return joined.lower().split()
+
+
+def _clamp(x):
+    return max(-1.0, min(x, 1.0))
+
+
+class SentimentEngine:
+    """
+    Batch headline scorer equivalent to TextBlob(title).sentiment (pattern analyzer):
+    same lexicon, tokenizer, negation ("not good"), intensifiers ("very good") and "!" boosts,
+    but with a precompiled lexicon and no per-call parsing overhead.
+    """
+
+    def __init__(self, lexicon=None):
+        lexicon = lexicon or load_lexicon()
+        self.source = lexicon['source']
+        self.words = {w: tuple(v) for w, v in lexicon['words'].items()}
+        self.faces = frozenset(lexicon['emoticons'])
+        self.emoticons = {}
+        for face, polarity in lexicon['emoticons'].items():
+            self.emoticons.setdefault(face.lower(), polarity)
+        self.version = f"{ENGINE_VERSION}:{self.source}"
+
+    def _assess(self, tokens):
+        words, emoticons = self.words, self.emoticons
+        a = []  # [polarity, subjectivity, intensity, negated]
+        m = n = None
+        for w in tokens:
+            entry = words.get(w)
+            if entry is not None:
+                p, s, i, is_modifier = entry
+                if m is None:
+                    a.append([p, s, i, False])
+                else:
+                    # Parola preceduta da un modificatore ("very good")
+                    last = a[-1]
+                    last[0] = _clamp(p * last[2])
+                    last[1] = _clamp(s * last[2])
+                    last[2] = i
+                if n is not None:
+                    a[-1][2] = 1.0 / a[-1][2]
+                    a[-1][3] = True
+                m = w if is_modifier else None
+                n = w if w in NEGATIONS else None
+                continue
+
+            if w in NEGATIONS:
+                n = w
+            elif n and len(w.strip("'")) > 1:
+                n = None
+            if n is not None and m is not None and m.endswith('ly'):
+                # "really not good"
+                a[-1][3] = True
+                n = None
+            elif m and len(w) > 2:
+                m = None
+            if w == '!' and a:
+                a[-1][0] = _clamp(a[-1][0] * 1.25)
+            if w == '(!)':
+                a.append([0.0, 1.0, 1.0, False])
+            if not w.isalpha() and len(w) <= 5 and w not in PUNCTUATION:
+                p = emoticons.get(w)
+                if p is not None:
+                    a.append([p, 1.0, 1.0, False])
+        return a
+
+    def score_batch(self, texts):
+        """
+        Score a list of texts in one pass. Returns (polarity, subjectivity) float arrays.
+        """
+        owner, polarity, subjectivity = [], [], []
+        for k, text in enumerate(texts):
+            for p, s, _, negated in self._assess(tokenize(text, self.faces)):
+                owner.append(k)
+                polarity.append(p * -0.5 if negated else p)
+                subjectivity.append(s)
+
+        # Media per titolo in un colpo solo (titoli senza parole note -> 0)
+        owner = np.asarray(owner, dtype='int64')
+        counts = np.maximum(np.bincount(owner, minlength=len(texts)), 1)
+        return (np.bincount(owner, weights=polarity, minlength=len(texts)) / counts,
+                np.bincount(owner, weights=subjectivity, minlength=len(texts)) / counts)
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = SentimentEngine()
+        return _engine
+
+
+@profiled()
+def score_headlines(titles, db_path=None):
+    """
+    Polarity for each title, reusing scores persisted in the news store (keyed by title hash
+    and engine version); only unseen titles are scored, in a single batch.
+    """
+    engine = get_engine()
+    keys = [_hash(title) for title in titles]
+    scores = {}
+    with closing(get_connection(db_path)) as conn:
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT title_hash, polarity FROM sentiment_cache WHERE version = ? "
+                f"AND title_hash IN ({','.join('?' * len(chunk))})", [engine.version, *chunk])
+            scores.update(rows)
+
+        missing = {key: title for key, title in zip(keys, titles) if key not in scores}
+        if missing:
+            polarity, subjectivity = engine.score_batch(list(missing.values()))
+            rows = [(key, engine.version, float(p), float(s))
+                    for key, p, s in zip(missing, polarity, subjectivity)]
+            conn.executemany("INSERT OR REPLACE INTO sentiment_cache VALUES (?, ?, ?, ?)", rows)
+            conn.commit()
+            scores.update((row[0], row[2]) for row in rows)
+    return np.array([scores[key] for key in keys], dtype='float64')
@@ -0,0 +1,199 @@
+import os
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from urllib.parse import unquote, urlsplit
+
+from utils.runtime import DATA_DIR, logger
+
+# Backend condiviso tra processi/worker: non impostato = cache solo in memoria (comportamento storico)
+#   TRADING_CACHE_URL=sqlite:///percorso/cache.sqlite   (o "sqlite://" per DATA_DIR/cache.sqlite)
+#   TRADING_CACHE_URL=redis://[:password@]host:6379/0  (qualsiasi server che parli RESP)
+CACHE_URL_ENV = 'TRADING_CACHE_URL'
+KEY_PREFIX = 'trading:'
+
+_backend = None
+_backend_url = None
+_backend_lock = threading.Lock()
+
+
+class CacheBackendError(Exception):
+    """
+    The shared cache cannot be reached or answered with an error.
+    """
+
+
+@contextmanager
+def _backend_errors():
+    try:
+        yield
+    except (OSError, sqlite3.Error) as e:
+        raise CacheBackendError(str(e)) from e
+
+
+class SQLiteBackend:
+    """
+    Shared cache in a local SQLite file: enough for several workers on one machine.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DATA_DIR, 'cache.sqlite')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, token TEXT, expires_at REAL)")
+            conn.commit()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def get(self, key):
+        with _backend_errors(), closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+                               (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with _backend_errors(), closing(self._connect()) as conn:
+            conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, value, now + ttl))
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    def acquire(self, key, lease):
+        """
+        Take the lock `key` for `lease` seconds. Returns the owner token to pass to release(),
+        or None if another process holds it.
+        """
+        now = time.time()
+        token = secrets.token_hex(16)
+        with _backend_errors(), closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+            acquired = conn.execute("INSERT OR IGNORE INTO leases VALUES (?, ?, ?)",
+                                    (key, token, now + lease)).rowcount == 1
+            conn.execute("COMMIT")
+        return token if acquired else None
+
+    def release(self, key, token):
+        """
+        Release the lock `key` only if it is still owned by `token` (it may have expired
+        and been taken by another process).
+        """
+        with _backend_errors(), closing(self._connect()) as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND token = ?", (key, token))
+
+
+class RedisBackend:
+    """
+    Minimal client for Redis-protocol (RESP) servers: GET, SET PX [NX] and EVAL (for the
+    compare-and-delete of a lease) only, one connection per thread, no extra dependency.
+    """
+
+    # Cancella il lease solo se contiene ancora il token di chi lo ha preso
+    RELEASE_SCRIPT = ("if redis.call('get', KEYS[1]) == ARGV[1] then "
+                      "return redis.call('del', KEYS[1]) else return 0 end")
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None, timeout=2.0):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+            if self.password:
+                self._command('AUTH', self.password)
+            if self.db:
+                self._command('SELECT', self.db)
+        return conn
+
+    def _command(self, *args):
+        with _backend_errors():
+            sock, reader = self._connection()
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            payload.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        try:
+            sock.sendall(b''.join(payload))
+            return self._read(reader)
+        except OSError as e:
+            # Connessione rotta: la prossima chiamata ne apre una nuova
+            self._local.conn = None
+            sock.close()
+            raise CacheBackendError(str(e)) from e
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("connection closed by the cache server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body.decode()
+        if kind == b'-':
+            raise CacheBackendError(body.decode())
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            size = int(body)
+            return None if size < 0 else reader.read(size + 2)[:-2]
+        if kind == b'*':
+            size = int(body)
+            return None if size < 0 else [self._read(reader) for _ in range(size)]
+        raise CacheBackendError(f"unexpected reply from the cache server: {line!r}")
+
+    def get(self, key):
+        return self._command('GET', key)
+
+    def set(self, key, value, ttl):
+        self._command('SET', key, value, 'PX', max(1, int(ttl * 1000)))
+
+    def acquire(self, key, lease):
+        token = secrets.token_hex(16)
+        if self._command('SET', key, token, 'PX', max(1, int(lease * 1000)), 'NX') == 'OK':
+            return token
+        return None
+
+    def release(self, key, token):
+        self._command('EVAL', self.RELEASE_SCRIPT, 1, key, token)
+
+
+def backend_from_url(url):
+    """
+    Build a backend from a cache URL (see CACHE_URL_ENV); None for an empty URL.
+    """
+    if not url:
+        return None
+    parts = urlsplit(url)
+    if parts.scheme == 'sqlite':
+        return SQLiteBackend(unquote(parts.path) or None)
+    if parts.scheme == 'redis':
+        db = int(parts.path.strip('/') or 0)
+        return RedisBackend(parts.hostname or 'localhost', parts.port or 6379, db,
+                            unquote(parts.password) if parts.password else None)
+    raise ValueError(f"unsupported cache URL: {url}")
+
+
+def get_backend():
+    """
+    The shared backend configured by CACHE_URL_ENV (None when not set or not usable).
+    """
+    global _backend, _backend_url
+    url = os.environ.get(CACHE_URL_ENV, '')
+    with _backend_lock:
+        if url != _backend_url:
+            _backend_url = url
+            try:
+                _backend = backend_from_url(url)
+            except Exception as e:
+                logger.warning("shared cache disabled (%s): %s", url, e)
+                _backend = None
+        return _backend
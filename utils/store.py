@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from utils.candles import CandleArray
+from utils.profiler import profiled
+from utils.runtime import DATA_DIR
+
+DB_PATH = os.path.join(DATA_DIR, 'candles.sqlite')
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def get_connection(db_path=None):
+    """
+    Open a connection to the local candle store, creating the schema on first use.
+    """
+    db_path = db_path or DB_PATH
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+
+    with _schema_lock:
+        if db_path not in _schema_ready:
+            # WAL permette letture concorrenti mentre un altro processo scrive
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS candles (
+                    symbol TEXT NOT NULL,
+                    timeframe INTEGER NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (symbol, timeframe, timestamp)
+                ) WITHOUT ROWID
+            """)
+            # Ora dell'ultimo salvataggio per serie: le candele chiuse prima di allora sono definitive
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS candle_fetches (
+                    symbol TEXT NOT NULL,
+                    timeframe INTEGER NOT NULL,
+                    fetched_at INTEGER NOT NULL,
+                    PRIMARY KEY (symbol, timeframe)
+                ) WITHOUT ROWID
+            """)
+            conn.commit()
+            _schema_ready.add(db_path)
+    return conn
+
+
+@profiled()
+def save_candles(symbol, timeframe, ohlcv, db_path=None):
+    """
+    Upsert raw CCXT OHLCV rows ([ms, o, h, l, c, v]) for symbol/timeframe.
+    Existing rows are replaced so the still-open candle gets revised on every refresh.
+    The save time is recorded as the series' last fetch (see last_fetch).
+    """
+    if not ohlcv:
+        return 0
+    rows = [(symbol, int(timeframe), int(c[0]), c[1], c[2], c[3], c[4], c[5]) for c in ohlcv]
+    with closing(get_connection(db_path)) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO candle_fetches VALUES (?, ?, ?)",
+            (symbol, int(timeframe), int(time.time() * 1000))
+        )
+        conn.commit()
+    return len(rows)
+
+
+def last_fetch(symbol, timeframe, db_path=None):
+    """
+    Return when symbol/timeframe candles were last saved (ms), or None.
+    Every refresh re-fetches the newest stored candle, so a candle that ended before this
+    time was stored closed.
+    """
+    with closing(get_connection(db_path)) as conn:
+        row = conn.execute(
+            "SELECT fetched_at FROM candle_fetches WHERE symbol = ? AND timeframe = ?",
+            (symbol, int(timeframe))
+        ).fetchone()
+    return row[0] if row else None
+
+
+def last_timestamp(symbol, timeframe, db_path=None):
+    """
+    Return the most recent stored candle timestamp (ms) and the number of stored candles.
+    """
+    with closing(get_connection(db_path)) as conn:
+        row = conn.execute(
+            "SELECT MAX(timestamp), COUNT(*) FROM candles WHERE symbol = ? AND timeframe = ?",
+            (symbol, int(timeframe))
+        ).fetchone()
+    return row[0], row[1]
+
+
+@profiled()
+def load_candles(symbol, timeframe, limit=None, since=None, before=None, db_path=None):
+    """
+    Load stored candles as a DataFrame shaped like fetch_crypto_data output
+    (compact float32 columns, see utils.candles.CandleArray).
+    With `limit` only the most recent `limit` candles are returned; `since`/`before`
+    bound the timestamp range (ms, `before` excluded).
+    """
+    query = "SELECT timestamp, open, high, low, close, volume FROM candles WHERE symbol = ? AND timeframe = ?"
+    params = [symbol, int(timeframe)]
+    if since is not None:
+        query += " AND timestamp >= ?"
+        params.append(int(since))
+    if before is not None:
+        query += " AND timestamp < ?"
+        params.append(int(before))
+    query += " ORDER BY timestamp DESC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(int(limit))
+
+    with closing(get_connection(db_path)) as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    # Colonne float32 contigue, costruite senza passare da tuple/oggetti pandas
+    return CandleArray.from_rows(rows[::-1]).to_frame()
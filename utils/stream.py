@@ -0,0 +1,252 @@
+import csv
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+
+from utils.analysis import generate_trading_signal
+from utils.data import TIMEFRAME_MINUTES
+from utils.indicators import IndicatorEngine
+
+Trade = namedtuple('Trade', ['timestamp', 'price', 'amount'])  # timestamp in ms
+
+
+class TradeSource(ABC):
+    """
+    Pluggable trade feed. Subclasses yield Trade tuples from __iter__ until the feed
+    ends or close() is called.
+    """
+
+    def __init__(self):
+        self._closed = threading.Event()
+
+    @abstractmethod
+    def __iter__(self):
+        pass
+
+    def close(self):
+        self._closed.set()
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+
+class ReplaySource(TradeSource):
+    """
+    Replay recorded trades from a CSV (timestamp,price,amount) or JSONL file, for local testing.
+    `speed=None` replays as fast as possible; `speed=10` replays 10x faster than real time.
+    """
+
+    def __init__(self, path, speed=None):
+        super().__init__()
+        self.path = path
+        self.speed = speed
+
+    def _rows(self):
+        with open(self.path, newline='') as f:
+            if self.path.endswith('.jsonl'):
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        yield Trade(int(row['timestamp']), float(row['price']), float(row['amount']))
+            else:
+                for row in csv.DictReader(f):
+                    yield Trade(int(row['timestamp']), float(row['price']), float(row['amount']))
+
+    def __iter__(self):
+        first_trade = None
+        started = time.monotonic()
+        for trade in self._rows():
+            if self.closed:
+                return
+            if self.speed:
+                first_trade = first_trade if first_trade is not None else trade.timestamp
+                due = (trade.timestamp - first_trade) / 1000.0 / self.speed
+                delay = due - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            yield trade
+
+
+class KrakenWebSocketSource(TradeSource):
+    """
+    Live trades from the Kraken WebSocket API v2 (`trade` channel).
+    Requires the `websocket-client` package.
+    """
+    URL = 'wss://ws.kraken.com/v2'
+
+    def __init__(self, symbol='BTC/USD', timeout=30):
+        super().__init__()
+        self.symbol = symbol
+        self.timeout = timeout
+        self._ws = None
+
+    def __iter__(self):
+        import websocket  # dipendenza opzionale, serve solo in produzione
+
+        self._ws = websocket.create_connection(self.URL, timeout=self.timeout)
+        self._ws.send(json.dumps({
+            'method': 'subscribe',
+            'params': {'channel': 'trade', 'symbol': [self.symbol]},
+        }))
+        try:
+            while not self.closed:
+                message = json.loads(self._ws.recv())
+                if message.get('channel') != 'trade':
+                    continue
+                for item in message.get('data', []):
+                    ts = datetime.fromisoformat(item['timestamp'].replace('Z', '+00:00'))
+                    yield Trade(int(ts.timestamp() * 1000), float(item['price']), float(item['qty']))
+        finally:
+            self._ws.close()
+
+    def close(self):
+        super().close()
+        if self._ws is not None:
+            self._ws.close()
+
+
+class CandleBuilder:
+    """
+    Build OHLCV candles for several timeframes from a trade stream, in memory.
+    For every trade, `on_candle(timeframe, candle, closed)` is called with the live candle
+    ([ms, open, high, low, close, volume]); when a trade opens a new bucket the previous
+    candle is first emitted with closed=True.
+    `seeded_at` ({timeframe: ms}) marks when a `live` candle was last updated: trades at or
+    before that time are already in its volume and are skipped.
+    """
+
+    def __init__(self, timeframes=('15m', '1h', '4h', '1d'), on_candle=None, live=None, seeded_at=None):
+        self.minutes = {tf: TIMEFRAME_MINUTES[tf] for tf in timeframes}
+        self.on_candle = on_candle
+        # `live` permette di continuare la candela aperta arrivata dallo storico
+        self.live = {tf: None for tf in timeframes}
+        for tf, candle in (live or {}).items():
+            self.live[tf] = list(candle)
+        self.seeded_at = dict(seeded_at or {})
+
+    def add_trade(self, trade):
+        for tf, minutes in self.minutes.items():
+            if trade.timestamp <= self.seeded_at.get(tf, -1):
+                # Es. snapshot iniziale del WebSocket: trade già contati nella candela dello storico
+                continue
+            bucket_ms = minutes * 60000
+            start = trade.timestamp - trade.timestamp % bucket_ms
+            candle = self.live[tf]
+
+            if candle is not None and start < candle[0]:
+                # Trade in ritardo su una candela già chiusa: ignorato
+                continue
+            if candle is None or start > candle[0]:
+                if candle is not None and self.on_candle:
+                    self.on_candle(tf, list(candle), True)
+                candle = self.live[tf] = [start, trade.price, trade.price, trade.price, trade.price, 0.0]
+
+            candle[2] = max(candle[2], trade.price)
+            candle[3] = min(candle[3], trade.price)
+            candle[4] = trade.price
+            candle[5] += trade.amount
+            if self.on_candle:
+                self.on_candle(tf, list(candle), False)
+
+
+class StreamingAnalyzer:
+    """
+    Push streamed candles into one IndicatorEngine per timeframe (O(1) per update) and
+    regenerate the trading signal at most every `min_interval` seconds; an update dropped by
+    the throttle is emitted by a trailing flush, so the signal never waits for the next trade.
+    `history` ({timeframe: OHLCV DataFrame}) warms the engines up, e.g. from the candle store.
+    Its last candle keeps being updated by the stream; `seeded_at` (ms) is when the history was
+    fetched (default: now, for last candles that are still open), older trades are skipped.
+    `on_signal(signal, latency_s)` receives the signal and the delay since the triggering trade.
+    """
+
+    def __init__(self, history, on_signal=None, min_interval=0.25, window=500, seeded_at=None):
+        self.engines = {tf: IndicatorEngine().load(df) for tf, df in history.items() if not df.empty}
+        for tf in history:
+            self.engines.setdefault(tf, IndicatorEngine())
+        self.on_signal = on_signal
+        self.min_interval = min_interval
+        self.window = window
+        live, seeded = {}, {}
+        now_ms = int(time.time() * 1000)
+        for tf, df in history.items():
+            if not df.empty:
+                row = df.iloc[-1]
+                live[tf] = [int(row['timestamp'].value // 10**6), row['open'], row['high'],
+                            row['low'], row['close'], row['volume']]
+                if seeded_at is not None:
+                    seeded[tf] = seeded_at
+                elif live[tf][0] + TIMEFRAME_MINUTES[tf] * 60000 > now_ms:
+                    seeded[tf] = now_ms  # candela ancora aperta: contiene i trade fino ad ora
+        self.builder = CandleBuilder(tuple(history), on_candle=self._on_candle, live=live, seeded_at=seeded)
+        self._lock = threading.RLock()
+        self._timer = None
+        self._pending_since = None
+        self._last_signal_at = 0.0
+        self.last_signal = None
+
+    def _on_candle(self, tf, candle, closed):
+        engine = self.engines[tf]
+        ts = pd.Timestamp(candle[0], unit='ms')
+        last = engine.last_timestamp
+        if last is not None and ts < last:
+            return
+        engine.update(ts, *candle[1:])
+
+    def _frames(self):
+        return {tf: engine.to_frame().iloc[-self.window:].reset_index(drop=True)
+                for tf, engine in self.engines.items()}
+
+    def process(self, trade, received_at=None):
+        """
+        Feed one trade. Returns the new signal when it was regenerated, otherwise None.
+        """
+        received_at = received_at or time.time()
+        with self._lock:
+            self.builder.add_trade(trade)
+            wait = self.min_interval - (time.monotonic() - self._last_signal_at)
+            if wait <= 0:
+                return self._emit(received_at)
+            # Aggiornamento rimandato: il flush lo emette anche se non arrivano altri trade
+            if self._pending_since is None:
+                self._pending_since = received_at
+            if self._timer is None:
+                self._timer = threading.Timer(wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return None
+
+    def flush(self):
+        """
+        Emit the signal update left pending by the throttle, if any. Returns it, or None.
+        """
+        with self._lock:
+            self._timer = None
+            if self._pending_since is None:
+                return None
+            return self._emit(self._pending_since)
+
+    def _emit(self, received_at):
+        self._pending_since = None
+        self._last_signal_at = time.monotonic()
+        self.last_signal = generate_trading_signal(self._frames())
+        if self.on_signal:
+            self.on_signal(self.last_signal, time.time() - received_at)
+        return self.last_signal
+
+    def run(self, source):
+        """
+        Consume `source` until it ends or is closed.
+        """
+        for trade in source:
+            self.process(trade)
+        timer = self._timer
+        if timer is not None:
+            timer.cancel()
+        self.flush()